@@ -12,14 +12,29 @@ from flask_login import LoginManager, UserMixin, login_user, current_user, logou
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.utils import secure_filename
-from database_manager import search_jobs_db, initialize_database as init_db, clear_jobs_table
+from database_manager import (
+    search_jobs_db, get_job_search_summary, initialize_database as init_db, clear_jobs_table, needs_initialization,
+    request_job_details, get_user_last_refresh, record_user_visit, DETAIL_PENDING
+)
 from courses import fetch_courses_by_skills
-from scraper import scrape_jobs
+from scrape_queue import (
+    enqueue_scrape,
+    admit_scrape,
+    get_task,
+    get_active_task,
+    get_latest_task,
+    run_worker,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_PROFILE,
+    PRIORITY_PREFETCH
+)
+from scrape_pipeline import enable_nlp_pool
 from insights import get_job_insights, get_skill_options
 from cleanup_utils import cleanup_static_graphs, cleanup_job_related_data
 import json
 import subprocess
 import time
+import click
 import spacy
 from job_utils import count_user_jobs, get_user_skills
 from job_counter import get_job_counts
@@ -102,11 +117,11 @@ db_uri = f'sqlite:///{db_path.replace(os.sep, "/")}'
 app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
 logger.info(f"Using database at: {db_path} with URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
 
-# Add connection pooling and timeout settings
+# Add connection pooling settings; the lock timeout and other pragmas are
+# set on connect (database_manager.SQLITE_PRAGMAS)
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'connect_args': {
-        'check_same_thread': False,  # Allow multithreaded access
-        'timeout': 30  # Increase timeout for busy situations
+        'check_same_thread': False  # Allow multithreaded access
     },
     'pool_pre_ping': True  # Check connections before using them
 }
@@ -508,6 +523,7 @@ def login():
             user = User.query.filter_by(email=form.email.data).first()
             if user and bcrypt.check_password_hash(user.password, form.password.data):
                 login_user(user, remember=form.remember.data)
+                record_user_visit(user.id)
                 logger.info(f"User {user.username} (ID: {user.id}) logged in successfully.")
                 next_page = request.args.get('next')
                 return redirect(next_page) if next_page else redirect(url_for('index'))
@@ -779,6 +795,8 @@ def delete_education_route(id):
 @login_required
 def list_all_jobs():
     """Display the list of jobs."""
+    # Visit times drive the pre-scrape scheduler
+    record_user_visit(current_user.id)
     
     query = request.args.get('query', 'All')
     location = request.args.get('location', 'All')
@@ -831,8 +849,10 @@ def list_all_jobs():
     # Count existing jobs for this user
     job_count = count_user_jobs(current_user.id)
     
-    # Get the last scrape time from session
+    # Get the last scrape time from session, and when a finished scrape
+    # (the user's own or a batch scrape) last refreshed this user's jobs
     last_scrape_time = session.get('last_scrape_time')
+    last_refresh_time = get_user_last_refresh(current_user.id)
       # Import the utility function to check if jobs need refresh
     from utils import needs_refresh
     
@@ -845,147 +865,48 @@ def list_all_jobs():
         force_refresh or                             # Manual refresh requested
         run_scraper or                               # Search with new query
         job_count == 0 or                            # No jobs in database yet
-        needs_refresh(last_scrape_time, hours_threshold=6)  # Last scrape was over 6 hours ago
+        (needs_refresh(last_scrape_time, hours_threshold=6) and    # Last scrape was over 6 hours ago
+         needs_refresh(last_refresh_time, hours_threshold=6))
     )
-    if need_scrape and has_skills:
-        try:
-            # Show loading state
-            session['is_loading'] = True
-            
-            # Clean up any data that needs refreshing when jobs change
-            cleanup_job_related_data()
-            
-            # Use scrape_jobs to get fresh data
-            jobs = scrape_jobs(
-                query=query,
-                location=location,
-                user_skills=resume_skills,
-                pages=3,  # Scrape 3 pages by default
-                force_clear=force_refresh,
-                user_id=current_user.id
-            )
-              # Update last scrape time
+    # Scrapes run on the background worker; only queue a run here
+    active_task = get_active_task(current_user.id)
+    queue_scrape = need_scrape and has_skills and not active_task
+    # An automatic refresh of stale results yields to users waiting on an explicit one
+    priority = PRIORITY_INTERACTIVE if (force_refresh or run_scraper or job_count == 0) else PRIORITY_PREFETCH
+    stale_results = False
+    if queue_scrape and not admit_scrape(priority, has_cached_results=job_count > 0):
+        # The scraper is saturated; show the stored results, marked as possibly out of date
+        stale_results = True
+    elif queue_scrape:
+        # Clean up any data that needs refreshing when jobs change
+        cleanup_job_related_data()
+        
+        task_id = enqueue_scrape(
+            current_user.id,
+            query=query,
+            location=location,
+            user_skills=resume_skills,
+            pages=3,  # Scrape 3 pages by default
+            force_clear=force_refresh,
+            priority=priority
+        )
+        if task_id:
+            session['scrape_task_id'] = task_id
+            # Record the request time so page reloads don't queue another run
             session['last_scrape_time'] = datetime.utcnow().isoformat()
-            
-            if not jobs:
-                flash('No jobs found. Try adjusting your search criteria.', 'info')
-                jobs = []
-            else:
-                flash(f'Successfully found {len(jobs)} jobs!', 'success')
-        except Exception as e:
-            flash(f'Error while scraping jobs: {str(e)}', 'error')
-            jobs = []
-        finally:
-            # Clear loading state
-            session.pop('is_loading', None)
-    # Get existing jobs from database
-    jobs = search_jobs_db(query, location, resume_skills, user_id=current_user.id, job_type=job_type)
-    
-    # Check if jobs were found in database and set appropriate message
-    # Don't show "No jobs found" message if jobs were actually found
-    if jobs:
-        # Clear any "No jobs found" messages if jobs are found in the database
-        # This prevents showing contradictory messages
-        flashes_to_keep = []
-        for category, message in session.get('_flashes', []):
-            if 'No jobs found' not in message:
-                flashes_to_keep.append((category, message))
-        session['_flashes'] = flashes_to_keep
-
-    # Process jobs to ensure proper skill formatting and matching
-    missing_skills_set = set()
-    
-    for job in jobs:
-        # Handle required skills
-        if isinstance(job.get('required_skills'), str):
-            try:
-                job['required_skills'] = json.loads(job['required_skills'])
-            except (json.JSONDecodeError, TypeError):
-                job['required_skills'] = []
-        elif job.get('required_skills') is None:
-            job['required_skills'] = []
-
-        # Handle nice to have skills
-        if isinstance(job.get('nice_to_have_skills'), str):
-            try:
-                job['nice_to_have_skills'] = json.loads(job['nice_to_have_skills'])
-            except (json.JSONDecodeError, TypeError):
-                job['nice_to_have_skills'] = []
-        elif job.get('nice_to_have_skills') is None:
-            job['nice_to_have_skills'] = []
-
-        # Handle all skills
-        if isinstance(job.get('skills'), str):
-            try:
-                job['skills'] = json.loads(job['skills'])
-            except (json.JSONDecodeError, TypeError):
-                job['skills'] = []
-        elif job.get('skills') is None:
-            job['skills'] = []
-
-        # Calculate matching skills for required and nice-to-have if resume skills exist
-        if resume_skills:
-            # Normalize all skills to lowercase for matching
-            resume_skills_set = set(s.lower().strip() for s in resume_skills if s)
-            required_skills_set = set(s.lower().strip() for s in job.get('required_skills', []) if s)
-            nice_to_have_set = set(s.lower().strip() for s in job.get('nice_to_have_skills', []) if s)
-            all_skills_set = required_skills_set | nice_to_have_set
-            
-            # Find matching and missing skills while preserving original case
-            job['matching_required_skills'] = [s for s in job['required_skills'] if s and s.lower().strip() in resume_skills_set]
-            job['matching_nice_to_have_skills'] = [s for s in job['nice_to_have_skills'] if s and s.lower().strip() in resume_skills_set]
-            job['missing_skills'] = [s for s in job['required_skills'] if s and s.lower().strip() not in resume_skills_set]
-            
-            # Only count it as a skill gap if the skill appears frequently in job requirements
-            if len(job['missing_skills']) > 0:
-                missing_skills_set.update(s for s in job['missing_skills'] if s)
-            
-            # Calculate match percentages
-            if required_skills_set or nice_to_have_set:
-                required_weight = 0.7  # 70% weight for required skills
-                nice_to_have_weight = 0.3  # 30% weight for nice-to-have skills
-                
-                required_match = (len([s for s in job['matching_required_skills']]) / len(required_skills_set) * 100 * required_weight
-                                if required_skills_set else 0)
-                nice_to_have_match = (len([s for s in job['matching_nice_to_have_skills']]) / len(nice_to_have_set) * 100 * nice_to_have_weight
-                                    if nice_to_have_set else 0)
-                                    
-                job['match_percentage'] = int(required_match + nice_to_have_match)
-    
-    # Sort jobs by match percentage and other criteria
-    if resume_skills:
-        jobs.sort(key=lambda x: (
-            x.get('match_percentage', 0),
-            x.get('is_new', False),
-            x.get('is_urgent', False),
-            x.get('date_scraped', '')
-        ), reverse=True)
-    else:
-        jobs.sort(key=lambda x: (
-            x.get('is_new', False),
-            x.get('is_urgent', False),
-            x.get('date_scraped', '')
-        ), reverse=True)    # Convert missing_skills_set back to a sorted list for template
-    missing_skills = sorted(list(missing_skills_set))
-      # Store missing skills in session for use in course recommendations, using user-specific key
-    session[f'user_{current_user.id}_missing_skills'] = missing_skills
-    
-    # Apply job type filter if specified
-    if job_type != 'All':
-        job_type_lower = job_type.lower()
-        filtered_jobs = []
-        for job in jobs:
-            # Check if job is remote by looking for 'remote' in various fields
-            is_remote = False
-            if 'remote' in str(job.get('title', '')).lower() or 'remote' in str(job.get('location', '')).lower() or 'remote' in str(job.get('description', '')).lower():
-                is_remote = True
-            
-            # Filter based on job type
-            if (job_type_lower == 'remote' and is_remote) or (job_type_lower == 'onsite' and not is_remote):
-                filtered_jobs.append(job)
-        jobs = filtered_jobs    # Get consistent job counts using our utility
-    job_counts = get_job_counts(jobs, user_id=current_user.id)
+            active_task = get_task(task_id, user_id=current_user.id)
+        else:
+            flash('Could not start a job search right now. Please try again.', 'error')
+    # Count the matching jobs and load only the page being shown; matching,
+    # scoring and sorting happen in the database
+    job_counts = get_job_search_summary(query, location, resume_skills, user_id=current_user.id, job_type=job_type)
+    missing_skills = job_counts.pop('missing_skills')
     total_jobs = job_counts["total_jobs"]  # Keep for pagination calculation
+    if per_page != 0:  # If per_page is 0, show all jobs
+        paginated_jobs = search_jobs_db(query, location, resume_skills, user_id=current_user.id, job_type=job_type,
+                                        limit=per_page, offset=(page - 1) * per_page)
+    else:
+        paginated_jobs = search_jobs_db(query, location, resume_skills, user_id=current_user.id, job_type=job_type)
     
     # Check for contradictory messages - if we have jobs but also a "No jobs found" flash message
     if total_jobs > 0:
@@ -995,14 +916,19 @@ def list_all_jobs():
             if 'No jobs found' not in message:
                 flashes_to_keep.append((category, message))
         session['_flashes'] = flashes_to_keep
-        
-    # Apply pagination
-    if per_page != 0:  # If per_page is 0, show all jobs
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        paginated_jobs = jobs[start_idx:end_idx]
-    else:
-        paginated_jobs = jobs
+    
+    # Mark which of the shown jobs' required and nice-to-have skills the user has
+    resume_skills_set = set(s.lower().strip() for s in resume_skills if s)
+    for job in paginated_jobs:
+        job['matching_required_skills'] = [s for s in job['required_skills'] if s and s.lower().strip() in resume_skills_set]
+        job['matching_nice_to_have_skills'] = [s for s in job['nice_to_have_skills'] if s and s.lower().strip() in resume_skills_set]
+        job['missing_skills'] = [s for s in job['required_skills'] if s and s.lower().strip() not in resume_skills_set]
+    
+    # Store missing skills in session for use in course recommendations, using user-specific key
+    session[f'user_{current_user.id}_missing_skills'] = missing_skills
+    
+    # Fetch the detail pages of listings shown with a placeholder first
+    request_job_details([job['id'] for job in paginated_jobs if job.get('detail_status') == DETAIL_PENDING])
     
     # Calculate total pages for pagination
     total_pages = (total_jobs + per_page - 1) // per_page if per_page > 0 else 1
@@ -1025,11 +951,13 @@ def list_all_jobs():
         course_recommendations=course_recommendations,
         query=query,
         location=location,
-        run_scraper=need_scrape,
+        run_scraper=active_task is not None,
         resume_skills=resume_skills,
         missing_skills=missing_skills,
         job_counts=job_counts,  # Pass the complete job counts
-        is_loading=session.get('is_loading', False)
+        is_loading=active_task is not None,
+        scrape_task_id=active_task['id'] if active_task else None,
+        stale_results=stale_results
     )
 
 
@@ -1309,172 +1237,170 @@ def reset_skills():
 @app.route('/refresh_jobs')
 @login_required
 def refresh_jobs():
-    """Force refresh of job listings"""
-    try:
-        # Set loading state
-        session['is_loading'] = True
-        
-        # Get existing query and location
-        query = request.args.get('query', 'All')
-        location = request.args.get('location', 'All')
-        
-        # Get user's skills from session and profile
-        resume_skills = []
-        profile_skills = []
-        
-        # Get skills from session with user-specific key
-        session_skills = session.get(f'user_{current_user.id}_resume_skills', [])
-        if session_skills:
-            if isinstance(session_skills, str):
-                resume_skills.extend(s.strip() for s in session_skills.split(',') if s.strip())
-            elif isinstance(session_skills, list):
-                resume_skills.extend(s.strip() for s in session_skills if s.strip())
-        
-        # Get skills from user profile
-        if current_user.skills:
-            profile_skills = [s.strip() for s in current_user.skills.split(',') if s.strip()]
-            
-        # Combine all skills and remove duplicates
-        all_skills = list(set(resume_skills + profile_skills))
-        
-        # Check if user has any skills
-        if not all_skills:
-            flash('⚠️ Please add skills to your profile or upload your resume to see relevant job matches.', 'warning')
-            session.pop('is_loading', None)
-            return jsonify({'success': False, 'message': 'No skills found'})
+    """Queue a forced refresh of job listings and return its task id."""
+    is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    
+    # Get existing query and location
+    query = request.args.get('query', 'All')
+    location = request.args.get('location', 'All')
+    
+    # Get user's skills from session and profile
+    resume_skills = []
+    profile_skills = []
+    
+    # Get skills from session with user-specific key
+    session_skills = session.get(f'user_{current_user.id}_resume_skills', [])
+    if session_skills:
+        if isinstance(session_skills, str):
+            resume_skills.extend(s.strip() for s in session_skills.split(',') if s.strip())
+        elif isinstance(session_skills, list):
+            resume_skills.extend(s.strip() for s in session_skills if s.strip())
+    
+    # Get skills from user profile
+    if current_user.skills:
+        profile_skills = [s.strip() for s in current_user.skills.split(',') if s.strip()]
         
+    # Combine all skills and remove duplicates
+    all_skills = list(set(resume_skills + profile_skills))
+    
+    # Check if user has any skills
+    if not all_skills:
+        flash('⚠️ Please add skills to your profile or upload your resume to see relevant job matches.', 'warning')
+        return jsonify({'success': False, 'message': 'No skills found'})
+    
+    # Don't queue a second refresh while one is queued or running for this account
+    active_task = get_active_task(current_user.id)
+    if active_task:
+        result = {'success': True, 'task_id': active_task['id'], 'status': active_task['status'], 'in_progress': True}
+    else:
         # Clear any existing flash messages to avoid contradictory messaging
         session['_flashes'] = []
         
         # Clean up any data that needs refreshing when jobs change
         cleanup_job_related_data()
         
-        # Run the scraper with force_clear=True to get fresh data
-        jobs = scrape_jobs(
+        # Queue the scraper with force_clear=True to get fresh data
+        task_id = enqueue_scrape(
+            current_user.id,
             query=query,
             location=location,
             user_skills=all_skills,
             pages=3,
             force_clear=True,  # Always force clear for refresh operation
-            user_id=current_user.id
+            priority=PRIORITY_INTERACTIVE
         )
-        
-        # Update last scrape time - do this even if no jobs were found
-        session['last_scrape_time'] = datetime.utcnow().isoformat()
-        
-        if jobs:
-            flash(f'Successfully found {len(jobs)} jobs!', 'success')
-            result = {'success': True, 'count': len(jobs)}
+        if task_id:
+            session['scrape_task_id'] = task_id
+            session['last_scrape_time'] = datetime.utcnow().isoformat()
+            result = {'success': True, 'task_id': task_id, 'status': 'queued'}
         else:
-            flash('No jobs found. Try adjusting your search criteria.', 'info')
-            result = {'success': True, 'count': 0}
-            
-    except Exception as e:
-        error_message = str(e)
-        flash(f'Error refreshing jobs: {error_message}', 'danger')
-        result = {'success': False, 'error': error_message}
-    finally:
-        # Clear loading state
-        session.pop('is_loading', None)
+            result = {'success': False, 'error': 'Could not queue a job refresh'}
     
     # Check if this is an AJAX request
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+    if is_ajax:
         return jsonify(result)
+    if result['success']:
+        flash('Refreshing your job matches in the background...', 'info')
     else:
-        return redirect(request.referrer or url_for('list_all_jobs'))
+        flash(f"Error refreshing jobs: {result['error']}", 'danger')
+    return redirect(request.referrer or url_for('list_all_jobs'))
 
 
 @app.route('/scrape_jobs_with_profile', methods=['GET'])
 @login_required
 def scrape_jobs_with_profile():
-    """Scrape jobs using the user's profile information."""
-    try:
-        # Set loading state
-        session['is_loading'] = True
-        
-        if not current_user.is_authenticated:
-            flash('Please login to search jobs.', 'warning')
-            return redirect(url_for('login'))
-
-        # Get user profile information
-        user = User.query.get(current_user.id)
-        if not user:
-            flash('User profile not found.', 'error')
-            return redirect(url_for('profile'))
-        
-        # Get skills from session and profile
-        resume_skills = []
-        profile_skills = []
-        
-        # Get skills from session with user-specific key
-        session_skills = session.get(f'user_{current_user.id}_resume_skills', [])
-        if session_skills:
-            if isinstance(session_skills, str):
-                resume_skills.extend(s.strip() for s in session_skills.split(',') if s.strip())
-            elif isinstance(session_skills, list):
-                resume_skills.extend(s.strip() for s in session_skills if s.strip())
-        
-        # Get skills from user profile
-        if user.skills:
-            profile_skills = [s.strip() for s in user.skills.split(',') if s.strip()]
-            
-        # Combine all skills and remove duplicates
-        all_skills = list(set(resume_skills + profile_skills))
-        
-        # Check if user has any skills
-        if not all_skills:
-            flash('⚠️ Please add skills to your profile or upload your resume to see relevant job matches.', 'warning')
-            session.pop('is_loading', None)
-            return redirect(url_for('profile'))
-        
-        user_location = user.location if user.location else "All"
-        
-        # Clean up any data that needs refreshing when jobs change
-        cleanup_job_related_data()
-        
-        # Run the job scraper with the user's profile data
-        jobs = scrape_jobs(
-            query="All",  # Use "All" since we're using skills directly
-            location=user_location,
-            user_skills=all_skills,
-            pages=3,  # Scrape 3 pages by default
-            force_clear=True,  # Clear existing jobs to get fresh results
-            user_id=user.id  # Explicitly pass user.id
-        )
-        
-        # Update last scrape time
-        session['last_scrape_time'] = datetime.utcnow().isoformat()
-        
-        if jobs:
-            flash(f'Successfully scraped {len(jobs)} jobs matching your profile!', 'success')
-        else:
-            flash('No jobs found matching your profile. Try adjusting your skills or location.', 'info')
+    """Queue a scrape using the user's profile information."""
+    # Get user profile information
+    user = User.query.get(current_user.id)
+    if not user:
+        flash('User profile not found.', 'error')
+        return redirect(url_for('profile'))
+    
+    # Get skills from session and profile
+    resume_skills = []
+    profile_skills = []
+    
+    # Get skills from session with user-specific key
+    session_skills = session.get(f'user_{current_user.id}_resume_skills', [])
+    if session_skills:
+        if isinstance(session_skills, str):
+            resume_skills.extend(s.strip() for s in session_skills.split(',') if s.strip())
+        elif isinstance(session_skills, list):
+            resume_skills.extend(s.strip() for s in session_skills if s.strip())
+    
+    # Get skills from user profile
+    if user.skills:
+        profile_skills = [s.strip() for s in user.skills.split(',') if s.strip()]
         
-        # Clear loading state
-        session.pop('is_loading', None)
+    # Combine all skills and remove duplicates
+    all_skills = list(set(resume_skills + profile_skills))
+    
+    # Check if user has any skills
+    if not all_skills:
+        flash('⚠️ Please add skills to your profile or upload your resume to see relevant job matches.', 'warning')
+        return redirect(url_for('profile'))
+    
+    # A run that is already queued or running will pick up the same profile
+    if get_active_task(user.id):
+        flash('A job search for your profile is already running.', 'info')
         return redirect(url_for('list_all_jobs'))
-        
-    except Exception as e:
-        flash(f'Error scraping jobs: {str(e)}', 'error')
-        # Clear loading state
-        session.pop('is_loading', None)
+    
+    user_location = user.location if user.location else "All"
+    
+    if not admit_scrape(PRIORITY_PROFILE, has_cached_results=count_user_jobs(user.id) > 0):
+        flash('The job search is busy right now. Showing your saved matches, which may be out of date.', 'warning')
         return redirect(url_for('list_all_jobs'))
+    
+    # Clean up any data that needs refreshing when jobs change
+    cleanup_job_related_data()
+    
+    # Queue the job scraper with the user's profile data
+    task_id = enqueue_scrape(
+        user.id,
+        query="All",  # Use "All" since we're using skills directly
+        location=user_location,
+        user_skills=all_skills,
+        pages=3,  # Scrape 3 pages by default
+        force_clear=True,  # Clear existing jobs to get fresh results
+        priority=PRIORITY_PROFILE
+    )
+    
+    if task_id:
+        session['scrape_task_id'] = task_id
+        session['last_scrape_time'] = datetime.utcnow().isoformat()
+        flash('Searching for jobs matching your profile...', 'info')
+    else:
+        flash('Error scraping jobs: could not queue the search.', 'error')
+    return redirect(url_for('list_all_jobs'))
 
 
 @app.route('/check_refresh_status', methods=['GET'])
 @login_required
 def check_refresh_status():
-    """Check if jobs are still being loaded."""
+    """Report the progress of the user's current (or given) scrape run."""
     from utils import needs_refresh
     
-    # Get loading status
-    is_loading = session.get('is_loading', False)
+    # Look up the requested run, falling back to the user's active or latest run
+    task_id = request.args.get('task_id', type=int) or session.get('scrape_task_id')
+    task = get_task(task_id, user_id=current_user.id) if task_id else None
+    if not task or task['status'] not in ('queued', 'running'):
+        task = get_active_task(current_user.id) or task or get_latest_task(current_user.id)
+    
+    is_loading = bool(task and task['status'] in ('queued', 'running'))
     
     # Get job count for current user
     job_count = count_user_jobs(current_user.id)
     
-    # Get last scrape time
+    # Get last scrape time, preferring when the last run actually finished
     last_scrape = session.get('last_scrape_time')
+    if task and task.get('finished_at'):
+        last_scrape = datetime.strptime(task['finished_at'], '%Y-%m-%d %H:%M:%S').isoformat()
+    # A batch scrape may have refreshed the user's jobs more recently
+    last_refresh = get_user_last_refresh(current_user.id)
+    if last_refresh:
+        last_refresh = datetime.strptime(last_refresh, '%Y-%m-%d %H:%M:%S').isoformat()
+        if not last_scrape or last_refresh > last_scrape:
+            last_scrape = last_refresh
     
     # Format last scrape time for display
     formatted_last_scrape = None
@@ -1488,8 +1414,23 @@ def check_refresh_status():
     # Check if we need a refresh based on time
     needs_time_refresh = needs_refresh(last_scrape, hours_threshold=6)
     
+    task_status = None
+    if task:
+        task_status = {
+            'id': task['id'],
+            'status': task['status'],
+            'searches_done': task['progress'].get('searches_done', 0),
+            'searches_total': task['progress'].get('searches_total', 0),
+            'jobs_found': task['jobs_found'],
+            'error': task['error'],
+            'created_at': task['created_at'],
+            'started_at': task['started_at'],
+            'finished_at': task['finished_at']
+        }
+    
     return jsonify({
         'loading': is_loading,
+        'task': task_status,
         'job_count': job_count,
         'last_scrape': last_scrape,
         'formatted_last_scrape': formatted_last_scrape,
@@ -1641,6 +1582,101 @@ def init_db_command():
         logger.error(f"Error initializing database: {e}")
         logger.error(traceback.format_exc())
 
+@app.cli.command("scrape-worker")
+@click.option('--once', is_flag=True, help='Process at most one queued scrape, then exit.')
+@click.option('--poll-interval', default=2.0, show_default=True, help='Seconds to wait when the queue is empty.')
+def scrape_worker_command(once, poll_interval):
+    """Run queued job scrapes in the background."""
+    try:
+        # Make sure the queue table exists before polling it
+        if needs_initialization():
+            init_db()
+        # The dedicated worker process runs NLP on the other CPU cores
+        enable_nlp_pool()
+        logger.info("Starting scrape worker...")
+        run_worker(poll_interval=poll_interval, once=once)
+    except KeyboardInterrupt:
+        logger.info("Scrape worker interrupted")
+
+@app.cli.command("prescrape")
+@click.option('--dry-run', is_flag=True, help='Only print the users and searches that would be pre-scraped.')
+def prescrape_command(dry_run):
+    """Pre-scrape jobs for users who are likely to visit soon."""
+    from scrape_planner import run_prescrape
+    if needs_initialization():
+        init_db()
+    enable_nlp_pool()
+    summary = run_prescrape(dry_run=dry_run)
+    click.echo(
+        f"{summary['users']} users expected soon, {summary['queries']} queries: {summary['run']} run, "
+        f"{summary['deferred']} deferred by the request budget, {summary['failed']} failed, "
+        f"{summary['requests']} requests, {summary['links']} user/job links"
+    )
+
+@app.cli.command("batch-scrape")
+@click.option('--pages', default=1, show_default=True, help='Starting results pages per search.')
+@click.option('--active-days', default=14, show_default=True, help='Include users active within this many days.')
+@click.option('--dry-run', is_flag=True, help='Only print the planned searches.')
+def batch_scrape_command(pages, active_days, dry_run):
+    """Scrape every active user's skills once and share the results."""
+    from scrape_planner import run_batch_scrape
+    if needs_initialization():
+        init_db()
+    enable_nlp_pool()
+    summary = run_batch_scrape(pages=pages, active_days=active_days, dry_run=dry_run)
+    click.echo(
+        f"{summary['users']} users, {summary['pairs']} skill/location pairs, {summary['queries']} queries "
+        f"(instead of {summary['per_user_searches']} per-user searches), "
+        f"{summary['links']} user/job links, {summary['failed']} failed"
+    )
+
+@app.cli.command("import-jobs")
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['jsonl', 'csv']), default=None,
+              help='Feed format; guessed from the file name if omitted.')
+@click.option('--batch-size', default=500, show_default=True, help='Records saved per transaction.')
+@click.option('--user-id', type=int, default=None, help='Also link the imported jobs to this user.')
+@click.option('--no-extract', is_flag=True, help='Skip skill extraction; keep only the skills in the feed.')
+@click.option('--limit', type=int, default=None, help='Stop after this many records.')
+def import_jobs_command(path, fmt, batch_size, user_id, no_extract, limit):
+    """Stream a JSON Lines or CSV job feed into the database."""
+    from job_importer import import_jobs
+    if needs_initialization():
+        init_db()
+    summary = import_jobs(path, fmt=fmt, batch_size=batch_size, user_id=user_id, extract=not no_extract,
+                          limit=limit)
+    if summary is None:
+        raise click.ClickException(f"Could not import {path}")
+    click.echo(
+        f"{summary['records']} records: {summary['saved']} jobs saved ({summary['new']} new, "
+        f"{summary['updated']} updated), {summary['skipped']} skipped, {summary['duplicates']} duplicates, "
+        f"{summary['failed']} failed "
+        f"in {summary['seconds']:.1f}s ({summary['jobs_per_second']:.1f} jobs/s)"
+    )
+
+@app.cli.command("scrape-report")
+@click.option('--days', default=7, show_default=True, help='Report on scrape runs within this many days.')
+@click.option('--bucket-hours', default=24, show_default=True, help='Width of each report row in hours.')
+@click.option('--user-id', type=int, default=None, help="Only this user's scrape runs.")
+def scrape_report_command(days, bucket_hours, user_id):
+    """Show request rate and fetch latency trends from the scrape run ledger."""
+    from database_manager import get_scrape_runs
+    from scrape_profiler import summarize_runs, format_run_summary
+    if needs_initialization():
+        init_db()
+    runs = get_scrape_runs(days=days, user_id=user_id)
+    if not runs:
+        click.echo(f"No scrape runs in the last {days} day(s)")
+        return
+    click.echo(format_run_summary(summarize_runs(runs, bucket_hours=bucket_hours)))
+    stage_totals = {}
+    for run in runs:
+        for stage, seconds in run['stage_seconds'].items():
+            stage_totals[stage] = stage_totals.get(stage, 0) + seconds
+    click.echo("Time per stage: " + ', '.join(
+        f"{stage} {seconds:.1f}s" for stage, seconds in sorted(stage_totals.items(), key=lambda item: -item[1])
+    ))
+
 if __name__ == '__main__':
     try:
         # Ensure the instance directory exists
@@ -1653,6 +1689,11 @@ if __name__ == '__main__':
             db.create_all()
             init_db()  # Initialize database tables
             
+            # Process queued scrapes in this process when no separate worker runs
+            if app.config.get('EMBEDDED_SCRAPE_WORKER'):
+                from scrape_queue import start_embedded_worker
+                start_embedded_worker()
+            
             # Clean up old graph files on startup
             graphs_dir = os.path.join('static', 'graphs')
             if os.path.exists(graphs_dir):
@@ -97,26 +97,10 @@ try:
         # Check if jobs table exists
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='jobs'")
         if cursor.fetchone():
-            # Check if user_id column exists and is properly configured
-            cursor.execute("PRAGMA table_info(jobs)")
-            columns = [column for column in cursor.fetchall()]
-            user_id_column = None
-            
-            for column in columns:
-                if column[1] == 'user_id':
-                    user_id_column = column
-                    break
-                    
-            if user_id_column is None:
-                logger.info("Adding user_id column to jobs table...")
-                cursor.execute("ALTER TABLE jobs ADD COLUMN user_id INTEGER")
-                conn.commit()
-                logger.info("Added user_id column to jobs table")
-            
-            # Update any NULL user_id values to default user
-            cursor.execute("UPDATE jobs SET user_id = 1 WHERE user_id IS NULL")
-            conn.commit()
-            logger.info("Updated any NULL user_id values to default user (1)")
+            # Jobs are shared between users; ownership lives in user_jobs
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user_jobs'")
+            if not cursor.fetchone():
+                logger.warning("user_jobs table missing - run init_database.py to migrate the jobs table")
             
             # Check if any jobs exist
             cursor.execute("SELECT COUNT(*) FROM jobs")
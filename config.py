@@ -34,11 +34,11 @@ class Config:
     db_uri = f'sqlite:///{db_path.replace(os.sep, "/")}'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', db_uri)
     
-    # Additional SQLite optimizations
+    # Additional SQLite optimizations; journal mode, lock timeout and cache
+    # pragmas are set on connect from database_manager.SQLITE_PRAGMAS
     SQLALCHEMY_ENGINE_OPTIONS = {
         'connect_args': {
-            'check_same_thread': False,  # Allow multithreaded access
-            'timeout': 30  # Increase timeout for busy situations
+            'check_same_thread': False  # Allow multithreaded access
         },
         'pool_recycle': 3600,  # Recycle connections after 1 hour
         'pool_pre_ping': True  # Check connections before using them
@@ -47,6 +47,13 @@ class Config:
     # Log the database URI being used
     logger.info(f"SQLite database URI: {SQLALCHEMY_DATABASE_URI}")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # Run queued scrapes on a background thread of one web process per host.
+    # The queue lives in the SQLite file, so disable this only when a separate
+    # `flask scrape-worker` process runs on the same disk as the web service;
+    # on hosts where each process gets its own filesystem the queue would
+    # never be read.
+    EMBEDDED_SCRAPE_WORKER = os.environ.get('EMBEDDED_SCRAPE_WORKER', 'true').lower() in ('true', '1', 't')
 
 class DevelopmentConfig(Config):
     """Development configuration."""
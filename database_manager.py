@@ -1,9 +1,14 @@
 import sqlite3
 import os
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
+import time
 import logging
+import threading
 import traceback
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import scrape_profiler
 
 # Configure logging
 logging.basicConfig(
@@ -18,8 +23,103 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 instance_dir = os.path.join(basedir, 'instance')
 DB_PATH = os.path.join(instance_dir, 'job_recommender.db')
 
-def get_db_connection():
-    """Create a connection to the SQLite database."""
+# Tables initialize_database creates; used to detect an outdated schema
+REQUIRED_TABLES = {'user', 'work_experience', 'education', 'jobs', 'user_jobs', 'job_skills', 'scrape_tasks', 'search_seen_urls',
+                   'crawl_checkpoints', 'search_yields', 'user_refreshes', 'user_visits', 'scheduler_state',
+                   'scrape_runs', 'jobs_fts'}
+
+# Columns added to jobs after its original layout; initialize_database adds
+# them to existing databases
+JOBS_ADDED_COLUMNS = {
+    'detail_status': 'TEXT',  # 'pending' until the detail page was fetched
+    'detail_attempts': 'INTEGER DEFAULT 0',
+    'detail_requested_at': 'TIMESTAMP',  # First time a user viewed the pending job
+    'source': 'TEXT',  # job_sources name of the site the listing came from; NULL means Adzuna
+    'job_skills_text': 'TEXT'  # The job's job_skills rows, space separated, for jobs_fts
+}
+
+# Columns added to scrape_tasks after its original layout
+SCRAPE_TASKS_ADDED_COLUMNS = {
+    'priority': 'INTEGER DEFAULT 0'  # scrape_queue priority class, most urgent first
+}
+
+# Secondary indexes of the hot queries: name -> table (columns). The
+# 20261019_hot_query_indexes migration creates the same set. user_jobs needs
+# no user_id index of its own; its (user_id, job_id) primary key covers that.
+INDEXES = {
+    # Skills join, GROUP_CONCAT(js.skill) and the EXISTS subquery of search_jobs_db, read from the index alone
+    'idx_job_skills_job_id_skill': 'job_skills (job_id, skill)',
+    # Jobs by skill, and DISTINCT skill lists
+    'idx_job_skills_skill_job_id': 'job_skills (skill, job_id)',
+    # Users of a job, and the ON DELETE CASCADE from jobs
+    'idx_user_jobs_job_id': 'user_jobs (job_id, user_id)',
+    # Duplicate check of listings without a source URL in _upsert_job
+    'idx_jobs_title_company_no_url': 'jobs (title, company) WHERE source_url IS NULL',
+    # Duplicate check of listings keyed by their source's job ID
+    'idx_jobs_job_id_no_url': 'jobs (job_id) WHERE source_url IS NULL',
+    'idx_jobs_detail_status': 'jobs (detail_status, detail_attempts)',
+    'idx_scrape_tasks_status': 'scrape_tasks (status, priority, created_at)',
+    'idx_scrape_tasks_user_id': 'scrape_tasks (user_id, status)',
+    'idx_scrape_runs_started_at': 'scrape_runs (started_at)',
+    # Per-user request totals of claim_next_task's fair share ordering
+    'idx_scrape_runs_user_id': 'scrape_runs (user_id, started_at, http_requests)'
+}
+
+# Full-text index of the jobs table (rowid = jobs.id). It is an external-content
+# index: the text stays in jobs only, and job_skills reach it through the
+# jobs.job_skills_text column that add_job_skills refreshes once per job.
+JOBS_FTS_COLUMNS = ('title', 'company', 'description', 'skills', 'job_skills_text')
+JOBS_FTS_WEIGHTS = (10.0, 5.0, 1.0, 3.0, 3.0)  # bm25 weights of JOBS_FTS_COLUMNS
+_JOBS_FTS_VALUES = {row: ', '.join(f"{row}.{column}" for column in ('id',) + JOBS_FTS_COLUMNS) for row in ('new', 'old')}
+_JOBS_FTS_INSERT = f"INSERT INTO jobs_fts (rowid, {', '.join(JOBS_FTS_COLUMNS)}) VALUES ({_JOBS_FTS_VALUES['new']});"
+_JOBS_FTS_DELETE = (f"INSERT INTO jobs_fts (jobs_fts, rowid, {', '.join(JOBS_FTS_COLUMNS)}) "
+                    f"VALUES ('delete', {_JOBS_FTS_VALUES['old']});")
+# Triggers keeping jobs_fts in step with jobs
+JOBS_FTS_TRIGGERS = {
+    'jobs_fts_insert': f"AFTER INSERT ON jobs BEGIN {_JOBS_FTS_INSERT} END",
+    'jobs_fts_update': (
+        f"AFTER UPDATE OF {', '.join(JOBS_FTS_COLUMNS)} ON jobs BEGIN {_JOBS_FTS_DELETE} {_JOBS_FTS_INSERT} END"
+    ),
+    'jobs_fts_delete': f"AFTER DELETE ON jobs BEGIN {_JOBS_FTS_DELETE} END"
+}
+
+# Detail enrichment states
+DETAIL_PENDING = 'pending'
+DETAIL_FAILED = 'failed'
+
+# Query parameters that only carry tracking state and never identify a listing
+TRACKING_QUERY_PARAMS = {'se', 'v', 'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content'}
+
+# Idle connections kept per thread; nested borrows each take their own
+POOL_SIZE = 4
+
+# Settings for every connection to the database, raw sqlite3 and SQLAlchemy
+# alike (see configure_connection). In WAL mode page loads keep reading while
+# a scrape writes, and commits only need to sync the log.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 30000,  # ms to wait for a lock before "database is locked"
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),  # Stored in the database file
+    'synchronous': 'NORMAL',  # Safe with WAL: an OS crash can only lose the last commits
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -16000,  # Negative means KiB, per connection
+    'temp_store': 'MEMORY'
+}
+
+# Per-thread lists of idle connections, reused instead of reconnecting on every call
+_pool = threading.local()
+
+def configure_connection(conn):
+    """
+    Apply SQLITE_PRAGMAS to a newly opened connection.
+    
+    Args:
+        conn (sqlite3.Connection): The connection, raw or from SQLAlchemy's pool
+    """
+    for name, value in SQLITE_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+def _connect():
+    """Open a connection to the SQLite database and configure it once."""
     # Ensure the instance directory exists
     if not os.path.exists(instance_dir):
         try:
@@ -28,18 +128,131 @@ def get_db_connection():
         except Exception as e:
             logger.error(f"Error creating instance directory: {e}")
     
-    # Log database access attempt
-    logger.info(f"Attempting to connect to database at {DB_PATH}")
-    
     try:
         conn = sqlite3.connect(DB_PATH)
         conn.row_factory = sqlite3.Row  # This enables column access by name
-        logger.info("Database connection successful")
+        configure_connection(conn)
+        conn.execute('PRAGMA foreign_keys = ON')
+        logger.debug(f"Opened database connection to {DB_PATH}")
         return conn
     except sqlite3.Error as e:
         logger.error(f"Database connection error: {e}")
         raise
 
+def _release(conn, path):
+    """Return a connection to this thread's pool, discarding any uncommitted changes."""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = sqlite3.Row
+    except sqlite3.Error as e:
+        logger.warning(f"Dropping pooled database connection: {e}")
+        conn.close()
+        return
+    idle = getattr(_pool, 'idle', None)
+    if idle is None:
+        idle = _pool.idle = []
+    if path != DB_PATH or len(idle) >= POOL_SIZE:
+        conn.close()
+    else:
+        idle.append((path, conn))
+
+class PooledConnection:
+    """
+    A sqlite3 connection borrowed from the calling thread's pool.
+    
+    Behaves like the sqlite3.Connection it wraps, except that close()
+    returns it to the pool (rolling back anything uncommitted) instead of
+    closing it. Use it from the thread that borrowed it.
+    """
+    
+    __slots__ = ('_conn', '_path')
+    
+    def __init__(self, conn, path):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_path', path)
+    
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database connection")
+        return getattr(self._conn, name)
+    
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+    
+    def __enter__(self):
+        # Like sqlite3.Connection: a transaction scope, not a close
+        self._conn.__enter__()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+    
+    def close(self):
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, '_conn', None)
+            _release(conn, self._path)
+
+def get_db_connection():
+    """
+    Get a configured connection to the SQLite database from this thread's pool.
+    
+    Connections are opened (and their pragmas set) once per thread and
+    reused; call close() when done to hand the connection back, or use
+    db_connection().
+    
+    Returns:
+        PooledConnection: The borrowed connection
+    """
+    idle = getattr(_pool, 'idle', None)
+    while idle:
+        path, conn = idle.pop()
+        if path == DB_PATH:
+            return PooledConnection(conn, path)
+        conn.close()
+    return PooledConnection(_connect(), DB_PATH)
+
+@contextmanager
+def db_connection():
+    """
+    Borrow a pooled connection for the duration of a with block.
+    
+    Changes must be committed inside the block; anything left uncommitted is
+    rolled back when the connection is returned.
+    
+    Yields:
+        PooledConnection: The borrowed connection
+    """
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def normalize_source_url(url):
+    """
+    Normalize a listing URL so the same job always maps to the same key.
+    
+    Lowercases the scheme and host, drops the fragment, trailing slashes and
+    tracking parameters, and sorts the remaining query parameters.
+    
+    Args:
+        url (str): Listing URL as scraped
+        
+    Returns:
+        str: Normalized URL, or None if no URL was given
+    """
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_QUERY_PARAMS
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
 def initialize_database():
     """Initialize database tables if they don't exist."""
     conn = None
@@ -108,41 +321,27 @@ def initialize_database():
                 FOREIGN KEY (user_id) REFERENCES user (id)
             )
         ''')
-          # Create jobs table
+        # Migrate a per-user jobs table to the shared corpus layout
+        cursor.execute("PRAGMA table_info(jobs)")
+        if 'user_id' in {row[1] for row in cursor.fetchall()}:
+            logger.info("Migrating per-user jobs table to shared job corpus...")
+            _migrate_jobs_to_shared_corpus(conn)
+        
+        # Create jobs table - one row per distinct listing, shared by all users
         logger.info("Creating jobs table...")
+        _create_jobs_table(cursor)
+        _add_missing_columns(cursor, 'jobs', JOBS_ADDED_COLUMNS)
+        
+        # Create user_jobs association table
+        logger.info("Creating user_jobs table...")
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS jobs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,  /* Allow NULL for backward compatibility */
-                job_id TEXT,
-                title TEXT,
-                company TEXT,
-                location TEXT,
-                url TEXT,
-                description TEXT,
-                required_skills TEXT,
-                nice_to_have_skills TEXT,
-                salary_min INTEGER,
-                salary_max INTEGER,
-                salary_currency TEXT,
-                salary_period TEXT,
-                job_type TEXT,
-                employment_type TEXT,
-                source_url TEXT,
-                date_posted TIMESTAMP,
-                date_scraped TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_remote BOOLEAN DEFAULT FALSE,
-                experience_level TEXT,
-                education_required TEXT,
-                company_industry TEXT,
-                location_type TEXT,
-                skills TEXT,
-                is_new BOOLEAN DEFAULT TRUE,
-                is_urgent BOOLEAN DEFAULT FALSE,
-                is_saved BOOLEAN DEFAULT FALSE,
-                status TEXT DEFAULT 'new',
-                FOREIGN KEY (user_id) REFERENCES user (id),
-                UNIQUE (user_id, source_url) ON CONFLICT REPLACE
+            CREATE TABLE IF NOT EXISTS user_jobs (
+                user_id INTEGER NOT NULL,
+                job_id INTEGER NOT NULL,
+                date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, job_id),
+                FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE,
+                FOREIGN KEY (job_id) REFERENCES jobs (id) ON DELETE CASCADE
             )
         ''')
         
@@ -159,6 +358,137 @@ def initialize_database():
             )
         ''')
         
+        # Create scrape_tasks table - the durable background scrape queue
+        logger.info("Creating scrape_tasks table...")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scrape_tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                query TEXT,
+                location TEXT,
+                skills TEXT,
+                pages INTEGER DEFAULT 1,
+                force_clear BOOLEAN DEFAULT FALSE,
+                status TEXT NOT NULL DEFAULT 'queued',
+                progress TEXT,
+                jobs_found INTEGER DEFAULT 0,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                worker_id TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                heartbeat_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                priority INTEGER DEFAULT 0,
+                FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE
+            )
+        ''')
+        _add_missing_columns(cursor, 'scrape_tasks', SCRAPE_TASKS_ADDED_COLUMNS)
+        
+        # Create search_seen_urls table - listings returned by each (query, location)
+        logger.info("Creating search_seen_urls table...")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS search_seen_urls (
+                query_key TEXT NOT NULL,
+                location_key TEXT NOT NULL,
+                source_url TEXT NOT NULL,
+                first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (query_key, location_key, source_url)
+            )
+        ''')
+        
+        # Create crawl_checkpoints table - resumable frontier of each scrape run
+        logger.info("Creating crawl_checkpoints table...")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+                task_id INTEGER PRIMARY KEY,
+                state TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (task_id) REFERENCES scrape_tasks (id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # Create search_yields table - how many new listings each search's pages produce
+        logger.info("Creating search_yields table...")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS search_yields (
+                query_key TEXT NOT NULL,
+                location_key TEXT NOT NULL,
+                runs INTEGER DEFAULT 0,
+                pages_fetched INTEGER DEFAULT 0,
+                new_listings INTEGER DEFAULT 0,
+                avg_new_per_page REAL DEFAULT 0,
+                last_depth INTEGER DEFAULT 0,
+                last_run TIMESTAMP,
+                PRIMARY KEY (query_key, location_key)
+            )
+        ''')
+        
+        # Create user_refreshes table - when each user's jobs were last scraped
+        logger.info("Creating user_refreshes table...")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_refreshes (
+                user_id INTEGER PRIMARY KEY,
+                refreshed_at TIMESTAMP NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # Create user_visits table - when users open their job list, for visit prediction
+        logger.info("Creating user_visits table...")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_visits (
+                user_id INTEGER NOT NULL,
+                visited_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (user_id, visited_at),
+                FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # Create scheduler_state table - request budgets and last runs shared by all processes
+        logger.info("Creating scheduler_state table...")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scheduler_state (
+                name TEXT PRIMARY KEY,
+                tokens REAL,
+                tokens_updated_at REAL,
+                last_run REAL
+            )
+        ''')
+        
+        # Create scrape_runs table - one ledger row per scrape run, for capacity planning
+        logger.info("Creating scrape_runs table...")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scrape_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                kind TEXT NOT NULL,
+                query TEXT,
+                location TEXT,
+                pages INTEGER,
+                started_at TIMESTAMP NOT NULL,
+                duration_seconds REAL,
+                http_requests INTEGER DEFAULT 0,
+                http_retries INTEGER DEFAULT 0,
+                bytes_downloaded INTEGER DEFAULT 0,
+                cache_hits INTEGER DEFAULT 0,
+                jobs_new INTEGER DEFAULT 0,
+                jobs_updated INTEGER DEFAULT 0,
+                jobs_unchanged INTEGER DEFAULT 0,
+                errors INTEGER DEFAULT 0,
+                fetch_ms_mean REAL,
+                fetch_ms_p95 REAL,
+                stage_seconds TEXT
+            )
+        ''')
+        # Create the full-text index used by job search
+        logger.info("Creating jobs_fts full-text index...")
+        _create_jobs_fts(cursor)
+        
+        for name, columns in INDEXES.items():
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+        
         conn.commit()
         logger.info("Database tables created successfully!")
         
@@ -193,6 +523,42 @@ def initialize_database():
         if conn:
             conn.close()
 
+def needs_initialization():
+    """
+    Check whether initialize_database must run to bring the schema up to date.
+    
+    Returns:
+        bool: True if a required table, index or trigger is missing, the jobs table
+            still uses the legacy per-user layout, or jobs or scrape_tasks lacks
+            a newer column
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        tables = {row[0] for row in cursor.fetchall()}
+        if not REQUIRED_TABLES.issubset(tables):
+            return True
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        if not set(INDEXES).issubset(row[0] for row in cursor.fetchall()):
+            return True
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='trigger'")
+        if not set(JOBS_FTS_TRIGGERS).issubset(row[0] for row in cursor.fetchall()):
+            return True
+        cursor.execute("PRAGMA table_info(jobs)")
+        job_columns = {row[1] for row in cursor.fetchall()}
+        if 'user_id' in job_columns or not set(JOBS_ADDED_COLUMNS).issubset(job_columns):
+            return True
+        cursor.execute("PRAGMA table_info(scrape_tasks)")
+        return not set(SCRAPE_TASKS_ADDED_COLUMNS).issubset(row[1] for row in cursor.fetchall())
+    except sqlite3.Error as e:
+        logger.error(f"Error checking database schema: {e}")
+        return True
+    finally:
+        if conn:
+            conn.close()
+
 def create_test_user():
     """Create a test user for development."""
     conn = None
@@ -275,18 +641,17 @@ def check_database():
 
 def clear_jobs_table():
     """Clear all jobs from the database to prepare for fresh scraping."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("DELETE FROM jobs")
-        conn.commit()
-        print("Jobs table cleared for fresh scraping.")
-    except sqlite3.Error as e:
-        print(f"Error clearing jobs table: {e}")
-        conn.rollback()  # Rollback any changes in case of error
-        raise  # Re-raise the exception to be handled upstream
-    finally:
-        conn.close()
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM user_jobs")
+            cursor.execute("DELETE FROM jobs")
+            conn.commit()
+            logger.info("Jobs table cleared for fresh scraping.")
+        except sqlite3.Error as e:
+            logger.error(f"Error clearing jobs table: {e}")
+            conn.rollback()  # Rollback any changes in case of error
+            raise  # Re-raise the exception to be handled upstream
 
 def clear_jobs_database():
     """
@@ -296,18 +661,23 @@ def clear_jobs_database():
     cursor = conn.cursor()
     
     try:
+        cursor.execute("DELETE FROM user_jobs")
         cursor.execute("DELETE FROM jobs")
         conn.commit()
-        print("Jobs database cleared successfully")
+        logger.info("Jobs database cleared successfully")
     except Exception as e:
-        print(f"Error clearing jobs database: {e}")
+        logger.error(f"Error clearing jobs database: {e}")
         conn.rollback()
     finally:
         conn.close()
         
 def save_job_to_db(job_data, user_id):
     """
-    Save a job to the database.
+    Save a job to the shared jobs table and link it to a user.
+    
+    Jobs are keyed by normalized source_url, so a listing that was already
+    scraped for another user is updated in place and only a user_jobs link
+    is added for this user.
     
     Args:
         job_data (dict): Dictionary containing job information including skills
@@ -353,108 +723,20 @@ def save_job_to_db(job_data, user_id):
             logger.error(f"User with ID {user_id} does not exist in user table")
             return None
         
-        # Clean and prepare job data
-        job_data = _clean_job_data(job_data)
-        if not job_data:
-            return None
-            
-        job_data['user_id'] = user_id
-        job_data['date_scraped'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Serialize lists as JSON strings
-        if 'required_skills' in job_data and isinstance(job_data['required_skills'], list):
-            job_data['required_skills'] = json.dumps(job_data['required_skills'])
-        if 'nice_to_have_skills' in job_data and isinstance(job_data['nice_to_have_skills'], list):
-            job_data['nice_to_have_skills'] = json.dumps(job_data['nice_to_have_skills'])
-        if 'skills' in job_data and isinstance(job_data['skills'], list):
-            job_data['skills'] = json.dumps(job_data['skills'])
-
-        # Remove any fields that don't exist in the table
         cursor.execute("PRAGMA table_info(jobs)")
         valid_columns = {row[1] for row in cursor.fetchall()}
-        job_data = {k: v for k, v in job_data.items() if k in valid_columns}
-
-        # Check if job already exists for this user
-        cursor.execute('''
-            SELECT id FROM jobs 
-            WHERE (source_url = ? AND source_url IS NOT NULL AND user_id = ?)
-            OR (title = ? AND company = ? AND user_id = ?)
-        ''', (
-            job_data.get('source_url'),
-            user_id,
-            job_data.get('title'),
-            job_data.get('company'),
-            user_id
-        ))
-        existing_job = cursor.fetchone()
-
-        if existing_job:
-            # Update existing job
-            job_id = existing_job[0]
-            update_fields = []
-            update_values = []
-            
-            for key, value in job_data.items():
-                if key != 'id' and value is not None:
-                    update_fields.append(f"{key} = ?")
-                    update_values.append(value)
-            
-            if update_fields:
-                update_query = f'''
-                    UPDATE jobs 
-                    SET {', '.join(update_fields)}
-                    WHERE id = ? AND user_id = ?
-                '''
-                cursor.execute(update_query, update_values + [job_id, user_id])
-                conn.commit()
-                return job_id
-        else:
-            # Insert new job
-            fields = []
-            values = []
-            placeholders = []
-            
-            for key, value in job_data.items():
-                if value is not None:
-                    fields.append(key)
-                    values.append(value)
-                    placeholders.append('?')
-            
-            insert_query = f'''
-                INSERT INTO jobs ({', '.join(fields)})
-                VALUES ({', '.join(placeholders)})
-            '''
-            try:
-                cursor.execute(insert_query, values)
-                job_id = cursor.lastrowid
-                conn.commit()
-                return job_id
-            except sqlite3.IntegrityError as e:
-                if "FOREIGN KEY constraint failed" in str(e):
-                    # Handle case where user_id doesn't exist
-                    logger.warning(f"Foreign key constraint failed. Using default user instead. Error: {e}")
-                    # Update job_data to use default user (ID 1)
-                    for i, field in enumerate(fields):
-                        if field == 'user_id':
-                            values[i] = 1
-                            break
-                    # Try one more time with the default user
-                    try:
-                        cursor.execute(insert_query, values)
-                        job_id = cursor.lastrowid
-                        conn.commit()
-                        return job_id
-                    except sqlite3.Error as e2:
-                        logger.error(f"Still failed with default user: {e2}")
-                        conn.rollback()
-                        return None
-                else:
-                    logger.error(f"Failed to insert job '{job_data.get('title')}': {e}")
-                    logger.error(f"Job data: {job_data}")
-                    conn.rollback()
-                    return None
+        job_id = _upsert_job(cursor, job_data, valid_columns)
+        if job_id is None:
+            conn.rollback()
+            return None
 
-        return None
+        # Link the job to this user
+        cursor.execute(
+            "INSERT OR IGNORE INTO user_jobs (user_id, job_id) VALUES (?, ?)",
+            (user_id, job_id)
+        )
+        conn.commit()
+        return job_id
 
     except sqlite3.Error as e:
         logger.error(f"Database error while saving job '{job_data.get('title')}': {str(e)}")
@@ -476,70 +758,856 @@ def save_job_to_db(job_data, user_id):
         if conn:
             conn.close()
 
-def add_job(job_data, skills_list=None):
-    """Add a job to the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def save_jobs_batch(jobs, user_id=None, match_title=True, duplicate_since=None):
+    """
+    Save many jobs to the shared jobs table in one transaction.
     
-    try:
-        # Get column names from the job_data dictionary
-        columns = ', '.join(job_data.keys())
-        placeholders = ', '.join(['?' for _ in job_data])
-        values = list(job_data.values())
+    Used for bulk imports, where committing per job would dominate the run
+    time. Listings already stored are updated as in save_job_to_db.
+    
+    Args:
+        jobs (list): Job dictionaries
+        user_id (int): Also link every saved job to this user, if given
+        match_title (bool): Let listings without a URL or job_id match a
+            stored one by title and company
+        duplicate_since (str): Count updates of jobs scraped at or after this
+            time ('%Y-%m-%d %H:%M:%S', UTC) as jobs_duplicate rather than
+            jobs_updated in the scrape profile
         
-        query = f"INSERT INTO jobs ({columns}) VALUES ({placeholders})"
+    Returns:
+        list: ID of each saved job, or None for jobs that were invalid,
+            in input order; an empty list if the transaction failed
+    """
+    if not jobs:
+        return []
+    with db_connection() as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA table_info(jobs)")
+            valid_columns = {row[1] for row in cursor.fetchall()}
+            job_ids = [_upsert_job(cursor, job_data, valid_columns, match_title, duplicate_since) for job_data in jobs]
+            if user_id:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO user_jobs (user_id, job_id) VALUES (?, ?)",
+                    [(user_id, job_id) for job_id in job_ids if job_id]
+                )
+            conn.commit()
+            return job_ids
+        except sqlite3.Error as e:
+            logger.error(f"Database error while saving a batch of {len(jobs)} jobs: {e}")
+            logger.error(traceback.format_exc())
+            conn.rollback()
+            return []
+
+def _upsert_job(cursor, job_data, valid_columns, match_title=True, duplicate_since=None):
+    """
+    Insert a listing into the shared jobs table, or update the stored copy of it.
+    
+    Runs inside the caller's transaction and does not commit.
+    
+    Args:
+        cursor: Cursor of the open connection
+        job_data (dict): Job information
+        valid_columns (set): Column names of the jobs table
+        match_title (bool): Let a listing without a URL or job_id match a
+            stored one by title and company
+        duplicate_since (str): Record an update of a job scraped at or after
+            this time as jobs_duplicate instead of jobs_updated
         
-        cursor.execute(query, values)
-        job_id = cursor.lastrowid
+    Returns:
+        int: ID of the stored job, or None if the listing is invalid or could not be inserted
+    """
+    # Clean and prepare job data
+    job_data = _clean_job_data(job_data)
+    if not job_data:
+        return None
         
-        # Add skills to job_skills table if provided
-        if skills_list:
-            add_job_skills(job_id, skills_list)
+    job_data['source_url'] = normalize_source_url(job_data.get('source_url') or job_data.get('url'))
+    job_data['date_scraped'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    
+    # Serialize lists as JSON strings
+    if 'required_skills' in job_data and isinstance(job_data['required_skills'], list):
+        job_data['required_skills'] = json.dumps(job_data['required_skills'])
+    if 'nice_to_have_skills' in job_data and isinstance(job_data['nice_to_have_skills'], list):
+        job_data['nice_to_have_skills'] = json.dumps(job_data['nice_to_have_skills'])
+    if 'skills' in job_data and isinstance(job_data['skills'], list):
+        job_data['skills'] = json.dumps(job_data['skills'])
+
+    # Remove any fields that don't exist in the table
+    job_data = {k: v for k, v in job_data.items() if k in valid_columns}
+
+    # Check if the listing is already in the shared corpus. Listings are keyed
+    # by their URL, then by the source's own job ID; title and company only
+    # identify listings that have neither, since one company posts the same
+    # title in several places.
+    existing_job = None
+    if job_data.get('source_url'):
+        cursor.execute("SELECT id, source_url, date_scraped FROM jobs WHERE source_url = ?", (job_data['source_url'],))
+        existing_job = cursor.fetchone()
+    elif job_data.get('job_id'):
+        cursor.execute(
+            "SELECT id, source_url, date_scraped FROM jobs WHERE source_url IS NULL AND job_id = ? LIMIT 1",
+            (str(job_data['job_id']),)
+        )
+        existing_job = cursor.fetchone()
+    elif match_title:
+        cursor.execute(
+            "SELECT id, source_url, date_scraped FROM jobs WHERE source_url IS NULL AND title = ? AND company = ? LIMIT 1",
+            (job_data.get('title'), job_data.get('company'))
+        )
+        existing_job = cursor.fetchone()
+
+    if existing_job:
+        # Update existing job, keeping the URL it is keyed by
+        job_id = existing_job['id']
+        update_fields = []
+        update_values = []
         
-        conn.commit()
-        return job_id
-    except sqlite3.Error as e:
-        print(f"Error adding job: {e}")
-        conn.rollback()
-        return None
-    finally:
-        conn.close()
+        for key, value in job_data.items():
+            if key == 'id' or (key == 'source_url' and existing_job['source_url']):
+                continue
+            if value is not None:
+                update_fields.append(f"{key} = ?")
+                update_values.append(value)
+        
+        if update_fields:
+            update_query = f'''
+                UPDATE jobs 
+                SET {', '.join(update_fields)}
+                WHERE id = ?
+            '''
+            cursor.execute(update_query, update_values + [job_id])
+        if duplicate_since and (existing_job['date_scraped'] or '') >= duplicate_since:
+            # Already saved earlier in this run, e.g. a feed listing a job twice
+            scrape_profiler.record('jobs_duplicate')
+        else:
+            scrape_profiler.record('jobs_updated')
+    else:
+        # Insert new job
+        fields = []
+        values = []
+        placeholders = []
+        
+        for key, value in job_data.items():
+            if value is not None:
+                fields.append(key)
+                values.append(value)
+                placeholders.append('?')
+        
+        insert_query = f'''
+            INSERT INTO jobs ({', '.join(fields)})
+            VALUES ({', '.join(placeholders)})
+        '''
+        try:
+            cursor.execute(insert_query, values)
+            job_id = cursor.lastrowid
+            scrape_profiler.record('jobs_new')
+        except sqlite3.IntegrityError as e:
+            logger.error(f"Failed to insert job '{job_data.get('title')}': {e}")
+            logger.error(f"Job data: {job_data}")
+            return None
+    return job_id
 
-def add_job_skills(job_id, skills):
-    """Add skills for a specific job to the job_skills table."""
-    if not skills:
-        return
+def get_job_id_by_source_url(source_url):
+    """
+    Look up a job in the shared corpus by its listing URL.
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        # First delete any existing skills for this job
-        cursor.execute("DELETE FROM job_skills WHERE job_id = ?", (job_id,))
-        
-        # Insert new skills
-        for skill in skills:
-            cursor.execute(
-                "INSERT INTO job_skills (job_id, skill) VALUES (?, ?)",
-                (job_id, skill.strip())
+    Args:
+        source_url (str): Listing URL, normalized or not
+        
+    Returns:
+        int: ID of the stored job, or None if the listing is not stored yet
+    """
+    source_url = normalize_source_url(source_url)
+    if not source_url:
+        return None
+    with db_connection() as conn:
+        row = conn.execute("SELECT id FROM jobs WHERE source_url = ?", (source_url,)).fetchone()
+        return row['id'] if row else None
+
+def link_user_job(user_id, job_id):
+    """Associate an already stored job with a user."""
+    with db_connection() as conn:
+        try:
+            conn.execute('PRAGMA foreign_keys = ON')
+            conn.execute(
+                "INSERT OR IGNORE INTO user_jobs (user_id, job_id) VALUES (?, ?)",
+                (user_id, job_id)
             )
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error linking job {job_id} to user {user_id}: {e}")
+            conn.rollback()
+            return False
+
+def unlink_user_jobs(user_id):
+    """Remove all of a user's job links, leaving the shared listings in place."""
+    with db_connection() as conn:
+        conn.execute("DELETE FROM user_jobs WHERE user_id = ?", (user_id,))
         conn.commit()
-    except sqlite3.Error as e:
-        print(f"Error adding job skills: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
 
-def get_job_skills(job_id):
-    """Get all skills for a specific job."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT skill FROM job_skills WHERE job_id = ?", (job_id,))
-    skills = [row['skill'] for row in cursor.fetchall()]
-    conn.close()
-    return skills
+def get_all_source_urls():
+    """
+    Get the listing URLs of every job in the shared corpus.
+    
+    Returns:
+        list: Normalized source URLs
+    """
+    with db_connection() as conn:
+        try:
+            rows = conn.execute("SELECT source_url FROM jobs WHERE source_url IS NOT NULL").fetchall()
+            return [row['source_url'] for row in rows]
+        except sqlite3.Error as e:
+            logger.error(f"Error loading job source URLs: {e}")
+            return []
 
-def get_all_unique_skills():
-    """Get a list of all unique skills from job_skills table."""
+def record_search_urls(query_key, location_key, source_urls):
+    """
+    Remember which listings a search returned.
+    
+    Args:
+        query_key (str): Normalized search query
+        location_key (str): Normalized search location
+        source_urls (list): Listing URLs seen on the search's results pages
+    """
+    source_urls = {normalize_source_url(url) for url in source_urls if url}
+    if not source_urls:
+        return
+    now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    with db_connection() as conn:
+        try:
+            conn.executemany(
+                '''
+                INSERT INTO search_seen_urls (query_key, location_key, source_url, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (query_key, location_key, source_url) DO UPDATE SET last_seen = excluded.last_seen
+                ''',
+                [(query_key, location_key, url, now, now) for url in source_urls]
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error recording search URLs for '{query_key}' in '{location_key}': {e}")
+            conn.rollback()
+
+def get_search_job_ids(query_key, location_key):
+    """
+    Get the stored jobs previously returned by a search, most recently seen first.
+    
+    Args:
+        query_key (str): Normalized search query
+        location_key (str): Normalized search location
+        
+    Returns:
+        list: Job IDs
+    """
+    with db_connection() as conn:
+        try:
+            rows = conn.execute(
+                '''
+                SELECT j.id FROM search_seen_urls s
+                JOIN jobs j ON j.source_url = s.source_url
+                WHERE s.query_key = ? AND s.location_key = ?
+                ORDER BY s.last_seen DESC
+                ''',
+                (query_key, location_key)
+            ).fetchall()
+            return [row['id'] for row in rows]
+        except sqlite3.Error as e:
+            logger.error(f"Error loading search history for '{query_key}' in '{location_key}': {e}")
+            return []
+
+def get_search_yield(query_key, location_key):
+    """
+    Get the page yield history of a search.
+    
+    Args:
+        query_key (str): Normalized search query
+        location_key (str): Normalized search location
+        
+    Returns:
+        dict: runs, pages_fetched, new_listings, avg_new_per_page, last_depth
+            and last_run, or None if the search never ran
+    """
+    with db_connection() as conn:
+        try:
+            row = conn.execute(
+                'SELECT * FROM search_yields WHERE query_key = ? AND location_key = ?',
+                (query_key, location_key)
+            ).fetchone()
+            return dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error loading search yield for '{query_key}' in '{location_key}': {e}")
+            return None
+
+def record_search_yield(query_key, location_key, pages_fetched, new_listings, smoothing=0.5):
+    """
+    Add one run of a search to its yield history.
+    
+    avg_new_per_page is an exponentially weighted average over runs, so a
+    query that stops producing new listings is recognised within a few runs.
+    
+    Args:
+        query_key (str): Normalized search query
+        location_key (str): Normalized search location
+        pages_fetched (int): Results pages requested in this run
+        new_listings (int): Listings on those pages that were not stored before
+        smoothing (float): Weight of this run in the average
+    """
+    if pages_fetched <= 0:
+        return
+    run_yield = new_listings / pages_fetched
+    now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    with db_connection() as conn:
+        try:
+            conn.execute(
+                '''
+                INSERT INTO search_yields (query_key, location_key, runs, pages_fetched, new_listings,
+                                           avg_new_per_page, last_depth, last_run)
+                VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+                ON CONFLICT (query_key, location_key) DO UPDATE SET
+                    runs = runs + 1,
+                    pages_fetched = pages_fetched + excluded.pages_fetched,
+                    new_listings = new_listings + excluded.new_listings,
+                    avg_new_per_page = ? * excluded.avg_new_per_page + (1 - ?) * avg_new_per_page,
+                    last_depth = excluded.last_depth,
+                    last_run = excluded.last_run
+                ''',
+                (query_key, location_key, pages_fetched, new_listings, run_yield, pages_fetched, now,
+                 smoothing, smoothing)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error recording search yield for '{query_key}' in '{location_key}': {e}")
+            conn.rollback()
+
+def get_pending_detail_jobs(limit=10, user_id=None, max_attempts=3):
+    """
+    Get jobs whose detail page still has to be fetched.
+    
+    Args:
+        limit (int): Maximum number of candidates to return
+        user_id (int): Only consider jobs linked to this user
+        max_attempts (int): Skip jobs that already failed this many times
+        
+    Returns:
+        list: Job dictionaries with 'job_skills' (skills attributed to the
+            job) and 'user_skills' (one skills string per linked user)
+    """
+    with db_connection() as conn:
+        try:
+            params = [DETAIL_PENDING, max_attempts]
+            user_join = ''
+            if user_id is not None:
+                user_join = 'JOIN user_jobs uj ON uj.job_id = j.id AND uj.user_id = ?'
+                params.insert(0, user_id)
+            rows = conn.execute(
+                f'''
+                SELECT j.id, j.title, j.url, j.source, j.description, j.date_scraped, j.detail_requested_at,
+                       COALESCE(j.detail_attempts, 0) AS detail_attempts,
+                       (SELECT GROUP_CONCAT(js.skill) FROM job_skills js WHERE js.job_id = j.id) AS job_skills
+                FROM jobs j {user_join}
+                WHERE j.detail_status = ? AND COALESCE(j.detail_attempts, 0) < ?
+                ORDER BY j.detail_requested_at IS NULL, j.detail_requested_at, j.date_scraped DESC
+                LIMIT ?
+                ''',
+                params + [limit]
+            ).fetchall()
+            jobs = [dict(row) for row in rows]
+            if not jobs:
+                return []
+        
+            for job in jobs:
+                job['job_skills'] = [s for s in (job['job_skills'] or '').split(',') if s]
+                job['user_skills'] = []
+            by_id = {job['id']: job for job in jobs}
+            placeholders = ','.join('?' for _ in by_id)
+            user_filter = 'AND uj.user_id = ?' if user_id is not None else ''
+            user_params = [user_id] if user_id is not None else []
+            for row in conn.execute(
+                f'''
+                SELECT uj.job_id, u.skills FROM user_jobs uj
+                JOIN user u ON u.id = uj.user_id
+                WHERE uj.job_id IN ({placeholders}) {user_filter}
+                ''',
+                list(by_id) + user_params
+            ):
+                by_id[row['job_id']]['user_skills'].append(row['skills'] or '')
+            return jobs
+        except sqlite3.Error as e:
+            logger.error(f"Error loading jobs pending detail enrichment: {e}")
+            return []
+
+def request_job_details(job_ids):
+    """Mark pending jobs as viewed so their details are fetched first."""
+    if not job_ids:
+        return
+    with db_connection() as conn:
+        try:
+            conn.execute(
+                f'''
+                UPDATE jobs SET detail_requested_at = ?
+                WHERE id IN ({','.join('?' for _ in job_ids)})
+                AND detail_status = ? AND detail_requested_at IS NULL
+                ''',
+                [datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'), *job_ids, DETAIL_PENDING]
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error requesting details for jobs {job_ids}: {e}")
+            conn.rollback()
+
+def save_job_details(job_id, description, skills, required_skills, nice_to_have_skills):
+    """Store a job's fetched description and extracted skills and mark it enriched."""
+    with db_connection() as conn:
+        try:
+            conn.execute(
+                '''
+                UPDATE jobs
+                SET description = ?, skills = ?, required_skills = ?, nice_to_have_skills = ?,
+                    detail_status = NULL, detail_attempts = COALESCE(detail_attempts, 0) + 1
+                WHERE id = ?
+                ''',
+                (description, json.dumps(skills), json.dumps(required_skills),
+                 json.dumps(nice_to_have_skills), job_id)
+            )
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error saving details for job {job_id}: {e}")
+            conn.rollback()
+            return False
+
+def record_detail_failure(job_id, max_attempts=3):
+    """Count a failed detail fetch, giving up on the job after max_attempts."""
+    with db_connection() as conn:
+        try:
+            conn.execute(
+                '''
+                UPDATE jobs
+                SET detail_attempts = COALESCE(detail_attempts, 0) + 1,
+                    detail_status = CASE WHEN COALESCE(detail_attempts, 0) + 1 >= ? THEN ? ELSE detail_status END
+                WHERE id = ?
+                ''',
+                (max_attempts, DETAIL_FAILED, job_id)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error recording detail failure for job {job_id}: {e}")
+            conn.rollback()
+
+def load_crawl_checkpoint(task_id):
+    """
+    Load the saved crawl frontier of a scrape run.
+    
+    Returns:
+        dict: The checkpoint state, or None if the run has none
+    """
+    with db_connection() as conn:
+        try:
+            row = conn.execute("SELECT state FROM crawl_checkpoints WHERE task_id = ?", (task_id,)).fetchone()
+            return json.loads(row['state']) if row else None
+        except (sqlite3.Error, json.JSONDecodeError) as e:
+            logger.error(f"Error loading crawl checkpoint for task {task_id}: {e}")
+            return None
+
+def save_crawl_checkpoint(task_id, state):
+    """Replace the saved crawl frontier of a scrape run."""
+    with db_connection() as conn:
+        try:
+            conn.execute(
+                '''
+                INSERT INTO crawl_checkpoints (task_id, state, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (task_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+                ''',
+                (task_id, json.dumps(state), datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+            )
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error saving crawl checkpoint for task {task_id}: {e}")
+            conn.rollback()
+            return False
+
+def delete_crawl_checkpoint(task_id):
+    """Forget the crawl frontier of a finished scrape run."""
+    with db_connection() as conn:
+        try:
+            conn.execute("DELETE FROM crawl_checkpoints WHERE task_id = ?", (task_id,))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting crawl checkpoint for task {task_id}: {e}")
+
+def get_active_users(active_days=14):
+    """
+    Get the users with skills who signed up or requested a scrape recently.
+    
+    Args:
+        active_days (int): How far back counts as recent
+        
+    Returns:
+        list: Dictionaries with id, location and skills (profile and resume
+            skills combined, in order, without duplicates)
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=active_days)).strftime('%Y-%m-%d %H:%M:%S')
+    with db_connection() as conn:
+        try:
+            rows = conn.execute(
+                '''
+                SELECT u.id, u.skills, u.resume_skills, u.location FROM user u
+                WHERE (COALESCE(u.skills, '') != '' OR COALESCE(u.resume_skills, '') != '')
+                  AND (u.created_at >= ?
+                       OR EXISTS (SELECT 1 FROM scrape_tasks t WHERE t.user_id = u.id AND t.created_at >= ?))
+                ORDER BY u.id
+                ''',
+                (cutoff, cutoff)
+            ).fetchall()
+            users = []
+            for row in rows:
+                skills = {}
+                for skills_str in (row['skills'], row['resume_skills']):
+                    for skill in (skills_str or '').split(','):
+                        if skill.strip():
+                            skills.setdefault(skill.strip().lower(), skill.strip())
+                if skills:
+                    users.append({'id': row['id'], 'location': row['location'], 'skills': list(skills.values())})
+            return users
+        except sqlite3.Error as e:
+            logger.error(f"Error loading active users: {e}")
+            return []
+
+def mark_users_refreshed(user_ids):
+    """Record that the given users' jobs were just scraped."""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return
+    now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    with db_connection() as conn:
+        try:
+            conn.executemany(
+                '''
+                INSERT INTO user_refreshes (user_id, refreshed_at) VALUES (?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET refreshed_at = excluded.refreshed_at
+                ''',
+                [(user_id, now) for user_id in user_ids]
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error recording refresh for users {user_ids}: {e}")
+            conn.rollback()
+
+def get_user_last_refresh(user_id):
+    """
+    Get when a user's jobs were last scraped by a finished scrape run or batch scrape.
+    
+    Returns:
+        str: UTC time as 'YYYY-MM-DD HH:MM:SS', or None if never
+    """
+    with db_connection() as conn:
+        try:
+            row = conn.execute("SELECT refreshed_at FROM user_refreshes WHERE user_id = ?", (user_id,)).fetchone()
+            return row['refreshed_at'] if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error loading last refresh for user {user_id}: {e}")
+            return None
+
+def record_user_visit(user_id, min_gap_minutes=30, keep_days=60):
+    """
+    Record that a user opened the site, at most once per min_gap_minutes.
+    
+    Visits older than keep_days are dropped.
+    """
+    now = datetime.utcnow()
+    with db_connection() as conn:
+        try:
+            conn.execute(
+                '''
+                INSERT OR IGNORE INTO user_visits (user_id, visited_at)
+                SELECT ?, ? WHERE NOT EXISTS (
+                    SELECT 1 FROM user_visits WHERE user_id = ? AND visited_at >= ?
+                )
+                ''',
+                (user_id, now.strftime('%Y-%m-%d %H:%M:%S'), user_id,
+                 (now - timedelta(minutes=min_gap_minutes)).strftime('%Y-%m-%d %H:%M:%S'))
+            )
+            conn.execute(
+                "DELETE FROM user_visits WHERE user_id = ? AND visited_at < ?",
+                (user_id, (now - timedelta(days=keep_days)).strftime('%Y-%m-%d %H:%M:%S'))
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error recording visit for user {user_id}: {e}")
+            conn.rollback()
+
+def get_visit_history(days=28):
+    """
+    Get every user's visits within the last days.
+    
+    Returns:
+        dict: User ID to a list of visit datetimes (UTC), oldest first
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    with db_connection() as conn:
+        try:
+            rows = conn.execute(
+                "SELECT user_id, visited_at FROM user_visits WHERE visited_at >= ? ORDER BY visited_at",
+                (cutoff,)
+            ).fetchall()
+            history = {}
+            for row in rows:
+                history.setdefault(row['user_id'], []).append(datetime.strptime(row['visited_at'], '%Y-%m-%d %H:%M:%S'))
+            return history
+        except sqlite3.Error as e:
+            logger.error(f"Error loading visit history: {e}")
+            return {}
+
+def take_request_budget(name, cost, per_hour, force=False):
+    """
+    Spend outbound requests from a token bucket shared by every process.
+    
+    The bucket holds at most per_hour tokens and refills continuously at
+    per_hour tokens per hour.
+    
+    Args:
+        name (str): Budget name
+        cost (float): Requests to spend; negative refunds
+        per_hour (float): Refill rate and capacity
+        force (bool): Spend even if the bucket goes below zero (used to
+            settle the difference between estimated and actual requests)
+        
+    Returns:
+        bool: True if the requests were spent
+    """
+    now = time.time()
+    with db_connection() as conn:
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                "SELECT tokens, tokens_updated_at FROM scheduler_state WHERE name = ?", (name,)
+            ).fetchone()
+            if row and row['tokens'] is not None:
+                elapsed_hours = max(0.0, now - (row['tokens_updated_at'] or now)) / 3600
+                tokens = min(per_hour, row['tokens'] + elapsed_hours * per_hour)
+            else:
+                tokens = per_hour
+            spent = force or tokens >= cost
+            if spent:
+                tokens = min(per_hour, tokens - cost)
+            conn.execute(
+                '''
+                INSERT INTO scheduler_state (name, tokens, tokens_updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET tokens = excluded.tokens, tokens_updated_at = excluded.tokens_updated_at
+                ''',
+                (name, tokens, now)
+            )
+            conn.commit()
+            return spent
+        except sqlite3.Error as e:
+            logger.error(f"Error updating request budget '{name}': {e}")
+            conn.rollback()
+            return False
+
+def claim_periodic_run(name, interval_seconds):
+    """
+    Claim a periodic job's next run across every process.
+    
+    Returns:
+        bool: True if the caller should run the job now
+    """
+    now = time.time()
+    with db_connection() as conn:
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT last_run FROM scheduler_state WHERE name = ?", (name,)).fetchone()
+            if row and row['last_run'] and now - row['last_run'] < interval_seconds:
+                conn.commit()
+                return False
+            conn.execute(
+                '''
+                INSERT INTO scheduler_state (name, last_run) VALUES (?, ?)
+                ON CONFLICT (name) DO UPDATE SET last_run = excluded.last_run
+                ''',
+                (name, now)
+            )
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error claiming periodic run '{name}': {e}")
+            conn.rollback()
+            return False
+
+def record_scrape_run(run, keep_days=90):
+    """
+    Add a scrape run to the scrape_runs ledger.
+    
+    Runs older than keep_days are dropped.
+    
+    Args:
+        run (dict): Column values; stage_seconds may be a dict
+        keep_days (int): How long to keep ledger rows
+        
+    Returns:
+        int: ID of the ledger row, or None on error
+    """
+    run = dict(run)
+    if isinstance(run.get('stage_seconds'), dict):
+        run['stage_seconds'] = json.dumps(run['stage_seconds'])
+    columns = ', '.join(run)
+    placeholders = ', '.join('?' for _ in run)
+    with db_connection() as conn:
+        try:
+            cursor = conn.execute(f"INSERT INTO scrape_runs ({columns}) VALUES ({placeholders})", list(run.values()))
+            conn.execute(
+                "DELETE FROM scrape_runs WHERE started_at < ?",
+                ((datetime.utcnow() - timedelta(days=keep_days)).strftime('%Y-%m-%d %H:%M:%S'),)
+            )
+            conn.commit()
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            logger.error(f"Error recording scrape run: {e}")
+            conn.rollback()
+            return None
+
+def get_scrape_runs(days=7, user_id=None):
+    """
+    Get the scrape runs started within the last days.
+    
+    Args:
+        days (int): How far back to look
+        user_id (int): Only this user's runs, if given
+        
+    Returns:
+        list: Ledger rows as dictionaries (stage_seconds decoded), oldest first
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    sql = "SELECT * FROM scrape_runs WHERE started_at >= ?"
+    params = [cutoff]
+    if user_id is not None:
+        sql += " AND user_id = ?"
+        params.append(user_id)
+    with db_connection() as conn:
+        try:
+            runs = []
+            for row in conn.execute(sql + " ORDER BY started_at, id", params).fetchall():
+                run = dict(row)
+                run['stage_seconds'] = json.loads(run['stage_seconds']) if run['stage_seconds'] else {}
+                runs.append(run)
+            return runs
+        except sqlite3.Error as e:
+            logger.error(f"Error loading scrape runs: {e}")
+            return []
+
+def add_job(job_data, skills_list=None):
+    """Add a job to the database."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # Get column names from the job_data dictionary
+        columns = ', '.join(job_data.keys())
+        placeholders = ', '.join(['?' for _ in job_data])
+        values = list(job_data.values())
+        
+        query = f"INSERT INTO jobs ({columns}) VALUES ({placeholders})"
+        
+        cursor.execute(query, values)
+        job_id = cursor.lastrowid
+        
+        # Add skills to job_skills table if provided
+        if skills_list:
+            add_job_skills(job_id, skills_list)
+        
+        conn.commit()
+        return job_id
+    except sqlite3.Error as e:
+        logger.error(f"Error adding job: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+def add_job_skills(job_id, skills, replace=True):
+    """
+    Add skills for a specific job to the job_skills table.
+    
+    Args:
+        job_id (int): ID of the job
+        skills (list): Skills to attach
+        replace (bool): Replace the job's existing skills; when False the skills
+            are added alongside the ones other searches attributed to the job
+    """
+    if not skills:
+        return
+    
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if replace:
+                # First delete any existing skills for this job
+                cursor.execute("DELETE FROM job_skills WHERE job_id = ?", (job_id,))
+        
+            # Insert new skills
+            for skill in skills:
+                cursor.execute(
+                    """
+                    INSERT INTO job_skills (job_id, skill)
+                    SELECT ?, ? WHERE NOT EXISTS (
+                        SELECT 1 FROM job_skills WHERE job_id = ? AND skill = ?
+                    )
+                    """,
+                    (job_id, skill.strip(), job_id, skill.strip())
+                )
+            _refresh_job_skills_text(cursor, job_id)
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error adding job skills: {e}")
+            conn.rollback()
+
+def get_job_skills(job_id):
+    """Get all skills for a specific job."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT skill FROM job_skills WHERE job_id = ?", (job_id,))
+    skills = [row['skill'] for row in cursor.fetchall()]
+    conn.close()
+    return skills
+
+def get_jobs_skill_text(job_ids):
+    """
+    Get the text skills can be recognised in for several jobs at once.
+    
+    Args:
+        job_ids (list): Job IDs
+        
+    Returns:
+        dict: Job ID to the lower-cased title, description and attributed skills
+    """
+    job_ids = list(dict.fromkeys(job_ids))
+    if not job_ids:
+        return {}
+    with db_connection() as conn:
+        try:
+            placeholders = ','.join('?' * len(job_ids))
+            rows = conn.execute(
+                f'''
+                SELECT j.id, j.title, j.description, j.skills, GROUP_CONCAT(js.skill, ', ') AS job_skills
+                FROM jobs j
+                LEFT JOIN job_skills js ON js.job_id = j.id
+                WHERE j.id IN ({placeholders})
+                GROUP BY j.id
+                ''',
+                job_ids
+            ).fetchall()
+            return {
+                row['id']: '\n'.join(part for part in (row['title'], row['description'], row['skills'], row['job_skills']) if part).lower()
+                for row in rows
+            }
+        except sqlite3.Error as e:
+            logger.error(f"Error loading skill text for jobs: {e}")
+            return {}
+
+def get_all_unique_skills():
+    """Get a list of all unique skills from job_skills table."""
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT DISTINCT skill FROM job_skills ORDER BY skill")
@@ -575,192 +1643,253 @@ def get_all_jobs():
     conn.close()
     return jobs_list
 
-def search_jobs_db(query="All", location="All", resume_skills=None, user_id=None, job_type="All"):
-    """Search jobs in the database with filtering and skill matching."""
-    conn = get_db_connection()
+# Skills of the candidate jobs, lowercased: job_skills rows plus the jobs.skills list
+_JOB_SKILL_SET_SQL = '''
+    job_skill_set AS (
+        SELECT js.job_id, LOWER(TRIM(js.skill)) AS skill
+        FROM candidates c JOIN job_skills js ON js.job_id = c.id
+        UNION
+        SELECT c.id, LOWER(TRIM(s.value))
+        FROM candidates c JOIN jobs j ON j.id = c.id,
+             json_each(CASE WHEN json_valid(j.skills) AND json_type(j.skills) = 'array' THEN j.skills ELSE '[]' END) s
+    )'''
+
+# Matched and total distinct entries of a JSON skills column ({column}) per candidate job
+_SKILL_LIST_MATCH_SQL = '''
+    {name} AS (
+        SELECT c.id, COUNT(DISTINCT LOWER(TRIM(s.value))) AS total, COUNT(DISTINCT us.skill) AS matched
+        FROM candidates c JOIN jobs j ON j.id = c.id,
+             json_each(CASE WHEN json_valid(j.{column}) AND json_type(j.{column}) = 'array' THEN j.{column} ELSE '[]' END) s
+        LEFT JOIN temp.search_skills us ON us.skill = LOWER(TRIM(s.value))
+        WHERE TRIM(s.value) != ''
+        GROUP BY c.id
+    )'''
+
+# Weights of required and nice-to-have matches in match_percentage
+REQUIRED_SKILLS_WEIGHT = 70
+NICE_TO_HAVE_SKILLS_WEIGHT = 30
+
+# Listings mentioning 'remote' in the title, location or description count as remote jobs
+_REMOTE_SQL = "(LOWER(j.title) LIKE '%remote%' OR LOWER(j.location) LIKE '%remote%' OR LOWER(j.description) LIKE '%remote%')"
+
+def _load_search_skills(conn, resume_skills):
+    """Put the user's normalized skills into this connection's search_skills temp table."""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS search_skills (skill TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.search_skills")
+    skills = {skill.strip().lower() for skill in resume_skills or [] if skill and skill.strip()}
+    conn.executemany("INSERT INTO temp.search_skills (skill) VALUES (?)", [(skill,) for skill in skills])
+
+def _search_scores_sql(query, location, user_id, job_type):
+    """
+    Build the CTEs that select and score the jobs matching a search.
+    
+    Defines candidates (id, search_rank), job_skill_set, required, nice and
+    scores (id, search_rank, total_skills, matched_skills, match_percentage).
+    The user's skills must be loaded with _load_search_skills.
+    
+    Returns:
+        tuple: (WITH clause, parameters)
+    """
+    params = []
+    where_clauses = []
+    
+    # Keep only jobs matching every search term, with their bm25 score
+    # (lower is a better match). CROSS JOIN makes the full-text match the
+    # outer loop, so it runs once rather than once per job.
+    fts_query = _fts_query(query) if query and query.lower() != "all" else ''
+    if fts_query:
+        source = '''(
+                SELECT rowid AS job_id, rank AS search_rank
+                FROM jobs_fts WHERE jobs_fts MATCH ? AND rank MATCH ?
+            ) fts CROSS JOIN jobs j ON j.id = fts.job_id'''
+        params.extend([fts_query, f"bm25({', '.join(str(weight) for weight in JOBS_FTS_WEIGHTS)})"])
+    else:
+        source = 'jobs j'
+    
+    # Restrict to the user's listings through user_jobs when a user is given
+    if user_id:
+        source += ' JOIN user_jobs uj ON uj.job_id = j.id AND uj.user_id = ?'
+        params.append(user_id)
+    
+    # Add location filter if not "All"
+    if location and location.strip().lower() != "all":
+        # Split location into city and state/country if provided
+        location_clause = []
+        for part in (part.strip().lower() for part in location.split(',')):
+            location_clause.append('(LOWER(j.location) LIKE ? OR LOWER(j.location) = ?)')
+            params.extend([f'%{part}%', part])  # Add both fuzzy and exact match parameters
+        where_clauses.append('(' + ' OR '.join(location_clause) + ')')
+    
+    # Remote/Onsite filter
+    job_type = (job_type or 'All').strip().lower()
+    if job_type == 'remote':
+        where_clauses.append(_REMOTE_SQL)
+    elif job_type == 'onsite':
+        where_clauses.append(f'NOT {_REMOTE_SQL}')
+    
+    candidates = f'''
+    candidates AS MATERIALIZED (
+        SELECT j.id, {'fts.search_rank' if fts_query else 'NULL'} AS search_rank
+        FROM {source}
+        {'WHERE ' + ' AND '.join(where_clauses) if where_clauses else ''}
+    )'''
+    # Jobs listing required or nice-to-have skills are scored on those, weighted;
+    # others on the share of their skills the user has
+    scores = f'''
+    scores AS (
+        SELECT c.id, c.search_rank,
+               COUNT(ks.skill) AS total_skills, COUNT(us.skill) AS matched_skills,
+               CASE
+                   WHEN COALESCE(r.total, 0) + COALESCE(n.total, 0) > 0 THEN CAST(
+                       COALESCE({REQUIRED_SKILLS_WEIGHT}.0 * r.matched / r.total, 0) +
+                       COALESCE({NICE_TO_HAVE_SKILLS_WEIGHT}.0 * n.matched / n.total, 0) AS INTEGER)
+                   WHEN COUNT(ks.skill) > 0 THEN CAST(ROUND(100.0 * COUNT(us.skill) / COUNT(ks.skill)) AS INTEGER)
+                   ELSE 0
+               END AS match_percentage
+        FROM candidates c
+        LEFT JOIN job_skill_set ks ON ks.job_id = c.id AND LENGTH(ks.skill) >= 2
+        LEFT JOIN temp.search_skills us ON us.skill = ks.skill
+        LEFT JOIN required r ON r.id = c.id
+        LEFT JOIN nice n ON n.id = c.id
+        GROUP BY c.id
+    )'''
+    ctes = [
+        candidates,
+        _JOB_SKILL_SET_SQL,
+        _SKILL_LIST_MATCH_SQL.format(name='required', column='required_skills'),
+        _SKILL_LIST_MATCH_SQL.format(name='nice', column='nice_to_have_skills'),
+        scores
+    ]
+    return 'WITH ' + ','.join(ctes), params
+
+def _decode_skill_list(value):
+    if isinstance(value, list):
+        return value
     try:
-        # Check if user_id column exists in jobs table
-        cursor = conn.execute("PRAGMA table_info(jobs)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if "user_id" not in columns:
-            # Add user_id column if it doesn't exist
-            try:
-                conn.execute("ALTER TABLE jobs ADD COLUMN user_id INTEGER")
-                conn.commit()
-                logger.info("Added user_id column to jobs table")
-            except Exception as e:
-                logger.error(f"Error adding user_id column: {e}")
-        
-        # Enable datetime parsing from SQLite
-        conn.row_factory = sqlite3.Row
-        
-        if not user_id:
-            print("Warning: No user_id provided for job search")
-        
-        # Normalize inputs
-        if location:
-            location = location.strip()
-        if resume_skills:
-            resume_skills = [skill.strip().lower() for skill in resume_skills]
-        if job_type:
-            job_type = job_type.strip()
-        
-        # Base query joining jobs with job_skills
-        base_query = '''
-        SELECT j.*, GROUP_CONCAT(js.skill) as job_skills,
-               strftime('%Y-%m-%d %H:%M:%S', j.date_scraped) as date_scraped_str
-        FROM jobs j
-        LEFT JOIN job_skills js ON j.id = js.job_id
-        '''
+        skills = json.loads(value) if value else []
+    except (json.JSONDecodeError, TypeError):
+        return []
+    return skills if isinstance(skills, list) else []
+
+def search_jobs_db(query="All", location="All", resume_skills=None, user_id=None, job_type="All", limit=None, offset=0):
+    """
+    Search jobs in the database with filtering and skill matching.
+    
+    Matching, scoring and ordering happen in SQL: the job's skills are joined
+    against a temp table of the user's normalized skills, and only the
+    requested page of jobs is loaded.
+    
+    Args:
+        query (str): Search terms, matched against the full-text index; "All" for none
+        location (str): Comma-separated location parts, any of which may match; "All" for any
+        resume_skills (list): The user's skills
+        user_id (int): Only search this user's jobs
+        job_type (str): "Remote", "Onsite" or "All"
+        limit (int): Return at most this many jobs; all if None
+        offset (int): Skip this many jobs first
         
-        where_clauses = []
-        params = []
-        
-        # Add search term filters if not "All"
-        if query.lower() != "all":
-            search_terms = [term.strip() for term in query.split()]
-            for search_term in search_terms:
-                where_clauses.append('''
-                (
-                    LOWER(j.title) LIKE ? OR
-                    LOWER(j.company) LIKE ? OR
-                    LOWER(j.description) LIKE ? OR
-                    EXISTS (
-                        SELECT 1 FROM job_skills js2 
-                        WHERE js2.job_id = j.id 
-                        AND LOWER(js2.skill) LIKE ?
-                    )
-                )
-                ''')
-                search_pattern = f'%{search_term.lower()}%'
-                params.extend([search_pattern, search_pattern, search_pattern, search_pattern])
-          # Add location filter if not "All"
-        if location.lower() != "all":
-            # Split location into city and state/country if provided
-            location_parts = [part.strip().lower() for part in location.split(',')]
-            location_clause = []
-            for part in location_parts:
-                location_clause.append('(LOWER(j.location) LIKE ? OR LOWER(j.location) = ?)')
-                params.extend([f'%{part}%', part])  # Add both fuzzy and exact match parameters
-            where_clauses.append('(' + ' OR '.join(location_clause) + ')')        # Add user_id filter if provided
-        if user_id:
-            try:
-                # Only add user_id filter if the column exists
-                cursor = conn.execute("PRAGMA table_info(jobs)")
-                columns = [column[1] for column in cursor.fetchall()]
-                
-                if "user_id" in columns:
-                    if where_clauses:
-                        where_clauses.append('j.user_id = ?')
-                    else:
-                        base_query += ' WHERE j.user_id = ?'
-                    params.append(user_id)
-                else:
-                    logger.warning("user_id column not found in jobs table, skipping user_id filter")
-            except Exception as e:
-                logger.error(f"Error checking for user_id column: {e}")
-                # Continue without the user_id filter
-        
-        # Add WHERE clause if we have other conditions
-        if where_clauses and 'WHERE' not in base_query:
-            base_query += ' WHERE ' + ' AND '.join(where_clauses)
-        elif where_clauses:
-            base_query += ' AND ' + ' AND '.join(where_clauses)
-        
-        # Group by job_id to combine skills
-        base_query += ' GROUP BY j.id'
-        
-        # Execute query and fetch results
-        cursor = conn.execute(base_query, params)
-        jobs = cursor.fetchall()
-          # Process results and calculate skill matches
-        job_list = []
-        for job in jobs:
-            job_dict = dict(job)
-            
-            # Initialize match percentage early
-            match_percentage = 0
-              # Convert date_scraped_str to datetime object if it exists
-            if 'date_scraped_str' in job_dict:
-                try:
-                    job_dict['date_scraped'] = datetime.strptime(job_dict['date_scraped_str'], '%Y-%m-%d %H:%M:%S')
-                    del job_dict['date_scraped_str']  # Remove the string version
-                except (ValueError, TypeError):
-                    job_dict['date_scraped'] = None
-            
-            # Get job skills from either job_skills table or skills column
-            job_skills = set()
-            
-            # Add skills from job_skills table
-            if job_dict.get('job_skills'):
-                job_skills.update(skill.strip() for skill in job_dict['job_skills'].split(','))
-            
-            # Add skills from skills column (if any)
-            if job_dict.get('skills'):
-                try:
-                    skills_from_column = json.loads(job_dict['skills'])
-                    if isinstance(skills_from_column, list):
-                        job_skills.update(skill.strip().lower() for skill in skills_from_column)
-                    elif isinstance(skills_from_column, str):
-                        job_skills.update(skill.strip().lower() for skill in skills_from_column.split(','))
-                except json.JSONDecodeError:
-                    skills_from_column = job_dict['skills'].split(',')
-                    job_skills.update(skill.strip().lower() for skill in skills_from_column)
-            
-            # Clean and normalize job skills
-            job_skills = {s for s in job_skills if s and len(s) >= 2}
-            job_dict['skills'] = sorted(job_skills)
-              # Calculate skill matches if resume_skills provided
-            if resume_skills:
-                resume_skills_lower = [skill.lower() for skill in resume_skills]
-                matching_skills = [skill for skill in job_skills if skill in resume_skills_lower]
-                missing_skills = [skill for skill in job_skills if skill not in resume_skills_lower]
-                
-                # Calculate match percentage
-                total_job_skills = len(job_skills)
-                if total_job_skills > 0:
-                    match_percentage = (len(matching_skills) / total_job_skills) * 100
-                else:
-                    match_percentage = 0
-                
-                # Only include jobs that have at least one matching skill
-                if len(matching_skills) > 0:
-                    job_dict.update({
-                        'matching_resume_skills': len(matching_skills),
-                        'match_percentage': round(match_percentage),
-                        'matching_skills': matching_skills,
-                        'missing_skills': missing_skills,
-                        'total_required_skills': total_job_skills
-                    })
-                    job_list.append(job_dict)
-                else:
-                    job_list.append(job_dict)
+    Returns:
+        list: Job dicts, best matches first (search relevance, then
+            match_percentage, matching skills, newest), with skills,
+            matching_skills and missing_skills lists, matching_resume_skills,
+            total_required_skills and match_percentage
+    """
+    with db_connection() as conn:
+        try:
+            _load_search_skills(conn, resume_skills)
+            ctes, params = _search_scores_sql(query, location, user_id, job_type)
+            rows = conn.execute(
+                f'''
+                {ctes}
+                SELECT j.*, ? AS user_id, s.search_rank, s.match_percentage,
+                       s.matched_skills AS matching_resume_skills, s.total_skills AS total_required_skills,
+                       strftime('%Y-%m-%d %H:%M:%S', j.date_scraped) AS date_scraped_str
+                FROM scores s JOIN jobs j ON j.id = s.id
+                ORDER BY s.search_rank, s.match_percentage DESC, s.matched_skills DESC,
+                         j.is_new DESC, j.is_urgent DESC, j.date_scraped DESC, j.id DESC
+                LIMIT ? OFFSET ?
+                ''',
+                params + [user_id, -1 if limit is None else limit, offset or 0]
+            ).fetchall()
+            jobs = [dict(row) for row in rows]
+            if not jobs:
+                return []
             
-            # Removed duplicate job_list.append(job_dict) here
-          # Ensure we have unique job IDs in our result
-        seen_job_ids = set()
-        unique_job_list = []
-        for job in job_list:
-            if job['id'] not in seen_job_ids:
-                seen_job_ids.add(job['id'])
-                unique_job_list.append(job)
-        
-        job_list = unique_job_list
+            # Skill lists of just the returned jobs
+            job_skills = {job['id']: [] for job in jobs}
+            user_skills = {row['skill'] for row in conn.execute("SELECT skill FROM temp.search_skills")}
+            for row in conn.execute(
+                f'''
+                WITH candidates AS (SELECT value AS id FROM json_each(?)), {_JOB_SKILL_SET_SQL}
+                SELECT job_id, skill FROM job_skill_set WHERE LENGTH(skill) >= 2 ORDER BY skill
+                ''',
+                (json.dumps(list(job_skills)),)
+            ):
+                job_skills[row['job_id']].append(row['skill'])
+        except sqlite3.Error as e:
+            logger.error(f"Error searching jobs for user {user_id}: {e}")
+            return []
+    
+    for job in jobs:
+        # Convert date_scraped_str to a datetime object if it exists
+        try:
+            job['date_scraped'] = datetime.strptime(job.pop('date_scraped_str'), '%Y-%m-%d %H:%M:%S')
+        except (ValueError, TypeError):
+            job['date_scraped'] = None
+        skills = job_skills[job['id']]
+        job['skills'] = skills
+        job['matching_skills'] = [skill for skill in skills if skill in user_skills]
+        job['missing_skills'] = [skill for skill in skills if skill not in user_skills]
+        job['required_skills'] = _decode_skill_list(job.get('required_skills'))
+        job['nice_to_have_skills'] = _decode_skill_list(job.get('nice_to_have_skills'))
+    return jobs
+
+def get_job_search_summary(query="All", location="All", resume_skills=None, user_id=None, job_type="All"):
+    """
+    Count the jobs a search_jobs_db search matches and collect the skills they ask for that the user lacks.
+    
+    Returns:
+        dict: total_jobs, matching_jobs (match above 40%), remote_jobs and
+            onsite_jobs of the search, and missing_skills: the required
+            skills of the matching jobs of any job type that the user does
+            not have, sorted
+    """
+    summary = {'total_jobs': 0, 'matching_jobs': 0, 'remote_jobs': 0, 'onsite_jobs': 0, 'missing_skills': []}
+    with db_connection() as conn:
+        try:
+            _load_search_skills(conn, resume_skills)
+            ctes, params = _search_scores_sql(query, location, user_id, job_type)
+            row = conn.execute(
+                f'''
+                {ctes}
+                SELECT COUNT(*) AS total_jobs,
+                       COALESCE(SUM(s.match_percentage > 40), 0) AS matching_jobs,
+                       COALESCE(SUM({_REMOTE_SQL}), 0) AS remote_jobs
+                FROM scores s JOIN jobs j ON j.id = s.id
+                ''',
+                params
+            ).fetchone()
+            summary.update(dict(row))
+            summary['onsite_jobs'] = summary['total_jobs'] - summary['remote_jobs']
             
-        # Sort jobs by match percentage if resume skills provided
-        if resume_skills:
-            job_list.sort(key=lambda x: (
-                x.get('match_percentage', 0),
-                x.get('matching_resume_skills', 0),
-                len(x.get('skills', [])),
-                x.get('title', '')
-            ), reverse=True)
-        
-        return job_list
-    finally:
-        if conn:
-            conn.close()
+            # Skill gaps are taken across job types, as in the unfiltered list
+            ctes, params = _search_scores_sql(query, location, user_id, 'All')
+            summary['missing_skills'] = [row['skill'] for row in conn.execute(
+                f'''
+                {ctes}
+                SELECT DISTINCT s.value AS skill
+                FROM candidates c JOIN jobs j ON j.id = c.id,
+                     json_each(CASE WHEN json_valid(j.required_skills) AND json_type(j.required_skills) = 'array'
+                               THEN j.required_skills ELSE '[]' END) s
+                WHERE s.type = 'text' AND TRIM(s.value) != ''
+                AND LOWER(TRIM(s.value)) NOT IN (SELECT skill FROM temp.search_skills)
+                ORDER BY s.value
+                ''',
+                params
+            )]
+        except sqlite3.Error as e:
+            logger.error(f"Error summarizing job search for user {user_id}: {e}")
+    return summary
 
 def get_job_by_id(job_id):
     """Get a job by its ID."""
@@ -944,31 +2073,29 @@ def update_user_profile(user_id, username=None, email=None, skills=None,
 
 def jobs_need_refresh(hours=24):
     """Check if jobs data is stale and needs refreshing."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        # Get most recent job's timestamp
-        cursor.execute("SELECT MAX(date_scraped) FROM jobs")
-        last_scraped = cursor.fetchone()[0]
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # Get most recent job's timestamp
+            cursor.execute("SELECT MAX(date_scraped) FROM jobs")
+            last_scraped = cursor.fetchone()[0]
         
-        if not last_scraped:
-            return True
+            if not last_scraped:
+                return True
         
-        # Convert string to datetime
-        try:
-            last_scraped_dt = datetime.strptime(last_scraped, '%Y-%m-%d %H:%M:%S')
-        except (ValueError, TypeError):
-            return True
+            # Convert string to datetime
+            try:
+                last_scraped_dt = datetime.strptime(last_scraped, '%Y-%m-%d %H:%M:%S')
+            except (ValueError, TypeError):
+                return True
             
-        # Check if data is older than specified hours
-        time_diff = datetime.utcnow() - last_scraped_dt
-        return time_diff.total_seconds() > (hours * 3600)
+            # Check if data is older than specified hours
+            time_diff = datetime.utcnow() - last_scraped_dt
+            return time_diff.total_seconds() > (hours * 3600)
         
-    except Exception as e:
-        print(f"Error checking job refresh status: {e}")
-        return True
-    finally:
-        conn.close()
+        except Exception as e:
+            logger.error(f"Error checking job refresh status: {e}")
+            return True
 
 def _serialize_skills(skills):
     """Convert skills list to JSON string for database storage."""
@@ -997,6 +2124,167 @@ def _deserialize_skills(skills_str):
         logger.warning(f"Failed to parse skills JSON: {skills_str}")
         return []
 
+def _create_jobs_table(cursor, table_name='jobs'):
+    """Create the shared jobs table (one row per normalized source_url)."""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT,
+            title TEXT,
+            company TEXT,
+            location TEXT,
+            url TEXT,
+            description TEXT,
+            required_skills TEXT,
+            nice_to_have_skills TEXT,
+            salary_min INTEGER,
+            salary_max INTEGER,
+            salary_currency TEXT,
+            salary_period TEXT,
+            job_type TEXT,
+            employment_type TEXT,
+            source_url TEXT UNIQUE,
+            date_posted TIMESTAMP,
+            date_scraped TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_remote BOOLEAN DEFAULT FALSE,
+            experience_level TEXT,
+            education_required TEXT,
+            company_industry TEXT,
+            location_type TEXT,
+            skills TEXT,
+            is_new BOOLEAN DEFAULT TRUE,
+            is_urgent BOOLEAN DEFAULT FALSE,
+            is_saved BOOLEAN DEFAULT FALSE,
+            status TEXT DEFAULT 'new',
+            detail_status TEXT,
+            detail_attempts INTEGER DEFAULT 0,
+            detail_requested_at TIMESTAMP,
+            source TEXT,
+            job_skills_text TEXT
+        )
+    ''')
+
+def _create_jobs_fts(cursor):
+    """
+    Create the jobs_fts full-text index and its triggers.
+    
+    The index is rebuilt from the jobs table when any of its triggers is
+    missing, i.e. when it was just created or the jobs table was rebuilt.
+    """
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+            {', '.join(JOBS_FTS_COLUMNS)},
+            content = 'jobs', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+    if set(JOBS_FTS_TRIGGERS).issubset(row[0] for row in cursor.fetchall()):
+        return
+    logger.info("Rebuilding jobs full-text index...")
+    for name in JOBS_FTS_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    _refresh_job_skills_text(cursor)
+    for name, body in JOBS_FTS_TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER {name} {body}")
+    cursor.execute("INSERT INTO jobs_fts (jobs_fts) VALUES ('rebuild')")
+
+def _refresh_job_skills_text(cursor, job_id=None):
+    """Copy a job's job_skills rows (every job's if job_id is None) into jobs.job_skills_text."""
+    sql = "UPDATE jobs SET job_skills_text = (SELECT GROUP_CONCAT(skill, ' ') FROM job_skills WHERE job_id = jobs.id)"
+    if job_id is None:
+        cursor.execute(sql)
+    else:
+        cursor.execute(sql + " WHERE id = ?", (job_id,))
+
+def _fts_query(query):
+    """
+    Build an FTS5 query from a search box query.
+    
+    Every term must match, as a word prefix ("pyth" finds "python").
+    
+    Returns:
+        str: The FTS5 query, or '' if the query has no searchable terms
+    """
+    terms = [term.replace('"', '""') for term in query.split() if any(ch.isalnum() for ch in term)]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def _add_missing_columns(cursor, table_name, columns):
+    """Add any of columns ({name: definition}) that table_name lacks."""
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, definition in columns.items():
+        if name not in existing:
+            logger.info(f"Adding {table_name}.{name} column...")
+            cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {name} {definition}")
+
+def _migrate_jobs_to_shared_corpus(conn):
+    """
+    Convert a legacy per-user jobs table into the shared jobs + user_jobs layout.
+    
+    Rows with the same normalized source_url collapse into the lowest job id,
+    their job_skills are repointed to that id and every owner is linked to it
+    through user_jobs. Foreign keys are switched off while the table is rebuilt
+    so that dropping the old table does not cascade into job_skills.
+    """
+    conn.commit()
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA foreign_keys = OFF')
+    try:
+        _create_jobs_table(cursor, 'jobs_shared')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_jobs (
+                user_id INTEGER NOT NULL,
+                job_id INTEGER NOT NULL,
+                date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, job_id),
+                FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE,
+                FOREIGN KEY (job_id) REFERENCES jobs (id) ON DELETE CASCADE
+            )
+        ''')
+        cursor.execute("PRAGMA table_info(jobs_shared)")
+        shared_columns = [row[1] for row in cursor.fetchall()]
+        
+        cursor.execute("SELECT * FROM jobs ORDER BY id")
+        kept_ids = {}
+        for row in cursor.fetchall():
+            job = dict(row)
+            source_url = normalize_source_url(job.get('source_url') or job.get('url'))
+            key = source_url or f"id:{job['id']}"
+            
+            if key not in kept_ids:
+                kept_ids[key] = job['id']
+                job['source_url'] = source_url
+                values = [job.get(column) for column in shared_columns]
+                conn.execute(
+                    f"INSERT INTO jobs_shared ({', '.join(shared_columns)}) "
+                    f"VALUES ({', '.join('?' for _ in shared_columns)})",
+                    values
+                )
+            else:
+                conn.execute("UPDATE job_skills SET job_id = ? WHERE job_id = ?", (kept_ids[key], job['id']))
+            
+            if job.get('user_id'):
+                conn.execute(
+                    "INSERT OR IGNORE INTO user_jobs (user_id, job_id, date_added) VALUES (?, ?, ?)",
+                    (job['user_id'], kept_ids[key], job.get('date_scraped'))
+                )
+        
+        # Merged listings can now have the same skill twice
+        conn.execute(
+            "DELETE FROM job_skills WHERE id NOT IN (SELECT MIN(id) FROM job_skills GROUP BY job_id, skill)"
+        )
+        conn.execute("DROP TABLE jobs")
+        conn.execute("ALTER TABLE jobs_shared RENAME TO jobs")
+        conn.commit()
+        logger.info(f"Migrated jobs table to shared corpus with {len(kept_ids)} distinct listings")
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute('PRAGMA foreign_keys = ON')
+
 def _clean_job_data(job_data):
     """Clean and validate job data before saving to database."""
     try:
@@ -1036,4 +2324,4 @@ def _clean_job_data(job_data):
 # If this file is run directly, initialize the database
 if __name__ == "__main__":
     initialize_database()
-    print("Database initialized. No sample jobs added.")
+    logger.info("Database initialized. No sample jobs added.")
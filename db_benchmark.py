@@ -0,0 +1,141 @@
+"""
+Benchmark of page-load reads while a scrape is writing.
+
+Reader threads load the jobs list page (get_job_search_summary and one page
+of search_jobs_db) in a loop while a writer thread saves listings one transaction each, as a scrape's db_write
+stage does, and the reader latencies are reported as percentiles. Each run
+uses a fresh scratch database, so compare journal modes with:
+
+    python db_benchmark.py --journal-mode wal
+    python db_benchmark.py --journal-mode delete
+"""
+import os
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import database_manager
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+BENCHMARK_USER_ID = 1  # The test user initialize_database creates
+PAGE_SIZE = 20
+SKILLS = ['python', 'sql', 'aws', 'docker', 'react', 'java', 'excel', 'tableau']
+
+
+def _job(n):
+    return {
+        'title': f"Data Engineer {n}",
+        'company': f"Company {n % 97}",
+        'location': 'Bangalore',
+        'description': f"Listing {n}: build pipelines with " + ', '.join(SKILLS[n % 5:n % 5 + 3]),
+        'source_url': f"https://example.com/jobs/{n}",
+        'skills': SKILLS[n % 5:n % 5 + 3],
+        'is_remote': n % 3 == 0,
+        'experience_level': 'mid'
+    }
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_benchmark(seconds=10, readers=4, seed_jobs=2000, write_interval=0.02):
+    """
+    Measure reader latency against the configured database while a writer saves jobs.
+
+    Args:
+        seconds (float): How long readers and the writer run
+        readers (int): Concurrent reader threads
+        seed_jobs (int): Jobs stored before the measurement starts
+        write_interval (float): Pause between saved listings, roughly a scrape's
+            pace; 0 writes flat out
+
+    Returns:
+        dict: reads, p50_ms, p95_ms, p99_ms and max_ms reader latency,
+            failed reads and jobs written during the run
+    """
+    database_manager.initialize_database()
+    for start in range(0, seed_jobs, 500):
+        database_manager.save_jobs_batch([_job(n) for n in range(start, min(seed_jobs, start + 500))],
+                                         user_id=BENCHMARK_USER_ID)
+
+    stop = threading.Event()
+    latencies = []
+    failures = []
+    written = []
+    lock = threading.Lock()
+
+    def read():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                database_manager.get_job_search_summary(resume_skills=SKILLS[:3], user_id=BENCHMARK_USER_ID)
+                database_manager.search_jobs_db(resume_skills=SKILLS[:3], user_id=BENCHMARK_USER_ID, limit=PAGE_SIZE)
+            except Exception as e:
+                with lock:
+                    failures.append(str(e))
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    def write():
+        n = seed_jobs
+        while not stop.is_set():
+            if database_manager.save_job_to_db(_job(n), BENCHMARK_USER_ID):
+                written.append(n)
+            n += 1
+            if write_interval:
+                time.sleep(write_interval)
+
+    threads = [threading.Thread(target=write, name='writer')]
+    threads += [threading.Thread(target=read, name=f"reader-{i}") for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'reads': len(latencies),
+        'p50_ms': 1000 * _percentile(latencies, 0.50),
+        'p95_ms': 1000 * _percentile(latencies, 0.95),
+        'p99_ms': 1000 * _percentile(latencies, 0.99),
+        'max_ms': 1000 * max(latencies, default=0.0),
+        'failed_reads': len(failures),
+        'jobs_written': len(written)
+    }
+
+
+if __name__ == '__main__':
+    # database_manager configures INFO logging on import
+    logging.getLogger().setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(description='Measure jobs-list read latency during concurrent scrape writes.')
+    parser.add_argument('--journal-mode', default=database_manager.SQLITE_PRAGMAS['journal_mode'],
+                        help='SQLite journal mode to benchmark (wal, delete, ...)')
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of the measurement')
+    parser.add_argument('--readers', type=int, default=4, help='Concurrent reader threads')
+    parser.add_argument('--seed-jobs', type=int, default=2000, help='Jobs stored before measuring')
+    parser.add_argument('--write-interval', type=float, default=0.02,
+                        help='Seconds between saved listings (0 writes as fast as possible)')
+    args = parser.parse_args()
+
+    scratch_dir = tempfile.mkdtemp(prefix='db_benchmark_')
+    database_manager.DB_PATH = os.path.join(scratch_dir, 'benchmark.db')
+    database_manager.SQLITE_PRAGMAS['journal_mode'] = args.journal_mode
+    try:
+        result = run_benchmark(args.seconds, args.readers, args.seed_jobs, args.write_interval)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    print(f"journal_mode={args.journal_mode}: {result['reads']} reads, "
+          f"p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+          f"max {result['max_ms']:.1f} ms, {result['failed_reads']} failed; "
+          f"{result['jobs_written']} jobs written")
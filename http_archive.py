@@ -0,0 +1,242 @@
+"""
+Record/replay archive of the scraper's HTTP traffic.
+
+With SCRAPER_HTTP_MODE=record, scraper.fetch_page stores every response
+(URL, status, headers and body) in a gzip-compressed JSON-lines archive
+(SCRAPER_HTTP_ARCHIVE). With SCRAPER_HTTP_MODE=replay, it answers from the
+archive instead of the network, so scraping, parsing and the NLP stages can
+be run and benchmarked repeatably offline, and recorded Adzuna markup can be
+re-parsed to catch selector breakage.
+
+The archive can also be served over HTTP by a local stub server:
+
+    python http_archive.py serve --archive instance/http_archive.jsonl.gz --port 8765
+
+and the scraper pointed at it with SCRAPER_ORIGIN_OVERRIDE=http://127.0.0.1:8765,
+which exercises the real HTTP client path (timeouts, retries, decoding).
+"""
+import os
+import sys
+import gzip
+import json
+import logging
+import argparse
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MODE_LIVE = 'live'
+MODE_RECORD = 'record'
+MODE_REPLAY = 'replay'
+MODES = (MODE_LIVE, MODE_RECORD, MODE_REPLAY)
+
+DEFAULT_ARCHIVE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'http_archive.jsonl.gz')
+
+# Response headers worth keeping; the rest (cookies, dates, tracing) only add noise
+KEPT_HEADERS = {'content-type', 'content-encoding', 'content-language', 'location'}
+
+
+def request_key(url, params=None):
+    """
+    Build the key identifying a GET request: its path and sorted query.
+
+    The scheme and host are left out so recordings also match requests
+    rewritten to the stub server.
+
+    Args:
+        url (str): Request URL, possibly with a query string
+        params (dict): Extra query parameters, as passed to requests.get
+
+    Returns:
+        str: e.g. '/search?p=1&q=python&w=India'
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((str(key), str(value)) for key, value in params.items() if value is not None)
+    return urlunsplit(('', '', parts.path or '/', urlencode(sorted(query)), ''))
+
+
+class HttpArchive:
+    """
+    Append-only, gzip-compressed archive of HTTP responses keyed by request_key.
+
+    Each record is appended as its own gzip member, so recording is safe to
+    interrupt and an archive can be extended by later runs; when a request
+    was recorded more than once the newest response wins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = None
+
+    def _load(self):
+        records = {}
+        if os.path.exists(self.path):
+            try:
+                with gzip.open(self.path, 'rt', encoding='utf-8') as archive:
+                    for line in archive:
+                        if line.strip():
+                            record = json.loads(line)
+                            records[record['key']] = record
+            except (OSError, EOFError, json.JSONDecodeError) as e:
+                # A run killed mid-write leaves a truncated last member
+                logger.warning(f"Stopped reading HTTP archive {self.path} at a damaged record: {e}")
+        logger.info(f"Loaded {len(records)} recorded responses from {self.path}")
+        return records
+
+    @property
+    def records(self):
+        with self._lock:
+            if self._records is None:
+                self._records = self._load()
+            return self._records
+
+    def lookup(self, url, params=None):
+        """
+        Find the recorded response to a request.
+
+        Returns:
+            dict: url, status, headers and body, or None if it was not recorded
+        """
+        return self.records.get(request_key(url, params))
+
+    def record(self, url, params, status, headers, body):
+        """Append a response to the archive."""
+        record = {
+            'key': request_key(url, params),
+            'url': url,
+            'status': status,
+            'headers': {name: value for name, value in headers.items() if name.lower() in KEPT_HEADERS},
+            'body': body,
+            'recorded_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with gzip.open(self.path, 'at', encoding='utf-8') as archive:
+                archive.write(line)
+            if self._records is not None:
+                self._records[record['key']] = record
+
+
+_mode = os.environ.get('SCRAPER_HTTP_MODE', MODE_LIVE).lower()
+_archive = None
+_origin_override = os.environ.get('SCRAPER_ORIGIN_OVERRIDE') or None
+
+
+def configure(mode=None, archive_path=None, origin_override=None):
+    """
+    Switch the scraper's HTTP mode at runtime.
+
+    Args:
+        mode (str): 'live', 'record' or 'replay'
+        archive_path (str): Archive file to record into or replay from
+        origin_override (str): Send live requests to this origin (e.g. the stub server)
+    """
+    global _mode, _archive, _origin_override
+    if mode is not None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown HTTP mode '{mode}'; expected one of {', '.join(MODES)}")
+        _mode = mode
+    if archive_path is not None:
+        _archive = HttpArchive(archive_path)
+    if origin_override is not None:
+        _origin_override = origin_override or None
+    logger.info(f"Scraper HTTP mode: {_mode}" + (f" (archive {get_archive().path})" if _mode != MODE_LIVE else ''))
+
+
+def get_mode():
+    return _mode if _mode in MODES else MODE_LIVE
+
+
+def is_replaying():
+    return get_mode() == MODE_REPLAY
+
+
+def get_archive():
+    """Get the configured archive, opening SCRAPER_HTTP_ARCHIVE on first use."""
+    global _archive
+    if _archive is None:
+        _archive = HttpArchive(os.environ.get('SCRAPER_HTTP_ARCHIVE', DEFAULT_ARCHIVE))
+    return _archive
+
+
+def rewrite_origin(url):
+    """Send a request to the origin override, if one is configured."""
+    if not _origin_override:
+        return url
+    origin = urlsplit(_origin_override)
+    parts = urlsplit(url)
+    return urlunsplit((origin.scheme, origin.netloc, parts.path, parts.query, parts.fragment))
+
+
+class _ArchiveHandler(BaseHTTPRequestHandler):
+    """Serve recorded responses by request path and query."""
+
+    archive = None
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        record = self.archive.records.get(request_key(urlunsplit(('', '', parts.path, parts.query, ''))))
+        if record is None:
+            self.send_error(404, 'Not recorded')
+            return
+        body = record['body'].encode('utf-8')
+        self.send_response(record['status'])
+        for name, value in record['headers'].items():
+            # The body is stored decoded
+            if name.lower() not in ('content-encoding', 'content-length'):
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Stub server: {format % args}")
+
+
+def serve_archive(archive_path, host='127.0.0.1', port=8765):
+    """
+    Serve an archive over HTTP until interrupted.
+
+    Args:
+        archive_path (str): Archive to serve
+        host (str): Interface to bind
+        port (int): Port to listen on
+    """
+    handler = type('ArchiveHandler', (_ArchiveHandler,), {'archive': HttpArchive(archive_path)})
+    logger.info(f"Serving {len(handler.archive.records)} recorded responses on http://{host}:{port}")
+    server = ThreadingHTTPServer((host, port), handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stub server stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Inspect or serve a recorded scraper HTTP archive.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help='Serve the archive with a local stub HTTP server')
+    serve_parser.add_argument('--archive', default=DEFAULT_ARCHIVE, help='Archive file')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    serve_parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    list_parser = subparsers.add_parser('list', help='List the recorded requests')
+    list_parser.add_argument('--archive', default=DEFAULT_ARCHIVE, help='Archive file')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve_archive(args.archive, host=args.host, port=args.port)
+    else:
+        records = HttpArchive(args.archive).records
+        for key, record in sorted(records.items()):
+            print(f"{record['status']}  {len(record['body']):>8}  {key}")
+        print(f"{len(records)} recorded responses", file=sys.stderr)
@@ -11,7 +11,7 @@ import base64
 from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 import numpy as np
-from database_manager import get_db_connection, get_all_jobs, get_all_unique_skills
+from database_manager import db_connection, get_all_jobs, get_all_unique_skills
 
 # Configure logging
 logging.basicConfig(
@@ -32,19 +32,23 @@ def get_job_insights(user_id, filter_by_skills=None, user_skills=None):
         
     Returns:
         dict: Dictionary containing various insights and graph paths
-      conn = None
     """  
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        # Get all jobs for this user - don't use GROUP BY to match job_list page count
-        if user_id:
-            cursor.execute("SELECT * FROM jobs WHERE user_id = ?", (user_id,))
-        else:
-            # Only for admin or testing
-            cursor.execute("SELECT * FROM jobs")
-            
-        jobs = cursor.fetchall()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            # Get all jobs for this user - don't use GROUP BY to match job_list page count
+            if user_id:
+                cursor.execute('''
+                    SELECT j.*, uj.user_id AS user_id
+                    FROM jobs j
+                    JOIN user_jobs uj ON uj.job_id = j.id
+                    WHERE uj.user_id = ?
+                ''', (user_id,))
+            else:
+                # Only for admin or testing
+                cursor.execute("SELECT * FROM jobs")
+                
+            jobs = cursor.fetchall()
         logger.info(f"Found {len(jobs)} jobs for insights")
         
         if not jobs:
@@ -72,9 +76,6 @@ def get_job_insights(user_id, filter_by_skills=None, user_skills=None):
             "has_data": False,
             "message": f"Error generating insights: {str(e)}"
         }
-    finally:
-        if conn:
-            conn.close()
 
 def _process_job_data(jobs_df, filter_by_skills=None, user_skills=None):
     """Process job data and generate visualizations"""
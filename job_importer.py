@@ -0,0 +1,229 @@
+"""
+Bulk import of job feeds.
+
+`flask import-jobs` streams a JSON Lines or CSV feed (optionally gzipped)
+from disk, extracts and classifies each description's skills with the
+scraper's NLP stages and saves the jobs in batched transactions, skipping
+HTML scraping entirely. Records are read, processed and written one batch at
+a time, so memory use does not grow with the size of the feed.
+
+Feed records use the jobs table's column names; a few common aliases
+(company_name, link, snippet, ...) are accepted. Records that already carry
+skills keep them and skip extraction. A record is identified by its link,
+else by the feed's own ID; records with neither are always added as new
+jobs, never matched to stored ones by title and company.
+"""
+import os
+import csv
+import sys
+import gzip
+import json
+import time
+import logging
+from datetime import datetime
+from itertools import islice
+from database_manager import save_jobs_batch, normalize_source_url
+from scrape_coordination import known_listings
+from scrape_pipeline import get_nlp_pool, NLP_PROCESSES
+import scrape_profiler
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+FORMAT_JSONL = 'jsonl'
+FORMAT_CSV = 'csv'
+FORMATS = (FORMAT_JSONL, FORMAT_CSV)
+
+IMPORT_BATCH_SIZE = 500
+
+# Feed field aliases -> jobs column
+FIELD_ALIASES = {
+    'id': 'job_id',  # The feed's own ID; jobs.id is ours
+    'company_name': 'company',
+    'employer': 'company',
+    'job_title': 'title',
+    'link': 'url',
+    'redirect_url': 'url',
+    'snippet': 'description',
+    'job_description': 'description',
+    'city': 'location',
+    'posted_at': 'date_posted',
+    'created': 'date_posted'
+}
+TEXT_FIELDS = ('title', 'company', 'location', 'description')
+SKILL_FIELDS = ('skills', 'required_skills', 'nice_to_have_skills')
+
+
+def detect_format(path):
+    """Guess a feed's format from its file name (.jsonl, .ndjson, .csv, optionally .gz)."""
+    name = path.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith('.csv'):
+        return FORMAT_CSV
+    return FORMAT_JSONL
+
+
+def iter_feed_records(path, fmt=None):
+    """
+    Stream the records of a feed file.
+
+    Args:
+        path (str): JSON Lines or CSV file, optionally gzip-compressed
+        fmt (str): 'jsonl' or 'csv'; guessed from the file name if None
+
+    Yields:
+        dict: One record per line (JSON Lines) or row (CSV); malformed
+            JSON lines are logged and skipped
+    """
+    fmt = fmt or detect_format(path)
+    opener = gzip.open if path.lower().endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as feed:
+        if fmt == FORMAT_CSV:
+            # Descriptions can exceed the csv module's default field limit
+            csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+            yield from csv.DictReader(feed)
+            return
+        for line_number, line in enumerate(feed, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping malformed line {line_number} of {path}: {e}")
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def _parse_skills(value):
+    if isinstance(value, list):
+        return [str(skill).strip() for skill in value if str(skill).strip()]
+    if not value:
+        return []
+    value = str(value)
+    if value.lstrip().startswith('['):
+        try:
+            return _parse_skills(json.loads(value))
+        except json.JSONDecodeError:
+            pass
+    return [skill.strip() for skill in value.replace(';', ',').split(',') if skill.strip()]
+
+
+def feed_record_to_job(record):
+    """
+    Map a feed record to job data for save_jobs_batch.
+
+    Returns:
+        dict: Job data, or None if the record has no title or company
+    """
+    job_data = {}
+    for key, value in record.items():
+        if key is None or value in (None, ''):
+            continue
+        column = FIELD_ALIASES.get(key.strip().lower(), key.strip().lower())
+        job_data.setdefault(column, value)
+    for field in TEXT_FIELDS:
+        if field in job_data:
+            job_data[field] = str(job_data[field]).strip()
+    if not job_data.get('title') or not job_data.get('company'):
+        return None
+    for field in SKILL_FIELDS:
+        if field in job_data:
+            job_data[field] = _parse_skills(job_data[field])
+    job_data.setdefault('source_url', job_data.get('url'))
+    job_data['is_new'] = False
+    if isinstance(job_data.get('is_remote'), str):
+        job_data['is_remote'] = job_data['is_remote'].strip().lower() in ('1', 'true', 'yes')
+    job_data.setdefault('is_remote', False)
+    job_data.setdefault('experience_level', 'mid')
+    return job_data
+
+
+def _extract_batch(jobs, pool):
+    """Extract and classify skills for the jobs in a batch that have a description but no skills."""
+    # Imported here so the module can be imported without loading the scraper's NLP model
+    from scraper import extract_job_skills, apply_job_skills
+
+    todo = [job_data for job_data in jobs if job_data.get('description') and not job_data.get('skills')]
+    if not todo:
+        return
+    descriptions = [job_data['description'] for job_data in todo]
+    if pool is not None:
+        chunksize = max(1, len(todo) // (4 * NLP_PROCESSES))
+        results = pool.map(extract_job_skills, descriptions, chunksize=chunksize)
+    else:
+        results = map(extract_job_skills, descriptions)
+    for job_data, extracted in zip(todo, results):
+        apply_job_skills(job_data, extracted)
+
+
+def import_jobs(path, fmt=None, batch_size=IMPORT_BATCH_SIZE, user_id=None, extract=True, limit=None):
+    """
+    Import a job feed into the shared jobs table.
+
+    Args:
+        path (str): Feed file (JSON Lines or CSV, optionally gzipped)
+        fmt (str): 'jsonl' or 'csv'; guessed from the file name if None
+        batch_size (int): Records per transaction
+        user_id (int): Also link the imported jobs to this user
+        extract (bool): Extract skills from descriptions that have none
+        limit (int): Stop after this many records
+
+    Returns:
+        dict: records read, jobs saved (new and updated), skipped records,
+            duplicates (records of a listing already saved by this import,
+            told apart by the job's date_scraped) and failed ones, seconds taken and jobs_per_second, or None if
+            the feed could not be read
+    """
+    if fmt and fmt not in FORMATS:
+        raise ValueError(f"Unknown feed format '{fmt}'; expected one of {', '.join(FORMATS)}")
+    if not os.path.exists(path):
+        logger.error(f"Feed file {path} does not exist")
+        return None
+
+    # Imports run as a separate command, so they may use the whole pool
+    pool = get_nlp_pool(NLP_PROCESSES) if extract else None
+    summary = {'records': 0, 'saved': 0, 'new': 0, 'updated': 0, 'skipped': 0, 'duplicates': 0, 'failed': 0}
+    # Jobs stamped since the import started were saved by an earlier record
+    started_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    started = time.perf_counter()
+    records = iter_feed_records(path, fmt)
+    if limit:
+        records = islice(records, limit)
+    try:
+        with scrape_profiler.recording() as profile:
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    break
+                summary['records'] += len(batch)
+                jobs = [job_data for job_data in map(feed_record_to_job, batch) if job_data]
+                summary['skipped'] += len(batch) - len(jobs)
+                if extract:
+                    _extract_batch(jobs, pool)
+                duplicates = profile.counters.get('jobs_duplicate', 0)
+                job_ids = save_jobs_batch(jobs, user_id=user_id, match_title=False, duplicate_since=started_at)
+                if not job_ids:
+                    summary['failed'] += len(jobs)
+                    continue
+                for job_data, job_id in zip(jobs, job_ids):
+                    if job_id:
+                        summary['saved'] += 1
+                        known_listings.add(normalize_source_url(job_data.get('source_url')))
+                    else:
+                        summary['failed'] += 1
+                duplicates = profile.counters.get('jobs_duplicate', 0) - duplicates
+                summary['saved'] -= duplicates
+                summary['duplicates'] += duplicates
+                elapsed = time.perf_counter() - started
+                logger.info(f"Imported {summary['saved']} jobs from {summary['records']} records "
+                            f"({summary['saved'] / elapsed:.1f} jobs/s)")
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        logger.error(f"Error reading feed {path}: {e}")
+        return None
+    summary['new'] = profile.counters.get('jobs_new', 0)
+    summary['updated'] = profile.counters.get('jobs_updated', 0)
+    summary['seconds'] = time.perf_counter() - started
+    summary['jobs_per_second'] = summary['saved'] / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
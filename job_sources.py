@@ -0,0 +1,477 @@
+"""
+Job sources the scraper searches.
+
+Each source implements the JobSource interface:
+
+    search(query, location, page) -> raw listings, or None if the page could not be fetched
+    parse_listing(raw) -> dict of listing fields, or None if it cannot be parsed
+    parse_detail(url) -> (description, site_name), or None
+
+AdzunaSource scrapes adzuna.in; LocalFileSource serves listings from JSON or
+JSON-lines files, for offline runs and for feeds exported by other tools.
+search_sources queries every enabled source (JOB_SOURCES, default "adzuna")
+concurrently, gives each its own time budget and merges the listings by
+normalized URL.
+"""
+import os
+import glob
+import json
+import time
+import random
+import logging
+import threading
+import requests
+from abc import ABC, abstractmethod
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import http_archive
+import scrape_profiler
+from database_manager import normalize_source_url
+from scrape_coordination import outbound_requests, time_left, deadline_passed
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Description shown until (or if) a listing's detail page can be fetched
+DETAIL_PLACEHOLDER_DESCRIPTION = "Click the job title to view the full description."
+
+LOCAL_SOURCE_PATH = os.environ.get(
+    'JOB_SOURCE_LOCAL_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'job_sources')
+)
+
+
+def fetch_page(url, params=None, retries=3, delay=5):
+    """
+    Fetches HTML content from a URL with retries and headers.
+
+    In http_archive's record mode every response is also stored in the
+    archive; in replay mode the archive answers instead of the network.
+    Under a scrape deadline (scrape_coordination.deadline_scope) request
+    timeouts and retries are cut to the time left, and None is returned
+    once it passed.
+    """
+    if http_archive.is_replaying():
+        with scrape_profiler.stage('fetch'):
+            record = http_archive.get_archive().lookup(url, params)
+        if record is None:
+            logger.warning(f"No recorded response for {url} {params or ''}")
+            return None
+        if record['status'] >= 400:
+            logger.warning(f"Recorded response for {url} is an error ({record['status']}). Skipping this URL.")
+            return None
+        scrape_profiler.record('bytes', len(record['body'].encode('utf-8')))
+        return record['body']
+    recording = http_archive.get_mode() == http_archive.MODE_RECORD
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36 JobScraper/1.0 (cody@sourcegraph.com)'
+    }
+    for attempt in range(retries):
+        if deadline_passed():
+            logger.warning(f"Scrape deadline passed; not fetching {url}")
+            return None
+        left = time_left()
+        try:
+            # Only log this at INFO level for significant page fetches
+            if attempt == 0:
+                logger.info(f"Fetching jobs data from: {url}")
+            outbound_requests.add()
+            scrape_profiler.record('requests')
+            if attempt:
+                scrape_profiler.record('retries')
+            with scrape_profiler.stage('fetch'):
+                response = requests.get(http_archive.rewrite_origin(url), headers=headers, params=params,
+                                        timeout=20 if left is None else min(20, left))
+            scrape_profiler.record('bytes', len(response.content))
+            if recording:
+                http_archive.get_archive().record(url, params, response.status_code, response.headers, response.text)
+            response.raise_for_status()
+            return response.text
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"HTTP error fetching {url} (attempt {attempt + 1}/{retries}): {e.response.status_code} {e.response.reason}")
+            if e.response.status_code in [404, 403, 410]:
+                logger.warning(f"Page not found/forbidden/gone ({e.response.status_code}). Skipping this URL.")
+                return None
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching {url} (attempt {attempt + 1}/{retries}): {e}")
+            if attempt < retries - 1:
+                actual_delay = delay + random.uniform(0, delay * 0.5)
+                left = time_left()
+                if left is not None and left <= actual_delay:
+                    deadline_passed()
+                    logger.warning(f"Not retrying {url}: the scrape deadline passes first")
+                    return None
+                logger.info(f"Retrying in {actual_delay:.2f} seconds...")
+                time.sleep(actual_delay)
+            else:
+                logger.error(f"Failed to fetch {url} after {retries} attempts.")
+    return None
+
+
+class JobSource(ABC):
+    """
+    A site or feed that can be searched for job listings.
+
+    Attributes:
+        name (str): Identifier used in JOB_SOURCES and stored on listings
+        time_budget (float): Seconds search_sources waits for one page from
+            this source before merging without it
+    """
+
+    name = None
+    time_budget = 60.0
+
+    @abstractmethod
+    def search(self, query, location, page):
+        """
+        Get one page of raw search results.
+
+        Returns:
+            list: Raw listings, or None if the page could not be fetched
+        """
+
+    @abstractmethod
+    def parse_listing(self, raw):
+        """
+        Read a raw listing's fields.
+
+        Returns:
+            dict: title, url and source_url plus whichever of company,
+                location, description and job_id the listing has, or None
+        """
+
+    def parse_detail(self, url):
+        """
+        Get the full description of a listing.
+
+        Returns:
+            tuple: (description, site_name), or None if the source has no detail pages
+        """
+        return None
+
+    def search_listings(self, query, location, page):
+        """
+        Search and parse one page of listings.
+
+        Returns:
+            list: Listing field dictionaries tagged with 'source', or None
+                if the page could not be fetched
+        """
+        raw_listings = self.search(query, location, page)
+        if raw_listings is None:
+            return None
+        listings = []
+        for raw in raw_listings:
+            try:
+                with scrape_profiler.stage('parse'):
+                    fields = self.parse_listing(raw)
+            except Exception as e:
+                logger.error(f"Error parsing {self.name} listing: {e}")
+                continue
+            if fields:
+                fields['source'] = self.name
+                listings.append(fields)
+        return listings
+
+
+class AdzunaSource(JobSource):
+    """Search results and landing pages of adzuna.in."""
+
+    name = 'adzuna'
+    BASE_URL = 'https://www.adzuna.in'
+    SEARCH_URL = BASE_URL + '/search'
+
+    def search(self, query, location, page):
+        params = {}
+        if query:
+            params['q'] = query
+        params['w'] = location
+        params['p'] = page
+        try:
+            html_content = fetch_page(self.SEARCH_URL, params=params)
+            if not html_content:
+                logger.warning(f"Failed to fetch Adzuna search results page {page}. Skipping.")
+                return None
+        except Exception as e:
+            logger.error(f"Error fetching search page {page}: {e}")
+            return None
+
+        # Process the HTML content for this page
+        with scrape_profiler.stage('parse_page'):
+            soup = BeautifulSoup(html_content, 'html.parser')            # Use the specific Adzuna article selector
+            articles = soup.select('article.a')
+            if not articles:
+                logger.warning(f"No job listings found on page {page}. Trying alternative selectors...")
+                # Try alternative selectors if the main one fails
+                articles = soup.select('[data-aid]') or soup.select('.job-listing') or soup.select('.result')
+        if not articles:
+            logger.warning(f"No job listings found on page {page} with any selector")
+        else:
+            logger.info(f"Found {len(articles)} job listings on page {page}")
+        return articles
+
+    def parse_listing(self, raw):
+        fields = {}
+        # Extract job ID if available
+        if hasattr(raw, 'get'):
+            fields['job_id'] = raw.get('data-aid', '')
+        # Extract title and URL
+        try:
+            title_elem = raw.select_one('h2[itemprop="title"], h2.job-title, .a-title, a[data-aid="jobTitle"]')
+            if not title_elem:
+                title_elem = raw.select_one('h2 a')
+            if not title_elem or not title_elem.get_text().strip():
+                logger.warning("No title found for job listing")
+                return None
+        except AttributeError:
+            logger.error(f"Error parsing job listing: {type(raw).__name__} object has no attribute 'select_one'")
+            return None
+
+        fields['title'] = title_elem.get_text().strip()
+
+        # Get URL
+        url_elem = title_elem if title_elem.name == 'a' else title_elem.find('a')
+        if url_elem and url_elem.has_attr('href'):
+            fields['url'] = urljoin(self.BASE_URL, url_elem['href'])
+            fields['source_url'] = fields['url']
+        else:
+            logger.warning(f"No URL found for job: {fields['title']}")
+            return None
+
+        # Company
+        company_elem = raw.select_one('div.ui-company')
+        fields['company'] = company_elem.get_text().strip() if company_elem else None
+
+        # Location
+        location_elem = raw.select_one('div.ui-location')
+        fields['location'] = location_elem.get_text().strip() if location_elem else None
+
+        # Description
+        desc_elem = raw.select_one('span.max-snippet-height')
+        if desc_elem:
+            fields['description'] = desc_elem.get_text().strip()
+        return fields
+
+    def parse_detail(self, url):
+        logger.info(f"Fetching details from Adzuna landing page: {url}")
+        html_content = fetch_page(url)    # Even if we can't get the detail page, return a basic description
+        if not html_content:
+            logger.warning(f"Could not fetch detail page for {url} - using basic description")
+            return DETAIL_PLACEHOLDER_DESCRIPTION, "Adzuna"
+
+        soup = BeautifulSoup(html_content, 'html.parser')
+        site_name = "Adzuna"
+
+        redirect_message_h2 = soup.find('h2', string=lambda t: t and "you are being redirected to" in t.lower())
+        if redirect_message_h2 and redirect_message_h2.strong:
+            return "Full description not found on Adzuna landing page (this is expected).", site_name
+        return None
+
+
+class LocalFileSource(JobSource):
+    """
+    Listings read from .json (a list of objects) and .jsonl files.
+
+    Each object needs a title and a url (or source_url); company, location,
+    description, job_type, is_remote and date_posted are used when present.
+    A query matches a listing when all words of any OR-separated alternative
+    appear in its title or description; in "<words> (<a> OR <b>)" the words
+    outside the group belong to every alternative, so combined skill queries
+    work too.
+    """
+
+    name = 'local'
+    time_budget = 5.0
+    FIELDS = ('title', 'company', 'location', 'url', 'source_url', 'description', 'job_type', 'is_remote',
+              'date_posted', 'job_id')
+
+    def __init__(self, path=LOCAL_SOURCE_PATH, page_size=20):
+        self.path = path
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._signature = None
+        self._listings = []
+
+    def _files(self):
+        if os.path.isdir(self.path):
+            return sorted(glob.glob(os.path.join(self.path, '*.json')) + glob.glob(os.path.join(self.path, '*.jsonl')))
+        return [self.path] if os.path.exists(self.path) else []
+
+    def _load(self):
+        """Read the files, again only when one of them changed."""
+        files = self._files()
+        signature = tuple((path, os.path.getmtime(path)) for path in files)
+        with self._lock:
+            if signature != self._signature:
+                listings = []
+                for path in files:
+                    try:
+                        with open(path, encoding='utf-8') as f:
+                            if path.endswith('.jsonl'):
+                                listings.extend(json.loads(line) for line in f if line.strip())
+                            else:
+                                data = json.load(f)
+                                listings.extend(data if isinstance(data, list) else [data])
+                    except (OSError, json.JSONDecodeError) as e:
+                        logger.error(f"Error reading job source file {path}: {e}")
+                self._listings = [listing for listing in listings if isinstance(listing, dict)]
+                self._signature = signature
+                logger.info(f"Loaded {len(self._listings)} listings from {self.path}")
+            return self._listings
+
+    @staticmethod
+    def _alternatives(query):
+        base, group, alternatives_text = (query or '').partition('(')
+        if not group:
+            base, alternatives_text = '', base
+        alternatives = []
+        for alternative in alternatives_text.rstrip().rstrip(')').split(' OR '):
+            words = f"{base} {alternative}".replace('"', ' ').lower().split()
+            if words:
+                alternatives.append(words)
+        return alternatives
+
+    def search(self, query, location, page):
+        if not self._files():
+            logger.warning(f"Local job source {self.path} has no listing files")
+            return None
+        alternatives = self._alternatives(query)
+        location = (location or '').lower().strip()
+        matches = []
+        for listing in self._load():
+            text = f"{listing.get('title') or ''} {listing.get('description') or ''}".lower()
+            if alternatives and not any(all(word in text for word in words) for words in alternatives):
+                continue
+            listing_location = (listing.get('location') or '').lower()
+            if location and listing_location and location not in listing_location and listing_location not in location:
+                continue
+            matches.append(listing)
+        start = (max(1, page) - 1) * self.page_size
+        return matches[start:start + self.page_size]
+
+    def parse_listing(self, raw):
+        fields = {field: raw.get(field) for field in self.FIELDS if raw.get(field) is not None}
+        fields['url'] = fields.get('url') or fields.get('source_url')
+        if not fields.get('title') or not fields['url']:
+            return None
+        fields.setdefault('source_url', fields['url'])
+        return fields
+
+    def parse_detail(self, url):
+        url = normalize_source_url(url)
+        for listing in self._load():
+            if normalize_source_url(listing.get('source_url') or listing.get('url')) == url and listing.get('description'):
+                return listing['description'], listing.get('company') or 'Local'
+        return None
+
+
+_sources = {}
+_sources_lock = threading.Lock()
+_SOURCE_TYPES = {AdzunaSource.name: AdzunaSource, LocalFileSource.name: LocalFileSource}
+
+# Shared by every fan-out; a source that overruns its budget keeps its
+# thread until its fetch finishes, so leave room for that
+_fanout_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='job-source')
+
+
+def get_source(name):
+    """Get the shared instance of a source by name."""
+    with _sources_lock:
+        if name not in _sources:
+            _sources[name] = _SOURCE_TYPES[name]()
+        return _sources[name]
+
+
+def get_enabled_sources():
+    """Get the sources listed in JOB_SOURCES (comma-separated, default "adzuna")."""
+    names = [name.strip().lower() for name in os.environ.get('JOB_SOURCES', AdzunaSource.name).split(',')]
+    sources = []
+    for name in dict.fromkeys(names):
+        if name in _SOURCE_TYPES:
+            sources.append(get_source(name))
+        elif name:
+            logger.warning(f"Unknown job source '{name}' in JOB_SOURCES")
+    return sources or [get_source(AdzunaSource.name)]
+
+
+def merge_listings(listing_lists):
+    """
+    Merge listings from several sources, keyed by normalized URL.
+
+    The first source to return a listing wins; later sources only fill in
+    fields it lacks.
+
+    Args:
+        listing_lists (list): Lists of listing field dictionaries, in source priority order
+
+    Returns:
+        list: Merged listings, in first-seen order
+    """
+    merged = {}
+    for listings in listing_lists:
+        for fields in listings:
+            key = normalize_source_url(fields.get('source_url') or fields.get('url'))
+            if not key:
+                continue
+            if key not in merged:
+                merged[key] = dict(fields)
+            else:
+                for field, value in fields.items():
+                    if merged[key].get(field) in (None, '') and value not in (None, ''):
+                        merged[key][field] = value
+    return list(merged.values())
+
+
+def search_sources(query, location, page, sources=None):
+    """
+    Search several sources at once and merge their listings.
+
+    Each source runs on its own thread and gets its own time_budget, cut to
+    the time left before a scrape deadline; a source that fails or overruns
+    is left out of this page's results.
+
+    Args:
+        query (str): Search query
+        location (str): Search location
+        page (int): Results page number
+        sources (list): Sources to query; defaults to get_enabled_sources()
+
+    Returns:
+        list: Merged listing field dictionaries, or None if no source returned a page
+    """
+    sources = sources or get_enabled_sources()
+    if len(sources) == 1:
+        # Nothing to wait for in parallel
+        return sources[0].search_listings(query, location, page)
+
+    started = time.monotonic()
+    futures = [(source, _fanout_executor.submit(scrape_profiler.carry(source.search_listings), query, location, page))
+               for source in sources]
+    results = []
+    for source, future in futures:
+        remaining = source.time_budget - (time.monotonic() - started)
+        left = time_left()
+        if left is not None:
+            remaining = min(remaining, left)
+        try:
+            listings = future.result(timeout=max(0.0, remaining))
+        except FutureTimeoutError:
+            future.cancel()
+            if deadline_passed():
+                logger.warning(f"Scrape deadline passed before job source '{source.name}' returned "
+                               f"page {page} of '{query}'")
+                continue
+            scrape_profiler.record('errors')
+            logger.warning(f"Job source '{source.name}' exceeded its {source.time_budget:g}s budget "
+                           f"for page {page} of '{query}'")
+            continue
+        except Exception as e:
+            scrape_profiler.record('errors')
+            logger.error(f"Job source '{source.name}' failed for page {page} of '{query}': {e}")
+            continue
+        if listings is not None:
+            results.append(listings)
+    if not results:
+        return None
+    return merge_listings(results)
@@ -2,7 +2,7 @@
 Utility functions for job operations.
 """
 import logging
-from database_manager import get_db_connection
+from database_manager import db_connection
 
 # Configure logging
 logging.basicConfig(
@@ -25,13 +25,12 @@ def count_user_jobs(user_id):
         return 0
         
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM jobs WHERE user_id = ?", (user_id,))
-        count = cursor.fetchone()[0]
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT COUNT(*) FROM user_jobs WHERE user_id = ?", (user_id,))
+            count = cursor.fetchone()[0]
         
-        conn.close()
         return count
     except Exception as e:
         logger.error(f"Error counting user jobs: {e}")
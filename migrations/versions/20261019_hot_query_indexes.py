@@ -0,0 +1,56 @@
+"""add indexes for the hot queries
+
+Revision ID: 20261019_hot_query_indexes
+Revises: 20250514_fix_education_dates
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_hot_query_indexes'
+down_revision = '20250514_fix_education_dates'
+branch_labels = None
+depends_on = None
+
+# name -> (table, columns[, partial index condition]); kept in step with
+# database_manager.INDEXES
+INDEXES = {
+    # Skills join, GROUP_CONCAT and EXISTS subquery of the job search, covered
+    'idx_job_skills_job_id_skill': ('job_skills', ['job_id', 'skill']),
+    'idx_job_skills_skill_job_id': ('job_skills', ['skill', 'job_id']),
+    # user_jobs' (user_id, job_id) primary key already serves user_id lookups
+    'idx_user_jobs_job_id': ('user_jobs', ['job_id', 'user_id']),
+    # Duplicate check of saved listings that have no source URL
+    'idx_jobs_title_company_no_url': ('jobs', ['title', 'company'], 'source_url IS NULL'),
+    'idx_jobs_job_id_no_url': ('jobs', ['job_id'], 'source_url IS NULL'),
+    'idx_jobs_detail_status': ('jobs', ['detail_status', 'detail_attempts']),
+    'idx_scrape_tasks_status': ('scrape_tasks', ['status', 'priority', 'created_at']),
+    'idx_scrape_tasks_user_id': ('scrape_tasks', ['user_id', 'status']),
+    'idx_scrape_runs_started_at': ('scrape_runs', ['started_at']),
+    'idx_scrape_runs_user_id': ('scrape_runs', ['user_id', 'started_at', 'http_requests']),
+}
+
+
+def _existing_indexes(inspector, table):
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    # These tables are created by database_manager.initialize_database, not
+    # the models, so only index the ones this database has
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for name, (table, columns, *where) in INDEXES.items():
+        if table in tables and name not in _existing_indexes(inspector, table):
+            op.create_index(name, table, columns, sqlite_where=sa.text(where[0]) if where else None)
+    op.execute('ANALYZE')
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for name, (table, *_) in INDEXES.items():
+        if table in tables and name in _existing_indexes(inspector, table):
+            op.drop_index(name, table_name=table)
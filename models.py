@@ -2,9 +2,13 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.sql import func
 import os
+import sqlite3
 import logging
+from database_manager import configure_connection
 
 # Configure logging
 logging.basicConfig(
@@ -17,6 +21,12 @@ logger = logging.getLogger(__name__)
 # Initialize SQLAlchemy with no Flask app yet (will be registered later)
 db = SQLAlchemy()
 
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """Give SQLAlchemy's SQLite connections the same pragmas as database_manager's."""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        configure_connection(dbapi_connection)
+
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(20), unique=True, nullable=False)
@@ -68,6 +78,7 @@ class Education(db.Model):
 
 class Job(db.Model):
     __tablename__ = 'jobs'  # Explicitly set the table name
+    # One row per distinct listing, shared by all users through user_jobs
     
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.String(255))
@@ -96,6 +107,16 @@ class Job(db.Model):
     def __repr__(self):
         return f'<Job {self.title} at {self.company}>'
 
+class UserJob(db.Model):
+    __tablename__ = 'user_jobs'  # Association between users and shared jobs
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id', ondelete='CASCADE'), primary_key=True)
+    date_added = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UserJob user={self.user_id} job={self.job_id}>'
+
 class JobSkill(db.Model):
     __tablename__ = 'job_skills'  # Explicitly set the table name
 
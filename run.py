@@ -138,6 +138,11 @@ def main():
         port = int(os.environ.get('FLASK_PORT', 5000))
         debug = os.environ.get('FLASK_DEBUG', 'False').lower() in ('true', '1', 't')
         
+        # Process queued scrapes in this process when no separate worker runs
+        if app.config.get('EMBEDDED_SCRAPE_WORKER') and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+            from scrape_queue import start_embedded_worker
+            start_embedded_worker()
+        
         logger.info(f"Starting Flask application on {host}:{port} (debug={debug})...")
         app.run(host=host, port=port, debug=debug, use_reloader=debug)
         
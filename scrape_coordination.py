@@ -0,0 +1,329 @@
+"""
+Coordination helpers that stop concurrent requests from repeating scraping work.
+
+SingleFlight lets concurrent callers asking for the same search page share one
+in-flight fetch, and UserScrapeLock keeps a single account from running two
+refreshes at the same time (e.g. a double-clicked Refresh button). Both are
+process-local: they only coordinate threads of one process. Across processes,
+scrape_queue allows one active task per user and the queue is the only
+caller of scraper.scrape_jobs, so different workers never refresh the same
+user at once; concurrent fetches of one search page in different processes
+are not collapsed.
+KnownListings answers "have we stored this listing already?" from an in-memory
+Bloom filter so most new listings never need a database lookup.
+RequestCounter counts outbound HTTP requests so schedulers can charge them
+against a request budget. A Deadline bounds how long a scrape may take; while
+one is in scope (see deadline_scope) fetches, searches and waits on shared
+calls stop once it passes.
+"""
+import math
+import time
+import hashlib
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from database_manager import get_all_source_urls
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """State of one in-flight call shared between its callers."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for it and receive the same result (or exception).
+    Once the call finishes the key is forgotten, so later calls run again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) once for all concurrent callers of key.
+
+        Args:
+            key: Hashable key identifying the work
+            fn: Function to run
+
+        Returns:
+            tuple: (result, shared) where shared is True if the result came
+                from another caller's execution
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                is_leader = True
+            else:
+                is_leader = False
+
+        if not is_leader:
+            logger.info(f"Joining in-flight call for {key}")
+            if not call.done.wait(time_left()):
+                deadline_passed()
+                raise TimeoutError(f"Scrape deadline passed while waiting for in-flight call {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+
+class UserScrapeLock:
+    """
+    Non-blocking per-user lock guarding against overlapping refreshes.
+
+    The lock is per process; scrape_queue's one active task per user is what
+    keeps worker processes from refreshing the same user concurrently.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = set()
+
+    def acquire(self, user_id):
+        """Mark a scrape as running for user_id. Returns False if one already is."""
+        with self._lock:
+            if user_id in self._active:
+                return False
+            self._active.add(user_id)
+            return True
+
+    def release(self, user_id):
+        """Mark the user's scrape as finished."""
+        with self._lock:
+            self._active.discard(user_id)
+
+    def is_locked(self, user_id):
+        """Check whether a scrape is currently running for user_id."""
+        with self._lock:
+            return user_id in self._active
+
+    @contextmanager
+    def hold(self, user_id):
+        """Context manager yielding True if the lock was acquired."""
+        acquired = self.acquire(user_id)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release(user_id)
+
+
+class Deadline:
+    """
+    A point in time by which a scrape must return.
+
+    cut_short is set once work was skipped or abandoned because the deadline
+    passed, so callers can tell partial results from complete ones.
+    """
+
+    def __init__(self, seconds):
+        self.at = time.monotonic() + seconds
+        self.cut_short = False
+
+    def time_left(self):
+        """Seconds until the deadline, 0 once it passed."""
+        return max(0.0, self.at - time.monotonic())
+
+
+_deadline = contextvars.ContextVar('scrape_deadline', default=None)
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """
+    Bound the scrape work in this context to a deadline.
+
+    Work handed to other threads with scrape_profiler.carry is bound too. An
+    enclosing earlier deadline stays in force.
+
+    Args:
+        deadline: Seconds from now, a Deadline, or None for no bound
+
+    Yields:
+        Deadline: The deadline in force, or None
+    """
+    if deadline is not None and not isinstance(deadline, Deadline):
+        deadline = Deadline(deadline)
+    current = _deadline.get()
+    if deadline is None or (current is not None and current.at <= deadline.at):
+        yield current
+        return
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def time_left():
+    """Seconds until the current scrape deadline, or None without one."""
+    deadline = _deadline.get()
+    return deadline.time_left() if deadline is not None else None
+
+
+def deadline_passed():
+    """
+    Check whether the current scrape deadline passed.
+
+    Call before starting a piece of work; a True result marks the deadline
+    as having cut the scrape short.
+    """
+    deadline = _deadline.get()
+    if deadline is None or deadline.time_left() > 0:
+        return False
+    deadline.cut_short = True
+    return True
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    Membership tests can return false positives (at roughly error_rate once
+    capacity items are added) but never false negatives.
+    """
+
+    def __init__(self, capacity=200000, error_rate=0.01):
+        capacity = max(int(capacity), 1)
+        self.num_bits = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: derive all k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class KnownListings:
+    """
+    Bloom filter of the listing URLs already stored in the shared corpus.
+
+    The filter is loaded lazily from the database and rebuilt after max_age
+    seconds (or once it fills past its capacity) so listings saved by other
+    processes are picked up. A miss means the listing is definitely new and
+    the database lookup can be skipped; a hit must still be confirmed in
+    SQLite.
+    """
+
+    def __init__(self, loader, capacity=200000, error_rate=0.01, max_age=600):
+        self._loader = loader
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._filter = None
+        self._loaded_at = 0
+
+    def _ensure_loaded(self):
+        stale = time.monotonic() - self._loaded_at > self._max_age
+        if self._filter is not None and not stale and self._filter.count <= self._capacity:
+            return self._filter
+        urls = self._loader()
+        bloom = BloomFilter(max(self._capacity, len(urls) * 2), self._error_rate)
+        for url in urls:
+            bloom.add(url)
+        self._filter = bloom
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(urls)} known listing URLs into Bloom filter")
+        return bloom
+
+    def might_contain(self, source_url):
+        """Return False if the listing is definitely not stored yet."""
+        if not source_url:
+            return False
+        with self._lock:
+            return source_url in self._ensure_loaded()
+
+    def add(self, source_url):
+        """Record a newly stored listing."""
+        if not source_url:
+            return
+        with self._lock:
+            self._ensure_loaded().add(source_url)
+
+    def reset(self):
+        """Forget the filter, e.g. after the jobs table was cleared."""
+        with self._lock:
+            self._filter = None
+
+
+class RequestCounter:
+    """Thread-safe count of outbound HTTP requests made by this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def add(self, n=1):
+        with self._lock:
+            self._count += n
+
+    @property
+    def value(self):
+        with self._lock:
+            return self._count
+
+
+def normalize_search_key(query, location, page):
+    """
+    Build the key identifying a search results page.
+
+    Query and location are case-folded and whitespace-collapsed so that
+    "Python  Developer" and "python developer" share one fetch.
+
+    Args:
+        query (str): Search query
+        location (str): Search location
+        page (int): Results page number
+
+    Returns:
+        tuple: (query, location, page)
+    """
+    def _norm(value):
+        return ' '.join(str(value or '').lower().split())
+    return (_norm(query), _norm(location), int(page))
+
+
+# Process-wide instances shared by the scraper and the web routes
+search_flight = SingleFlight()
+user_scrape_locks = UserScrapeLock()
+known_listings = KnownListings(get_all_source_urls)
+outbound_requests = RequestCounter()
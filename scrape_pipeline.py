@@ -0,0 +1,255 @@
+"""
+Staged, back-pressured pipeline for processing scraped job listings.
+
+Listings flow through three stages connected by bounded queues:
+
+    parse (caller thread) -> extract (process pool) -> persist (single writer thread)
+
+A full downstream queue blocks the stage feeding it, so memory stays flat
+however many listings are submitted, while parsing overlaps with NLP running
+on every CPU core. All SQLite writes happen on one thread. Detail pages are
+not fetched during a scrape (see scraper.enrich_pending_jobs).
+
+Only processes that call enable_nlp_pool (the `flask scrape-worker` and other
+batch commands) start NLP worker processes; elsewhere, such as a web process
+running the embedded scrape worker, NLP runs in the pipeline's own thread.
+The stage threads run in the creating thread's context, so stage timings
+reach the scrape run's profile (see scrape_profiler.recording), including
+those measured in the NLP worker processes.
+"""
+import os
+import queue
+import logging
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import scrape_profiler
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+NLP_PROCESSES = int(os.environ.get('SCRAPE_NLP_PROCESSES', max(1, (os.cpu_count() or 2) - 1)))
+QUEUE_SIZE = int(os.environ.get('SCRAPE_QUEUE_SIZE', 32))
+
+_STOP = object()
+
+_nlp_pool = None
+_nlp_pool_lock = threading.Lock()
+_nlp_processes = 0  # Pool size of this process; set by enable_nlp_pool
+
+
+def enable_nlp_pool(processes=NLP_PROCESSES):
+    """
+    Let pipelines in this process run NLP in a pool of worker processes.
+
+    Args:
+        processes (int): Worker processes the pool is started with
+    """
+    global _nlp_processes
+    _nlp_processes = processes
+
+
+def get_nlp_pool(processes=None):
+    """
+    Get the process pool used for NLP, creating it on first use.
+
+    The pool is shared by every pipeline in the process so worker processes
+    (and the spaCy model they hold) are started only once.
+
+    Args:
+        processes (int): Pool size; defaults to the one enable_nlp_pool set,
+            which is 0 (no pool) unless it was called
+
+    Returns:
+        ProcessPoolExecutor: The pool, or None if NLP should run in-process
+    """
+    global _nlp_pool
+    if processes is None:
+        processes = _nlp_processes
+    if processes <= 0:
+        return None
+    with _nlp_pool_lock:
+        if _nlp_pool is None:
+            try:
+                _nlp_pool = ProcessPoolExecutor(max_workers=processes)
+                logger.info(f"Started NLP process pool with {processes} worker(s)")
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"Could not start NLP process pool, extracting in-process: {e}")
+                return None
+        return _nlp_pool
+
+
+def _reset_nlp_pool():
+    """Drop a broken pool so the next pipeline starts a fresh one."""
+    global _nlp_pool
+    with _nlp_pool_lock:
+        _nlp_pool = None
+
+
+class ScrapePipeline:
+    """
+    Run listings through extract and persist stages concurrently.
+
+    The stages are supplied as callables so the pipeline has no dependency on
+    the scraper module:
+
+        prepare(job_data) -> job_data             runs on the dispatcher thread
+        extract(description) -> result            runs in a worker process
+        apply(job_data, result) -> job_data       runs on the dispatcher thread
+        persist(job_data, crawl_stats) -> job_id  runs on the writer thread
+
+    extract must be a module-level function so it can be pickled.
+    """
+
+    def __init__(self, prepare, extract, apply, persist, nlp_processes=None, queue_size=QUEUE_SIZE):
+        self._prepare = prepare
+        self._extract = extract
+        self._apply = apply
+        self._persist = persist
+        self._nlp_processes = nlp_processes
+
+        self._extract_queue = queue.Queue(maxsize=queue_size)
+        self._persist_queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._started = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def start(self):
+        """Start the stage threads."""
+        if self._started:
+            return
+        processes = _nlp_processes if self._nlp_processes is None else self._nlp_processes
+        self._pool = get_nlp_pool(processes)
+        # At most this many extractions are in flight in the pool at once
+        self._extract_window = max(1, processes) * 2
+        self._dispatcher = threading.Thread(target=scrape_profiler.carry(self._extract_worker), name='scrape-extract',
+                                            daemon=True)
+        self._writer = threading.Thread(target=scrape_profiler.carry(self._persist_worker), name='scrape-writer',
+                                        daemon=True)
+        self._threads = [self._dispatcher, self._writer]
+        for thread in self._threads:
+            thread.start()
+        self._started = True
+
+    def close(self):
+        """Drain every stage and stop the threads."""
+        if not self._started:
+            return
+        self._extract_queue.put(_STOP)
+        self._dispatcher.join()
+        self._persist_queue.put(_STOP)
+        self._writer.join()
+        self._started = False
+
+    def submit(self, job_data, crawl_stats=None):
+        """
+        Queue a parsed listing, blocking while the pipeline is full.
+
+        Returns:
+            Future: Resolves to the saved job's ID, or None if it failed
+        """
+        if not self._started:
+            self.start()
+        future = Future()
+        self._extract_queue.put((future, job_data, crawl_stats))
+        return future
+
+    def _fail(self, future, stage, job_data, error):
+        logger.error(f"Error in {stage} stage for job '{job_data.get('title')}': {error}")
+        logger.error(traceback.format_exc())
+        if not future.done():
+            future.set_result(None)
+
+    def _run_extract(self, description):
+        """
+        Submit an extraction to the pool, or run it here if there is no pool.
+
+        Returns:
+            Future: Resolves to (result, stage timings measured in the worker process)
+        """
+        if self._pool is not None:
+            try:
+                return self._pool.submit(scrape_profiler.call_timed, self._extract, description)
+            except Exception as e:
+                logger.warning(f"NLP process pool unavailable, extracting in-process: {e}")
+                self._pool = None
+                _reset_nlp_pool()
+        future = Future()
+        try:
+            # Stages run here are recorded directly
+            future.set_result((self._extract(description), {}))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _forward_oldest(self, pending):
+        """Wait for the oldest extraction and hand its listing to the writer."""
+        future, job_data, crawl_stats, extraction = pending.popleft()
+        if extraction is not None:
+            try:
+                try:
+                    result, timings = extraction.result()
+                    scrape_profiler.add_timings(timings)
+                except BrokenProcessPool:
+                    # A worker process died; redo this one here and stop using the pool
+                    logger.warning("NLP process pool broke, extracting in-process")
+                    self._pool = None
+                    _reset_nlp_pool()
+                    result = self._extract(job_data['description'])
+                job_data = self._apply(job_data, result)
+            except Exception as e:
+                # Save the listing without skills rather than dropping it
+                logger.error(f"Skill extraction failed for '{job_data.get('title')}': {e}")
+        self._persist_queue.put((future, job_data, crawl_stats))
+
+    def _extract_worker(self):
+        pending = deque()
+        while True:
+            try:
+                item = self._extract_queue.get(timeout=0.05)
+            except queue.Empty:
+                # Nothing new arriving; don't hold finished work back
+                if pending:
+                    self._forward_oldest(pending)
+                continue
+            if item is _STOP:
+                while pending:
+                    self._forward_oldest(pending)
+                return
+            future, job_data, crawl_stats = item
+            try:
+                job_data = self._prepare(job_data)
+            except Exception as e:
+                self._fail(future, 'prepare', job_data, e)
+                continue
+            extraction = None
+            if job_data.get('description'):
+                extraction = self._run_extract(job_data['description'])
+            pending.append((future, job_data, crawl_stats, extraction))
+            while pending and (len(pending) >= self._extract_window or self._is_ready(pending[0])):
+                self._forward_oldest(pending)
+
+    @staticmethod
+    def _is_ready(entry):
+        extraction = entry[3]
+        return extraction is None or extraction.done()
+
+    def _persist_worker(self):
+        while True:
+            item = self._persist_queue.get()
+            if item is _STOP:
+                return
+            future, job_data, crawl_stats = item
+            try:
+                future.set_result(self._persist(job_data, crawl_stats))
+            except Exception as e:
+                self._fail(future, 'persist', job_data, e)
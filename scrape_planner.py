@@ -0,0 +1,303 @@
+"""
+Cross-user batch scrape planning.
+
+Each user's refresh searches every one of their skills, so users with
+overlapping skills repeat the same Adzuna searches. `flask batch-scrape`
+instead collects the skills and locations of every active user, reduces them
+to the distinct (skill, location) pairs, scrapes each pair once (combined into
+OR queries by scraper.plan_skill_queries) and links the results to every user
+interested in them. Run it periodically (e.g. from cron every few hours); users
+it covered count as refreshed, so their next visit does not queue a scrape.
+
+The pre-scrape scheduler (run_prescrape, triggered by idle scrape workers or
+`flask prescrape`) does the same for just the users who are likely to visit
+within the refresh window, predicted from their past visit times, and whose
+jobs would be stale by then. Outside off-peak hours it only serves users
+expected within the hour, and every search is charged against a request
+budget shared by all processes.
+"""
+import os
+import logging
+import traceback
+from datetime import datetime, timedelta
+from database_manager import (
+    get_active_users,
+    mark_users_refreshed,
+    get_user_last_refresh,
+    get_visit_history,
+    take_request_budget,
+    claim_periodic_run
+)
+from scrape_coordination import outbound_requests
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Location searched for users without one, as in scraper.scrape_adzuna_jobs
+DEFAULT_LOCATION = "India"
+ACTIVE_USER_DAYS = 14
+
+# Pre-scrape scheduling
+REFRESH_HOURS = 6  # list_all_jobs scrapes again once jobs are this old
+VISIT_HISTORY_DAYS = 28
+MIN_OBSERVED_DAYS = 7  # Visit shares are taken over at least this many days
+RECENT_VISIT_BONUS = 0.25  # Added to the visit probability of users seen in the last day
+MIN_VISIT_PROBABILITY = 0.3
+URGENT_HOURS = 1  # Outside off-peak hours, only users expected this soon are served
+OFF_PEAK_SHARE = 0.5  # Hours with fewer visits than this share of the average hour are off-peak
+PRESCRAPE_BUDGET = 'prescrape'
+PRESCRAPE_REQUESTS_PER_HOUR = float(os.environ.get('PRESCRAPE_REQUESTS_PER_HOUR', 120))
+PRESCRAPE_INTERVAL_SECONDS = int(os.environ.get('PRESCRAPE_INTERVAL_SECONDS', 600))
+
+
+def plan_batch_queries(users):
+    """
+    Turn users' skills and locations into deduplicated searches.
+
+    Args:
+        users (list): Dictionaries with id, location and skills, as returned
+            by database_manager.get_active_users
+
+    Returns:
+        list: Dictionaries with query, location, skills (the skills the
+            query covers) and interested_users ({skill: set of user IDs})
+    """
+    # Imported here so the module can be imported without loading the scraper's NLP model
+    from scraper import plan_skill_queries
+
+    # location key -> (display location, {skill key: display skill}, {display skill: user IDs})
+    by_location = {}
+    for user in users:
+        location = (user.get('location') or '').strip() or DEFAULT_LOCATION
+        display_location, skill_names, interested = by_location.setdefault(
+            ' '.join(location.lower().split()), (location, {}, {})
+        )
+        for skill in user['skills']:
+            name = skill_names.setdefault(skill.strip().lower(), skill.strip())
+            interested.setdefault(name, set()).add(user['id'])
+
+    plan = []
+    for display_location, skill_names, interested in by_location.values():
+        for query, skills in plan_skill_queries("", list(skill_names.values())):
+            plan.append({
+                'query': query,
+                'location': display_location,
+                'skills': skills,
+                'interested_users': {skill: interested[skill] for skill in skills}
+            })
+    return plan
+
+
+def run_batch_scrape(pages=1, active_days=ACTIVE_USER_DAYS, dry_run=False):
+    """
+    Scrape every active user's skills once and fan the results out.
+
+    Args:
+        pages (int): Starting depth of each search
+        active_days (int): Users who signed up or requested a scrape within
+            this many days are included
+        dry_run (bool): Only plan and log the searches
+
+    Returns:
+        dict: users, pairs (distinct skill/location pairs), per_user_searches
+            (searches the users' own refreshes would make), queries, and
+            the counts from running them (run, failed, deferred, requests, links)
+    """
+    users = get_active_users(active_days)
+    plan = plan_batch_queries(users)
+    summary = {
+        'users': len(users),
+        'pairs': sum(len(search['skills']) for search in plan),
+        'per_user_searches': sum(len(user['skills']) for user in users),
+        'queries': len(plan),
+        'failed': 0,
+        'links': 0
+    }
+    logger.info(f"Batch scrape plan: {summary['users']} users, {summary['pairs']} distinct skill/location pairs "
+                f"in {summary['queries']} queries (per-user refreshes would make {summary['per_user_searches']})")
+    if dry_run or not plan:
+        return summary
+
+    summary.update(_execute_plan(plan, pages))
+    logger.info(f"Batch scrape finished: {summary['links']} user/job links, {summary['failed']} failed queries")
+    return summary
+
+
+def _search_users(search):
+    return {user_id for user_ids in search['interested_users'].values() for user_id in user_ids}
+
+
+def _execute_plan(plan, pages, budget_per_hour=None):
+    """
+    Run planned searches and mark the users they fully covered as refreshed.
+
+    With budget_per_hour, each search is paid for from the shared
+    PRESCRAPE_BUDGET request bucket: its starting depth up front, settled
+    with the requests it actually made afterwards. Searches that no longer
+    fit are deferred to a later run.
+
+    Returns:
+        dict: run, failed and deferred search counts, requests made and
+            links (user/job links made)
+    """
+    from scraper import scrape_shared_search
+
+    result = {'run': 0, 'failed': 0, 'deferred': 0, 'requests': 0, 'links': 0}
+    refreshed = set()
+    incomplete = set()  # Users with a failed or deferred search
+    for index, search in enumerate(plan):
+        if budget_per_hour is not None and not take_request_budget(PRESCRAPE_BUDGET, pages, budget_per_hour):
+            result['deferred'] = len(plan) - index
+            for deferred in plan[index:]:
+                incomplete.update(_search_users(deferred))
+            logger.info(f"Request budget exhausted; deferring {result['deferred']} search(es)")
+            break
+        requests_before = outbound_requests.value
+        try:
+            linked = scrape_shared_search(
+                search['query'], search['location'], search['skills'], search['interested_users'], pages=pages
+            )
+            result['run'] += 1
+            refreshed.update(linked)
+            result['links'] += sum(len(job_ids) for job_ids in linked.values())
+        except Exception as e:
+            logger.error(f"Batch search '{search['query']}' in '{search['location']}' failed: {e}")
+            logger.error(traceback.format_exc())
+            result['failed'] += 1
+            incomplete.update(_search_users(search))
+        finally:
+            requests_made = outbound_requests.value - requests_before
+            result['requests'] += requests_made
+            if budget_per_hour is not None:
+                take_request_budget(PRESCRAPE_BUDGET, requests_made - pages, budget_per_hour, force=True)
+
+    # Only users whose every search ran are up to date
+    mark_users_refreshed(sorted(refreshed - incomplete))
+    return result
+
+
+def predict_next_visit(visits, now, horizon_hours=REFRESH_HOURS):
+    """
+    Estimate whether and when a user visits within the next horizon_hours.
+
+    Every past day with a visit at the same time of day as the coming
+    horizon counts towards the probability, which is the share of observed
+    days with such a visit; a visit within the last day adds
+    RECENT_VISIT_BONUS.
+
+    Args:
+        visits (list): The user's past visit datetimes (UTC), oldest first
+        now (datetime): Current time (UTC)
+        horizon_hours (float): How far ahead to look
+
+    Returns:
+        tuple: (probability, expected visit datetime), or (0.0, None) with no history
+    """
+    if not visits:
+        return 0.0, None
+    observed_days = min(VISIT_HISTORY_DAYS, max(MIN_OBSERVED_DAYS, (now.date() - visits[0].date()).days + 1))
+    days = set()
+    offsets = []
+    for visit in visits:
+        # Hours from now until this visit's time of day comes round again
+        offset = ((visit - now).total_seconds() / 3600) % 24
+        if offset < horizon_hours:
+            days.add(visit.date())
+            offsets.append(offset)
+    probability = len(days) / observed_days
+    if now - visits[-1] < timedelta(days=1):
+        probability += RECENT_VISIT_BONUS
+    # Be ready for the earliest time the user usually turns up
+    expected = now + timedelta(hours=min(offsets) if offsets else horizon_hours)
+    return min(1.0, probability), expected
+
+
+def is_off_peak(visit_history, now):
+    """Whether the current hour sees few visits compared with the average hour."""
+    hourly = [0] * 24
+    for visits in visit_history.values():
+        for visit in visits:
+            hourly[visit.hour] += 1
+    total = sum(hourly)
+    return total == 0 or hourly[now.hour] < OFF_PEAK_SHARE * total / 24
+
+
+def select_prescrape_users(now=None):
+    """
+    Pick the active users to pre-scrape for now, soonest expected visit first.
+
+    A user is picked if they are likely to visit within the refresh window
+    and their jobs would be stale by then; outside off-peak hours only users
+    expected within URGENT_HOURS are picked.
+
+    Returns:
+        list: User dictionaries (as from get_active_users) with
+            visit_probability and expected_visit added
+    """
+    from scrape_queue import get_active_task
+
+    now = now or datetime.utcnow()
+    visit_history = get_visit_history(VISIT_HISTORY_DAYS)
+    off_peak = is_off_peak(visit_history, now)
+    candidates = []
+    for user in get_active_users(ACTIVE_USER_DAYS):
+        probability, expected = predict_next_visit(visit_history.get(user['id'], []), now)
+        if probability < MIN_VISIT_PROBABILITY:
+            continue
+        if not off_peak and expected - now > timedelta(hours=URGENT_HOURS):
+            continue
+        last_refresh = get_user_last_refresh(user['id'])
+        if last_refresh and datetime.strptime(last_refresh, '%Y-%m-%d %H:%M:%S') + timedelta(hours=REFRESH_HOURS) > expected:
+            # Jobs are still fresh when the user is expected
+            continue
+        if get_active_task(user['id']):
+            continue
+        candidates.append(dict(user, visit_probability=probability, expected_visit=expected))
+    candidates.sort(key=lambda user: (user['expected_visit'], -user['visit_probability']))
+    return candidates
+
+
+def run_prescrape(pages=1, budget_per_hour=PRESCRAPE_REQUESTS_PER_HOUR, now=None, dry_run=False):
+    """
+    Pre-scrape for users who are likely to visit before their jobs are refreshed.
+
+    Args:
+        pages (int): Starting depth of each search
+        budget_per_hour (float): Outbound requests per hour for pre-scraping
+        now (datetime): Current time (UTC), for planning ahead
+        dry_run (bool): Only plan and log the searches
+
+    Returns:
+        dict: users, queries and the counts from running them (run, failed,
+            deferred, requests, links)
+    """
+    users = select_prescrape_users(now)
+    plan = plan_batch_queries(users)
+    summary = {'users': len(users), 'queries': len(plan), 'run': 0, 'failed': 0, 'deferred': 0, 'requests': 0,
+               'links': 0}
+    if not plan:
+        return summary
+    logger.info(f"Pre-scrape plan: {len(users)} users expected soon, {len(plan)} queries")
+    if dry_run:
+        return summary
+    summary.update(_execute_plan(plan, pages, budget_per_hour=budget_per_hour))
+    logger.info(f"Pre-scrape finished: {summary['run']} queries run, {summary['deferred']} deferred, "
+                f"{summary['requests']} requests, {summary['links']} user/job links")
+    return summary
+
+
+def prescrape_when_due():
+    """
+    Run the pre-scrape scheduler if PRESCRAPE_INTERVAL_SECONDS passed since any process last did.
+
+    Returns:
+        bool: True if any search ran
+    """
+    if PRESCRAPE_REQUESTS_PER_HOUR <= 0 or not claim_periodic_run('prescrape', PRESCRAPE_INTERVAL_SECONDS):
+        return False
+    try:
+        return run_prescrape()['run'] > 0
+    except Exception as e:
+        logger.error(f"Pre-scrape failed: {e}")
+        logger.error(traceback.format_exc())
+        return False
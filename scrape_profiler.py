@@ -0,0 +1,344 @@
+"""
+Per-stage profiling of scrape runs.
+
+A ScrapeProfile collects wall time for each scrape stage (fetch and
+parse_page per results page; parse, extract_skills, classify_skills and
+db_write per listing), plus bytes downloaded, HTTP requests and retries.
+While a profile is active (see
+`profiling`), the instrumented stages in job_sources and scraper report to
+it from every thread. It can print a per-stage summary table and write
+either a cProfile file (*.prof, for snakeviz/pstats) or a collapsed-stack
+file (anything else, for flamegraph.pl/speedscope) sampled from all threads.
+
+Only one profile is active per process at a time, so profile one scrape run
+at a time.
+
+Independently of that, `recording` binds a profile to a single run's context
+(its thread and the threads it hands work to via `carry`), so concurrent runs
+each get their own counters; the scraper records every run this way for the
+scrape_runs ledger, which `summarize_runs` turns into a trend report.
+"""
+import sys
+import time
+import cProfile
+import logging
+import threading
+import contextvars
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Stages in pipeline order, for the summary table
+STAGES = ('fetch', 'parse_page', 'parse', 'extract_skills', 'classify_skills', 'db_write')
+
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples for collapsed-stack output
+
+_EPOCH = datetime(1970, 1, 1)
+
+_active = None
+# Profiles recording the current run, innermost last
+_run_profiles = contextvars.ContextVar('scrape_run_profiles', default=())
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class ScrapeProfile:
+    """Thread-safe stage timings and HTTP counters of one scrape run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = {}  # stage -> list of seconds, one per listing or request
+        self.counters = {'requests': 0, 'retries': 0, 'bytes': 0}  # Plus any counter passed to record
+        self.started = None
+        self.finished = None
+
+    def add_timing(self, stage, seconds):
+        with self._lock:
+            self.timings.setdefault(stage, []).append(seconds)
+
+    def count(self, counter, n=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def stage_totals(self):
+        """Get the total seconds spent in each stage."""
+        with self._lock:
+            return {stage: sum(values) for stage, values in self.timings.items()}
+
+    @property
+    def wall_time(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary_rows(self):
+        """
+        Summarise each stage.
+
+        Returns:
+            list: (stage, calls, total seconds, mean ms, p95 ms, max ms) tuples
+        """
+        with self._lock:
+            timings = {stage: list(values) for stage, values in self.timings.items()}
+        order = list(STAGES) + sorted(stage for stage in timings if stage not in STAGES)
+        rows = []
+        for stage in order:
+            values = timings.get(stage)
+            if not values:
+                continue
+            total = sum(values)
+            rows.append((stage, len(values), total, 1000 * total / len(values),
+                         1000 * _percentile(values, 0.95), 1000 * max(values)))
+        return rows
+
+    def format_summary(self):
+        """Render the per-stage summary table and the HTTP counters."""
+        lines = [f"{'stage':<16}{'calls':>8}{'total s':>10}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for stage, calls, total, mean, p95, maximum in self.summary_rows():
+            lines.append(f"{stage:<16}{calls:>8}{total:>10.2f}{mean:>10.1f}{p95:>10.1f}{maximum:>10.1f}")
+        counters = self.counters
+        lines.append(
+            f"wall time {self.wall_time:.2f}s, {counters['requests']} HTTP requests "
+            f"({counters['retries']} retries), {counters['bytes'] / 1024:.1f} KiB downloaded"
+        )
+        return '\n'.join(lines)
+
+
+def _targets():
+    profiles = _run_profiles.get()
+    if _active is not None and _active not in profiles:
+        return profiles + (_active,)
+    return profiles
+
+
+@contextmanager
+def stage(name):
+    """Time a block as one call of a stage, if a profile is active."""
+    profiles = _targets()
+    if not profiles:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        for profile in profiles:
+            profile.add_timing(name, elapsed)
+
+
+def get_active():
+    """Get the profile being recorded by `profiling`, or None."""
+    return _active
+
+
+def record(counter, n=1):
+    """Add to a counter of the active profiles, if any."""
+    for profile in _targets():
+        profile.count(counter, n)
+
+
+def add_timings(timings):
+    """Add stage call times ({stage: [seconds]}) measured elsewhere to the active profiles."""
+    for profile in _targets():
+        for name, values in timings.items():
+            for seconds in values:
+                profile.add_timing(name, seconds)
+
+
+def carry(func):
+    """
+    Wrap func to run in a copy of the current context.
+
+    Hand work to other threads through this so it is recorded into the
+    calling run's profile. Wrap once per thread or task.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
+
+
+def call_timed(func, *args):
+    """
+    Call func and return its result with the stage timings it recorded.
+
+    For work run in another process, where the caller's profiles are not
+    active; pass the timings to add_timings in the caller.
+
+    Returns:
+        tuple: (result, {stage: [seconds]})
+    """
+    profile = ScrapeProfile()
+    token = _run_profiles.set((profile,))
+    try:
+        result = func(*args)
+    finally:
+        _run_profiles.reset(token)
+    return result, profile.timings
+
+
+@contextmanager
+def recording(profile=None):
+    """
+    Record the current scrape run, and the work it carries to other threads, into a profile.
+
+    Args:
+        profile (ScrapeProfile): Profile to record into; a new one if None
+
+    Yields:
+        ScrapeProfile: The profile being recorded
+    """
+    profile = profile or ScrapeProfile()
+    token = _run_profiles.set(_run_profiles.get() + (profile,))
+    profile.started = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.finished = time.perf_counter()
+        _run_profiles.reset(token)
+
+
+class _StackSampler(threading.Thread):
+    """Sample every thread's stack into collapsed-stack counts."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(name='scrape-profiler', daemon=True)
+        self.interval = interval
+        self.stacks = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ';'.join([names.get(thread_id, 'thread')] + frames[::-1])
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+@contextmanager
+def profiling(profile=None, output_path=None):
+    """
+    Record a scrape run into a profile.
+
+    Args:
+        profile (ScrapeProfile): Profile to record into; a new one if None
+        output_path (str): Also write a cProfile file (path ending in .prof,
+            covers the calling thread) or a collapsed-stack file (any other
+            path, sampled from all threads)
+
+    Yields:
+        ScrapeProfile: The profile being recorded
+    """
+    global _active
+    profile = profile or ScrapeProfile()
+    if _active is not None:
+        logger.warning("A scrape profile is already being recorded; not profiling this run")
+        yield profile
+        return
+
+    profiler = sampler = None
+    if output_path and output_path.endswith('.prof'):
+        profiler = cProfile.Profile()
+    elif output_path:
+        sampler = _StackSampler()
+
+    _active = profile
+    profile.started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    if sampler:
+        sampler.start()
+    try:
+        yield profile
+    finally:
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.stop()
+        profile.finished = time.perf_counter()
+        _active = None
+        try:
+            if profiler:
+                profiler.dump_stats(output_path)
+                logger.info(f"Wrote cProfile data to {output_path}")
+            elif sampler:
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    for stack, count in sorted(sampler.stacks.items()):
+                        f.write(f"{stack} {count}\n")
+                logger.info(f"Wrote collapsed stacks to {output_path}")
+        except OSError as e:
+            logger.error(f"Could not write profile output {output_path}: {e}")
+
+
+def summarize_runs(runs, bucket_hours=24):
+    """
+    Aggregate scrape_runs ledger rows into time buckets.
+
+    Args:
+        runs (list): Ledger rows (dicts), as from database_manager.get_scrape_runs
+        bucket_hours (int): Bucket width in hours
+
+    Returns:
+        list: One dict per bucket with runs, requests, requests_per_hour,
+            fetch_ms (request-weighted mean fetch latency), fetch_p95_ms
+            (worst run p95), cache_hits, jobs_new, errors and run_seconds,
+            oldest bucket first
+    """
+    buckets = {}
+    width = bucket_hours * 3600
+    for run in runs:
+        started = datetime.strptime(run['started_at'], '%Y-%m-%d %H:%M:%S')
+        start = int((started - _EPOCH).total_seconds()) // width * width
+        bucket = buckets.setdefault(start, {
+            'start': _EPOCH + timedelta(seconds=start), 'runs': 0, 'requests': 0, 'fetch_total_ms': 0.0,
+            'fetch_p95_ms': 0.0, 'cache_hits': 0, 'jobs_new': 0, 'errors': 0, 'run_seconds': 0.0
+        })
+        requests = run['http_requests'] or 0
+        bucket['runs'] += 1
+        bucket['requests'] += requests
+        bucket['fetch_total_ms'] += (run['fetch_ms_mean'] or 0) * requests
+        bucket['fetch_p95_ms'] = max(bucket['fetch_p95_ms'], run['fetch_ms_p95'] or 0)
+        bucket['cache_hits'] += run['cache_hits'] or 0
+        bucket['jobs_new'] += run['jobs_new'] or 0
+        bucket['errors'] += run['errors'] or 0
+        bucket['run_seconds'] += run['duration_seconds'] or 0
+
+    summary = []
+    for start in sorted(buckets):
+        bucket = buckets[start]
+        total_ms = bucket.pop('fetch_total_ms')
+        bucket['fetch_ms'] = total_ms / bucket['requests'] if bucket['requests'] else 0.0
+        bucket['requests_per_hour'] = bucket['requests'] / bucket_hours
+        summary.append(bucket)
+    return summary
+
+
+def format_run_summary(summary):
+    """Render summarize_runs' buckets as a table."""
+    lines = [f"{'from':<18}{'runs':>6}{'requests':>10}{'req/h':>8}{'fetch ms':>10}{'p95 ms':>9}"
+             f"{'cached':>8}{'new jobs':>10}{'errors':>8}"]
+    for bucket in summary:
+        lines.append(
+            f"{bucket['start'].strftime('%Y-%m-%d %H:%M'):<18}{bucket['runs']:>6}{bucket['requests']:>10}"
+            f"{bucket['requests_per_hour']:>8.1f}{bucket['fetch_ms']:>10.0f}{bucket['fetch_p95_ms']:>9.0f}"
+            f"{bucket['cache_hits']:>8}{bucket['jobs_new']:>10}{bucket['errors']:>8}"
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,583 @@
+"""
+Durable SQLite-backed queue of scrape runs.
+
+Web routes enqueue a scrape and return immediately; a separate worker
+(`flask scrape-worker`, or the embedded worker thread) claims queued runs,
+executes them with scraper.scrape_jobs and records per-run progress that
+/check_refresh_status reports back to the browser. Because the queue lives in
+the database, queued runs survive restarts and are shared by every Gunicorn
+worker process.
+
+Admission control: every run has a priority class (an interactive refresh,
+a profile change, or an automatic refresh of stale results). Workers take the
+most urgent class first and, within a class, the user who used the fewest
+outbound requests lately (from the scrape_runs ledger), so one busy account
+cannot starve the rest; a run waiting longer than MAX_WAIT_MINUTES goes first
+regardless. When the queue is saturated, admit_scrape turns away the less
+urgent classes and routes show the user's stored results as possibly stale.
+Scheduled pre-scrapes only run while the queue is empty.
+"""
+import os
+import json
+import time
+import socket
+import logging
+import sqlite3
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import database_manager
+from database_manager import (
+    db_connection,
+    load_crawl_checkpoint,
+    save_crawl_checkpoint,
+    delete_crawl_checkpoint,
+    mark_users_refreshed
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Task states
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+# A running task whose heartbeat is older than this is assumed to be orphaned
+STALE_AFTER_MINUTES = 15
+HEARTBEAT_SECONDS = 60  # How often a running task refreshes its heartbeat
+MAX_ATTEMPTS = 3
+
+# Priority classes, most urgent first
+PRIORITY_INTERACTIVE = 0  # A refresh or search the user asked for
+PRIORITY_PROFILE = 1  # The user's skills or location changed
+PRIORITY_PREFETCH = 2  # Automatic refresh of results that went stale
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_PROFILE: 'profile', PRIORITY_PREFETCH: 'prefetch'}
+
+# Non-interactive runs are turned away while this many runs of the same or a
+# more urgent class are queued
+QUEUE_SATURATION = int(os.environ.get('SCRAPE_QUEUE_SATURATION', 8))
+FAIR_SHARE_MINUTES = 60  # Outbound requests in this window decide the order within a class
+MAX_WAIT_MINUTES = 10
+
+# Seconds a task may scrape before it returns the jobs found so far (0: no limit)
+TASK_DEADLINE_SECONDS = float(os.environ.get('SCRAPE_TASK_DEADLINE_SECONDS', 0))
+
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _now():
+    return datetime.utcnow().strftime(_TIME_FORMAT)
+
+
+def _task_to_dict(row):
+    """Convert a scrape_tasks row to a dictionary with decoded JSON fields."""
+    if row is None:
+        return None
+    task = dict(row)
+    for field, default in (('skills', []), ('progress', {})):
+        try:
+            task[field] = json.loads(task[field]) if task.get(field) else default
+        except (json.JSONDecodeError, TypeError):
+            task[field] = default
+    return task
+
+
+def enqueue_scrape(user_id, query="All", location="All", user_skills=None, pages=1, force_clear=False,
+                   priority=PRIORITY_INTERACTIVE):
+    """
+    Queue a scrape run for a user.
+
+    A user has at most one active (queued or running) run; if one exists its
+    id is returned instead of creating a duplicate, and it is moved up to
+    priority if that is more urgent.
+
+    Returns:
+        int: ID of the queued (or already active) task, or None on error
+    """
+    with db_connection() as conn:
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            existing = conn.execute(
+                f"SELECT id FROM scrape_tasks WHERE user_id = ? AND status IN ({','.join('?' for _ in ACTIVE_STATUSES)}) "
+                "ORDER BY id LIMIT 1",
+                (user_id, *ACTIVE_STATUSES)
+            ).fetchone()
+            if existing:
+                conn.execute("UPDATE scrape_tasks SET priority = MIN(priority, ?) WHERE id = ?", (priority, existing['id']))
+                conn.commit()
+                logger.info(f"User {user_id} already has active scrape task {existing['id']}")
+                return existing['id']
+
+            cursor = conn.execute(
+                '''
+                INSERT INTO scrape_tasks (user_id, query, location, skills, pages, force_clear, status, created_at, priority)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (user_id, query, location, json.dumps(list(user_skills or [])), pages,
+                 bool(force_clear), STATUS_QUEUED, _now(), priority)
+            )
+            conn.commit()
+            logger.info(f"Queued {PRIORITY_NAMES.get(priority, priority)} scrape task {cursor.lastrowid} for user {user_id}")
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            logger.error(f"Error queueing scrape for user {user_id}: {e}")
+            conn.rollback()
+            return None
+
+
+def get_queue_backlog(priority=PRIORITY_PREFETCH):
+    """Count the queued runs of priority or a more urgent class."""
+    with db_connection() as conn:
+        try:
+            row = conn.execute(
+                "SELECT COUNT(*) AS backlog FROM scrape_tasks WHERE status = ? AND priority <= ?",
+                (STATUS_QUEUED, priority)
+            ).fetchone()
+            return row['backlog']
+        except sqlite3.Error as e:
+            logger.error(f"Error counting queued scrape tasks: {e}")
+            return 0
+
+
+def admit_scrape(priority, has_cached_results=True):
+    """
+    Decide whether a new scrape run of a priority class may be queued now.
+
+    Interactive runs, and runs for users with nothing stored to show, are
+    always admitted; other classes are turned away while QUEUE_SATURATION
+    runs of their class or a more urgent one are waiting.
+
+    Args:
+        priority (int): Priority class of the run
+        has_cached_results (bool): Whether the user has stored results to fall back on
+
+    Returns:
+        bool: True if the run should be queued, False to serve the stored results as stale
+    """
+    if priority <= PRIORITY_INTERACTIVE or not has_cached_results:
+        return True
+    backlog = get_queue_backlog(priority)
+    if backlog >= QUEUE_SATURATION:
+        logger.info(f"Scrape queue saturated ({backlog} runs waiting); not queueing a "
+                    f"{PRIORITY_NAMES.get(priority, priority)} run")
+        return False
+    return True
+
+
+def get_task(task_id, user_id=None):
+    """Get a task by id, optionally only if it belongs to user_id."""
+    with db_connection() as conn:
+        if user_id is None:
+            row = conn.execute("SELECT * FROM scrape_tasks WHERE id = ?", (task_id,)).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT * FROM scrape_tasks WHERE id = ? AND user_id = ?", (task_id, user_id)
+            ).fetchone()
+        return _task_to_dict(row)
+
+
+def get_active_task(user_id):
+    """Get the user's queued or running task, if any."""
+    with db_connection() as conn:
+        row = conn.execute(
+            f"SELECT * FROM scrape_tasks WHERE user_id = ? AND status IN ({','.join('?' for _ in ACTIVE_STATUSES)}) "
+            "ORDER BY id LIMIT 1",
+            (user_id, *ACTIVE_STATUSES)
+        ).fetchone()
+        return _task_to_dict(row)
+
+
+def get_latest_task(user_id):
+    """Get the user's most recently created task."""
+    with db_connection() as conn:
+        row = conn.execute(
+            "SELECT * FROM scrape_tasks WHERE user_id = ? ORDER BY id DESC LIMIT 1", (user_id,)
+        ).fetchone()
+        return _task_to_dict(row)
+
+
+def _requeue_stale_tasks(conn):
+    """Give orphaned running tasks (dead worker) another attempt, or fail them."""
+    cutoff = (datetime.utcnow() - timedelta(minutes=STALE_AFTER_MINUTES)).strftime(_TIME_FORMAT)
+    conn.execute(
+        '''
+        UPDATE scrape_tasks
+        SET status = CASE WHEN attempts < ? THEN ? ELSE ? END,
+            error = CASE WHEN attempts < ? THEN error ELSE 'Worker stopped responding' END,
+            worker_id = NULL
+        WHERE status = ? AND heartbeat_at < ?
+        ''',
+        (MAX_ATTEMPTS, STATUS_QUEUED, STATUS_FAILED, MAX_ATTEMPTS, STATUS_RUNNING, cutoff)
+    )
+
+
+def claim_next_task(worker_id):
+    """
+    Atomically claim the next queued task for a worker.
+
+    Tasks are taken by priority class; within a class, tasks that waited
+    longer than MAX_WAIT_MINUTES come first, then users who made the fewest
+    outbound requests in the last FAIR_SHARE_MINUTES, then the oldest.
+
+    Returns:
+        dict: The claimed task, or None if the queue is empty
+    """
+    with db_connection() as conn:
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            _requeue_stale_tasks(conn)
+            now = datetime.utcnow()
+            row = conn.execute(
+                '''
+                SELECT t.id FROM scrape_tasks t
+                LEFT JOIN (
+                    SELECT user_id, SUM(http_requests) AS requests FROM scrape_runs
+                    WHERE started_at >= ? GROUP BY user_id
+                ) usage ON usage.user_id = t.user_id
+                WHERE t.status = ?
+                ORDER BY t.priority, t.created_at < ? DESC, COALESCE(usage.requests, 0), t.id
+                LIMIT 1
+                ''',
+                ((now - timedelta(minutes=FAIR_SHARE_MINUTES)).strftime(_TIME_FORMAT), STATUS_QUEUED,
+                 (now - timedelta(minutes=MAX_WAIT_MINUTES)).strftime(_TIME_FORMAT))
+            ).fetchone()
+            if not row:
+                conn.commit()
+                return None
+            now = _now()
+            conn.execute(
+                '''
+                UPDATE scrape_tasks
+                SET status = ?, worker_id = ?, started_at = ?, heartbeat_at = ?, attempts = attempts + 1
+                WHERE id = ?
+                ''',
+                (STATUS_RUNNING, worker_id, now, now, row['id'])
+            )
+            task = conn.execute("SELECT * FROM scrape_tasks WHERE id = ?", (row['id'],)).fetchone()
+            conn.commit()
+            return _task_to_dict(task)
+        except sqlite3.Error as e:
+            logger.error(f"Error claiming scrape task: {e}")
+            conn.rollback()
+            return None
+
+
+def update_task_progress(task_id, progress, jobs_found=None):
+    """Record progress for a running task and refresh its heartbeat."""
+    with db_connection() as conn:
+        try:
+            conn.execute(
+                '''
+                UPDATE scrape_tasks
+                SET progress = ?, jobs_found = COALESCE(?, jobs_found), heartbeat_at = ?
+                WHERE id = ?
+                ''',
+                (json.dumps(progress), jobs_found, _now(), task_id)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error updating progress for scrape task {task_id}: {e}")
+
+
+def refresh_heartbeat(task_id):
+    """Refresh the heartbeat of a running task."""
+    with db_connection() as conn:
+        try:
+            conn.execute(
+                "UPDATE scrape_tasks SET heartbeat_at = ? WHERE id = ? AND status = ?",
+                (_now(), task_id, STATUS_RUNNING)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error refreshing heartbeat of scrape task {task_id}: {e}")
+
+
+@contextmanager
+def _heartbeat(task_id, interval=HEARTBEAT_SECONDS):
+    """
+    Refresh a task's heartbeat from a background thread while the block runs.
+
+    A single results page or search can take longer than STALE_AFTER_MINUTES,
+    so progress updates alone would let a live task be requeued.
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            refresh_heartbeat(task_id)
+
+    thread = threading.Thread(target=beat, name=f'scrape-heartbeat-{task_id}', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def finish_task(task_id, jobs_found=0, error=None):
+    """Mark a task as done, or failed if an error message is given."""
+    with db_connection() as conn:
+        try:
+            conn.execute(
+                '''
+                UPDATE scrape_tasks
+                SET status = ?, jobs_found = ?, error = ?, finished_at = ?, heartbeat_at = ?
+                WHERE id = ?
+                ''',
+                (STATUS_FAILED if error else STATUS_DONE, jobs_found, error, _now(), _now(), task_id)
+            )
+            conn.commit()
+            # A finished run is never resumed
+            delete_crawl_checkpoint(task_id)
+        except sqlite3.Error as e:
+            logger.error(f"Error finishing scrape task {task_id}: {e}")
+
+
+class CrawlCheckpoint:
+    """
+    Durable crawl frontier of one scrape run.
+    
+    Records whether the user's jobs were already cleared, which searches
+    (one per skill/query and location) are finished, the next results page of
+    each unfinished search and the job IDs found so far. It is saved after
+    every results page, so a run that is interrupted (worker timeout or
+    crash) and requeued resumes at the page where it stopped. Listings whose
+    detail page is still outstanding are tracked on the jobs themselves
+    (jobs.detail_status).
+    """
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.state = load_crawl_checkpoint(task_id) or {'cleared': False, 'searches': {}, 'job_ids': []}
+        if self.resumed:
+            done = sum(1 for search in self.state['searches'].values() if search.get('done'))
+            logger.info(f"Resuming scrape task {task_id}: {done} search(es) done, "
+                        f"{len(self.state['job_ids'])} job(s) found")
+
+    @property
+    def resumed(self):
+        return bool(self.state['cleared'] or self.state['searches'])
+
+    @property
+    def cleared(self):
+        return self.state['cleared']
+
+    @property
+    def job_ids(self):
+        return list(self.state['job_ids'])
+
+    @staticmethod
+    def _key(query, location):
+        return '|'.join(' '.join(str(value or '').lower().split()) for value in (query, location))
+
+    def _search(self, query, location):
+        return self.state['searches'].setdefault(self._key(query, location), {'next_page': 1, 'done': False})
+
+    def save(self):
+        save_crawl_checkpoint(self.task_id, self.state)
+
+    def mark_cleared(self):
+        """Record that the user's old jobs were unlinked for this run."""
+        self.state['cleared'] = True
+        self.save()
+
+    def is_search_done(self, query, location):
+        search = self.state['searches'].get(self._key(query, location))
+        return bool(search and search['done'])
+
+    def next_page(self, query, location):
+        """First results page of a search that has not been processed yet."""
+        search = self.state['searches'].get(self._key(query, location))
+        return search['next_page'] if search else 1
+
+    def record_page(self, query, location, page_num, job_ids):
+        """Record a processed results page and the jobs it yielded."""
+        self._search(query, location)['next_page'] = page_num + 1
+        self.record_jobs(job_ids)
+
+    def record_jobs(self, job_ids):
+        """Record jobs found outside a results page (e.g. reused from history)."""
+        known = set(self.state['job_ids'])
+        self.state['job_ids'].extend(job_id for job_id in dict.fromkeys(job_ids) if job_id not in known)
+        self.save()
+
+    def finish_search(self, query, location):
+        """Record that a search needs no more pages."""
+        self._search(query, location)['done'] = True
+        self.save()
+
+
+def run_task(task):
+    """Execute a claimed task with scraper.scrape_jobs and record the outcome."""
+    # Imported here so the web process can enqueue without loading the scraper's NLP model
+    from scraper import scrape_jobs, enrich_pending_jobs
+    from scrape_coordination import Deadline
+
+    task_id = task['id']
+    deadline = Deadline(TASK_DEADLINE_SECONDS) if TASK_DEADLINE_SECONDS > 0 else None
+
+    def on_progress(searches_done, searches_total, jobs_found):
+        update_task_progress(
+            task_id,
+            {'searches_done': searches_done, 'searches_total': searches_total},
+            jobs_found
+        )
+
+    logger.info(f"Running scrape task {task_id} for user {task['user_id']}")
+    try:
+        with _heartbeat(task_id):
+            jobs = scrape_jobs(
+                query=task['query'] or "All",
+                location=task['location'] or "All",
+                user_skills=task['skills'],
+                pages=task['pages'] or 1,
+                force_clear=bool(task['force_clear']),
+                user_id=task['user_id'],
+                progress_callback=on_progress,
+                checkpoint=CrawlCheckpoint(task_id),
+                deadline=deadline
+            )
+        finish_task(task_id, jobs_found=len(jobs))
+        if deadline and deadline.cut_short:
+            # Partial results; leave the user due for another refresh
+            logger.info(f"Scrape task {task_id} hit its {TASK_DEADLINE_SECONDS:g}s deadline with {len(jobs)} jobs")
+        else:
+            mark_users_refreshed([task['user_id']])
+            logger.info(f"Scrape task {task_id} finished with {len(jobs)} jobs")
+    except Exception as e:
+        logger.error(f"Scrape task {task_id} failed: {e}")
+        logger.error(traceback.format_exc())
+        finish_task(task_id, error=str(e))
+        return
+    
+    # The user's results are already visible; now fill in the detail pages
+    # skipped during the scrape, best matches first
+    try:
+        enrich_pending_jobs(user_id=task['user_id'], user_skills=task['skills'])
+    except Exception as e:
+        logger.error(f"Detail enrichment after scrape task {task_id} failed: {e}")
+
+
+def enrich_when_idle():
+    """
+    Fetch a few pending detail pages while the queue is empty.
+    
+    Returns:
+        bool: True if any job was enriched
+    """
+    from scraper import enrich_pending_jobs, DETAIL_BATCH_WHEN_IDLE
+    try:
+        return enrich_pending_jobs(limit=DETAIL_BATCH_WHEN_IDLE) > 0
+    except Exception as e:
+        logger.error(f"Idle detail enrichment failed: {e}")
+        return False
+
+
+def prescrape_when_idle():
+    """
+    Run the pre-scrape scheduler while the queue is empty, if it is due.
+
+    Returns:
+        bool: True if any search ran
+    """
+    from scrape_planner import prescrape_when_due
+    try:
+        return prescrape_when_due()
+    except Exception as e:
+        logger.error(f"Idle pre-scrape failed: {e}")
+        return False
+
+
+def run_worker(poll_interval=2.0, once=False, stop_event=None):
+    """
+    Process queued scrape tasks until stopped.
+
+    While the queue is empty the worker pre-scrapes for users expected to
+    visit soon (when due) and otherwise fetches pending detail pages.
+
+    Args:
+        poll_interval (float): Seconds to wait when the queue is empty and
+            no pre-scrape or job details are pending
+        once (bool): Process at most one task, then return
+        stop_event (threading.Event): Optional event that stops the loop
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    logger.info(f"Scrape worker {worker_id} started")
+    while not (stop_event and stop_event.is_set()):
+        task = claim_next_task(worker_id)
+        if task:
+            run_task(task)
+            if once:
+                break
+        elif once:
+            break
+        elif not (prescrape_when_idle() or enrich_when_idle()):
+            # Nothing queued, no pre-scrape due and no details left to fetch
+            time.sleep(poll_interval)
+    logger.info(f"Scrape worker {worker_id} stopped")
+
+
+_embedded_worker = None
+_embedded_worker_lock = None
+
+
+def _acquire_embedded_worker_lock():
+    """
+    Take the lock that lets one process per host run the embedded worker.
+
+    The lock file sits next to the database and is held until the process
+    exits, so a replacement Gunicorn worker takes over when the holder dies.
+
+    Returns:
+        bool: True if this process may run the embedded worker
+    """
+    global _embedded_worker_lock
+    if _embedded_worker_lock is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        # No flock (Windows); only the single-process development server runs there
+        return True
+    try:
+        lock_file = open(database_manager.DB_PATH + '.embedded-worker.lock', 'a')
+    except OSError as e:
+        logger.warning(f"Could not open the embedded scrape worker lock, starting anyway: {e}")
+        return True
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _embedded_worker_lock = lock_file
+    return True
+
+
+def start_embedded_worker(poll_interval=2.0):
+    """
+    Start a daemon worker thread inside the web process.
+
+    Used when the web service cannot run a separate `flask scrape-worker`
+    process against the same SQLite file (e.g. a single Render service).
+    Only the first web process on the host to get here starts one.
+
+    Returns:
+        threading.Thread: The worker thread, or None if another process runs it
+    """
+    global _embedded_worker
+    if _embedded_worker and _embedded_worker.is_alive():
+        return _embedded_worker
+    if not _acquire_embedded_worker_lock():
+        logger.info("Another process runs the embedded scrape worker")
+        return None
+    _embedded_worker = threading.Thread(
+        target=run_worker, kwargs={'poll_interval': poll_interval},
+        name='embedded-scrape-worker', daemon=True
+    )
+    _embedded_worker.start()
+    return _embedded_worker
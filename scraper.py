@@ -6,23 +6,57 @@ import time
 import random
 import logging
 import argparse
-import requests
 import traceback
 import re
+import bisect
+import threading
 import sqlite3
 from typing import List, Dict, Any
+from contextlib import contextmanager
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from nlp_utils import load_spacy_model
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
 from database_manager import (
     initialize_database,
     save_job_to_db,
     add_job_skills,
     clear_jobs_table,
     get_all_jobs,
-    get_db_connection
+    db_connection,
+    get_job_id_by_source_url,
+    link_user_job,
+    unlink_user_jobs,
+    normalize_source_url,
+    record_search_urls,
+    get_search_job_ids,
+    get_search_yield,
+    record_search_yield,
+    get_jobs_skill_text,
+    get_pending_detail_jobs,
+    save_job_details,
+    record_detail_failure,
+    record_scrape_run,
+    DETAIL_PENDING
 )
-from datetime import datetime
+from scrape_coordination import (
+    search_flight,
+    user_scrape_locks,
+    known_listings,
+    normalize_search_key,
+    deadline_scope,
+    deadline_passed,
+    time_left
+)
+from scrape_pipeline import ScrapePipeline
+import scrape_profiler
+from job_sources import (
+    fetch_page,
+    search_sources,
+    get_source,
+    AdzunaSource,
+    DETAIL_PLACEHOLDER_DESCRIPTION
+)
+import http_archive
+from datetime import datetime, timedelta
 
 # Configure logging
 logging.basicConfig(
@@ -44,51 +78,39 @@ if current_dir not in sys.path:
 # Load spaCy model and skill keywords at the module level
 nlp_model, skill_keywords = load_spacy_model()
 
-def fetch_page(url, params=None, retries=3, delay=5):
-    """Fetches HTML content from a URL with retries and headers."""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36 JobScraper/1.0 (cody@sourcegraph.com)'
-    }
-    for attempt in range(retries):
-        try:
-            # Only log this at INFO level for significant page fetches
-            if attempt == 0:
-                logger.info(f"Fetching jobs data from: {url}")
-            response = requests.get(url, headers=headers, params=params, timeout=20)
-            response.raise_for_status()
-            return response.text
-        except requests.exceptions.HTTPError as e:
-            logger.error(f"HTTP error fetching {url} (attempt {attempt + 1}/{retries}): {e.response.status_code} {e.response.reason}")
-            if e.response.status_code in [404, 403, 410]:
-                logger.warning(f"Page not found/forbidden/gone ({e.response.status_code}). Skipping this URL.")
-                return None
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching {url} (attempt {attempt + 1}/{retries}): {e}")
-            if attempt < retries - 1:
-                actual_delay = delay + random.uniform(0, delay * 0.5)
-                logger.info(f"Retrying in {actual_delay:.2f} seconds...")
-                time.sleep(actual_delay)
-            else:
-                logger.error(f"Failed to fetch {url} after {retries} attempts.")
-    return None
+# Detail fetches per enrichment batch after a user's scrape, and per idle worker poll
+DETAIL_BATCH_AFTER_SCRAPE = 10
+DETAIL_BATCH_WHEN_IDLE = 2
+DETAIL_MAX_ATTEMPTS = 3
+
+# Adaptive search depth, driven by new listings per results page averaged over runs
+MAX_SEARCH_PAGES = 5
+DEEPEN_YIELD = 5  # A page with at least this many new listings earns one more page
+SATURATED_YIELD = 0.5  # Searches averaging less are skipped until the recheck interval passes
+SATURATED_RECHECK = timedelta(hours=12)
+
+# Skills combined into one OR query, limited so the query stays short and
+# each skill still gets a share of a results page
+SKILL_BATCH_SIZE = 4
+SKILL_QUERY_MAX_CHARS = 100
 
 def parse_job_detail_page_adzuna(full_job_url):
-    logger.info(f"Fetching details from Adzuna landing page: {full_job_url}")
-    html_content = fetch_page(full_job_url)    # Even if we can't get the detail page, return a basic description
-    if not html_content:
-        logger.warning(f"Could not fetch detail page for {full_job_url} - using basic description")
-        return "Click the job title to view the full description.", "Adzuna"
-        
-    soup = BeautifulSoup(html_content, 'html.parser')
-    site_name = "Adzuna"
-        
-    redirect_message_h2 = soup.find('h2', string=lambda t: t and "you are being redirected to" in t.lower())
-    if redirect_message_h2 and redirect_message_h2.strong:
-        site_name_from_page = redirect_message_h2.strong.text.strip()
-        return "Full description not found on Adzuna landing page (this is expected).", site_name
+    """Fetch an Adzuna listing's landing page; see job_sources.AdzunaSource.parse_detail."""
+    return get_source(AdzunaSource.name).parse_detail(full_job_url)
 
-def parse_job_listing(job_listing, user_id, user_skills=None):
-    """Parse a job listing and return the job ID."""
+def parse_job_listing(job_listing, user_id, user_skills=None, crawl_stats=None):
+    """
+    Parse a job listing and return the job ID.
+    
+    Runs the parse, detail deferral, skill extraction and save stages one
+    after another; scrape_pipeline.ScrapePipeline runs the same stages
+    concurrently.
+    
+    If crawl_stats is given, the listing's source URL is appended to
+    crawl_stats['source_urls'] and crawl_stats['known'] or crawl_stats['unseen']
+    is incremented depending on whether the listing was already stored;
+    crawl_stats['new'] counts the unseen listings that were saved.
+    """
     # Import at the top level to avoid UnboundLocalError
     from database_manager import save_job_to_db
     
@@ -113,206 +135,462 @@ def parse_job_listing(job_listing, user_id, user_skills=None):
             except Exception as save_err:
                 logger.error(f"Error saving job from dictionary: {save_err}")
                 return None
-            
-        # If we get here, job_listing is a BeautifulSoup element
         
-        # Initialize job data with required fields
-        job_data = {
-            'user_id': user_id,
-            'date_scraped': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        # Extract job ID if available
-        if hasattr(job_listing, 'get'):
-            job_data['job_id'] = job_listing.get('data-aid', '')
-          # Extract title and URL
-        try:        # Check if job_listing is a dictionary (already parsed or from DB)
-            if isinstance(job_listing, dict):
-                # Dictionary already has all the data we need
-                job_listing['user_id'] = user_id  # Ensure user_id is set
-                return save_job_to_db(job_listing, user_id)                
-            # Otherwise, proceed with BeautifulSoup parsing
-            title_elem = job_listing.select_one('h2[itemprop="title"], h2.job-title, .a-title, a[data-aid="jobTitle"]')
-            if not title_elem:
-                title_elem = job_listing.select_one('h2 a')
-            if not title_elem or not title_elem.get_text().strip():
-                logger.warning("No title found for job listing")
-                return None
-        except AttributeError:
-            logger.error(f"Error parsing job listing: 'dict' object has no attribute 'select_one'")
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            # If it's a dictionary but we tried to use BeautifulSoup methods
-            if isinstance(job_listing, dict):
-                job_listing['user_id'] = user_id
-                return save_job_to_db(job_listing, user_id)
-            return None
-            
-        job_data['title'] = title_elem.get_text().strip()
-        
-        # Get URL
-        url_elem = title_elem if title_elem.name == 'a' else title_elem.find('a')
-        if url_elem and url_elem.has_attr('href'):
-            job_data['url'] = urljoin('https://www.adzuna.in', url_elem['href'])
-            job_data['source_url'] = job_data['url']
-        else:
-            logger.warning(f"No URL found for job: {job_data['title']}")
-            return None
-            
-        # Extract other job details
-        # Company
-        company_elem = job_listing.select_one('div.ui-company')
-        job_data['company'] = company_elem.get_text().strip() if company_elem else None
-        
-        # Location
-        location_elem = job_listing.select_one('div.ui-location')
-        job_data['location'] = location_elem.get_text().strip() if location_elem else None
-        
-        # Description
-        desc_elem = job_listing.select_one('span.max-snippet-height')
-        if desc_elem:
-            job_data['description'] = desc_elem.get_text().strip()
-        elif job_data.get('url'):
-            full_desc, source = parse_job_detail_page_adzuna(job_data['url'])
-            if full_desc:
-                job_data['description'] = full_desc
-        
-        # Extract skills from description if available
-        if job_data.get('description'):
-            skills = extract_skills_from_text(job_data['description'], nlp_model)
-            job_data['skills'] = skills
-            
-            # Classify skills as required or nice-to-have
-            required, nice_to_have = classify_skills(job_data['description'], skills)
-            job_data['required_skills'] = required
-            job_data['nice_to_have_skills'] = nice_to_have
-        
-        # Set other job attributes
-        job_data['is_remote'] = False  # Default value
-        job_data['is_new'] = False
-        job_data['is_urgent'] = False
-        job_data['experience_level'] = 'mid'  # Default value
-        
-        # Save to database
-        job_id = save_job_to_db(job_data, user_id)
-        if job_id:
-            logger.info(f"Successfully saved job: {job_data['title']}")
-            return job_id
-        else:
-            logger.warning(f"Failed to save job: {job_data['title']}. Data: {json.dumps(job_data)}")
-            return None
+        parsed = parse_listing_fields(job_listing, user_id, crawl_stats=crawl_stats)
+        if parsed is None or isinstance(parsed, int):
+            # Unparseable, or an already stored job that was linked to the user
+            return parsed
+        return process_listing(parsed, user_id, crawl_stats=crawl_stats)
             
     except Exception as e:
         logger.error(f"Error parsing job listing: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         return None
 
-def classify_skills(desc_text, skills):
-    """Classify skills as required or nice-to-have based on context."""
-    required_skills = []
-    nice_to_have_skills = []
+def parse_listing_fields(job_listing, user_id, crawl_stats=None, source=None):
+    """
+    Parse stage: read a listing's fields from its raw search result.
     
-    # Context markers for required skills
-    required_markers = {
-        # Section headers
-        'required skills', 'requirements', 'must have', 'essential skills',
-        'key skills', 'necessary skills', 'required:', 'required competencies',
-        'you must have', 'mandatory skills', 'core competencies',
-        'minimum requirements', 'basic requirements', 'key requirements',
-        'technical requirements', 'job requirements',
-        
-        # Requirement phrases
-        'must possess', 'required to have', 'should have', 'needs to have',
-        'must be proficient', 'required experience', 'working knowledge',
-        'strong background', 'solid understanding', 'expertise in',
-        'proven experience', 'demonstrated ability', 'proven track record',
-        'must demonstrate', 'required knowledge', 'must understand',
-        'required proficiency', 'required skills include'
+    The listing is parsed by source (Adzuna by default) and then prepared
+    with prepare_listing.
+    
+    Returns:
+        dict: Job data for a listing that is not stored yet,
+        int: ID of an already stored listing (now linked to the user), or
+        None: if the listing could not be parsed
+    """
+    source = source or get_source(AdzunaSource.name)
+    try:
+        fields = source.parse_listing(job_listing)
+    except Exception as e:
+        logger.error(f"Error parsing job listing: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return None
+    if not fields:
+        return None
+    fields['source'] = source.name
+    return prepare_listing(fields, user_id, crawl_stats=crawl_stats)
+
+def prepare_listing(fields, user_id, crawl_stats=None):
+    """
+    Turn a source's listing fields into job data for the pipeline.
+    
+    Returns:
+        dict: Job data for a listing that is not stored yet,
+        int: ID of an already stored listing (now linked to the user)
+    """
+    # Initialize job data with required fields
+    job_data = {
+        'user_id': user_id,
+        'date_scraped': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
     }
+    job_data.update(fields)
+    
+    # Listings already in the shared corpus only need to be linked to this
+    # user; skip the detail fetch and NLP work for them. The Bloom filter
+    # rules out most new listings without touching SQLite.
+    source_url = normalize_source_url(job_data['source_url'])
+    if crawl_stats is not None:
+        crawl_stats['source_urls'].append(source_url)
+    existing_job_id = None
+    if known_listings.might_contain(source_url):
+        existing_job_id = get_job_id_by_source_url(source_url)
+    if existing_job_id:
+        with scrape_profiler.stage('db_write'):
+            link_user_job(user_id, existing_job_id)
+        scrape_profiler.record('jobs_unchanged')
+        if crawl_stats is not None:
+            crawl_stats['known'] += 1
+        logger.info(f"Reusing stored job {existing_job_id}: {job_data['title']}")
+        return existing_job_id
+    if crawl_stats is not None:
+        crawl_stats['unseen'] += 1
+    
+    # Set other job attributes
+    job_data.setdefault('is_remote', False)  # Default value
+    job_data['is_new'] = False
+    job_data['is_urgent'] = False
+    job_data.setdefault('experience_level', 'mid')  # Default value
+    return job_data
+
+def process_listing(job_data, user_id, crawl_stats=None):
+    """Run a prepared listing through the detail, extract and persist stages inline."""
+    job_data = defer_listing_detail(job_data)
+    job_data = extract_listing_skills(job_data)
+    return persist_listing(job_data, user_id, crawl_stats=crawl_stats)
+
+def needs_detail_fetch(job_data):
+    """Whether a parsed listing has no snippet and needs its detail page."""
+    return not job_data.get('description') and bool(job_data.get('url'))
+
+def defer_listing_detail(job_data):
+    """
+    Detail stage: mark a listing without a snippet for later enrichment.
+    
+    The detail page is not fetched during the scrape; the listing is saved
+    with a placeholder description and enrich_pending_jobs fetches it later.
+    """
+    if needs_detail_fetch(job_data):
+        job_data['detail_status'] = DETAIL_PENDING
+    return job_data
+
+def extract_job_skills(description):
+    """
+    Extract and classify the skills in a job description.
+    
+    Module-level so it can run in a worker process of scrape_pipeline's NLP pool.
     
-    # Context markers for nice-to-have skills
-    nice_to_have_markers = {
-        # Section headers
-        'nice to have', 'preferred skills', 'desirable skills', 'plus points',
-        'additional skills', 'beneficial skills', 'bonus skills', 'advantageous',
-        'preferred qualifications', 'desirable:', 'would be nice', 'good to have',
-        'optional skills', 'preferences', 'desired qualifications',
+    Returns:
+        tuple: (skills, required_skills, nice_to_have_skills)
+    """
+    with scrape_profiler.stage('extract_skills'):
+        skills = extract_skills_from_text(description, nlp_model)
+    # Classify skills as required or nice-to-have
+    with scrape_profiler.stage('classify_skills'):
+        required, nice_to_have = classify_skills(description, skills)
+    return skills, required, nice_to_have
+
+def apply_job_skills(job_data, extracted):
+    """Store the result of extract_job_skills on the job data."""
+    job_data['skills'], job_data['required_skills'], job_data['nice_to_have_skills'] = extracted
+    return job_data
+
+def extract_listing_skills(job_data):
+    """Extract stage: extract skills from the description if available."""
+    if job_data.get('description'):
+        apply_job_skills(job_data, extract_job_skills(job_data['description']))
+    return job_data
+
+def persist_listing(job_data, user_id, crawl_stats=None):
+    """Persist stage: save a parsed listing and link it to the user."""
+    if job_data.get('detail_status') == DETAIL_PENDING and not job_data.get('description'):
+        job_data['description'] = DETAIL_PLACEHOLDER_DESCRIPTION
+    with scrape_profiler.stage('db_write'):
+        job_id = save_job_to_db(job_data, user_id)
+    if job_id:
+        known_listings.add(normalize_source_url(job_data['source_url']))
+        if crawl_stats is not None:
+            crawl_stats['new'] += 1
+        logger.info(f"Successfully saved job: {job_data['title']}")
+        return job_id
+    else:
+        scrape_profiler.record('errors')
+        logger.warning(f"Failed to save job: {job_data['title']}. Data: {json.dumps(job_data)}")
+        return None
+
+def _detail_priority(job, user_skills=None):
+    """
+    Match score used to order detail enrichment: the most skills any linked
+    user (or the given user_skills) shares with the job's attributed skills
+    and title.
+    """
+    job_skills = {skill.lower().strip() for skill in job['job_skills']}
+    title = (job.get('title') or '').lower()
+    if user_skills is not None:
+        skill_sets = [user_skills]
+    else:
+        skill_sets = [skills.split(',') for skills in job['user_skills']]
+    best = 0
+    for skills in skill_sets:
+        skills = {skill.lower().strip() for skill in skills if skill and skill.strip()}
+        best = max(best, len(skills & job_skills) + sum(1 for skill in skills if skill in title))
+    return best
+
+def enrich_job_details(job):
+    """
+    Fetch a pending job's detail page and extract skills from it.
+    
+    The page is parsed by the job source the listing came from; listings
+    stored before sources were recorded are Adzuna's.
+    
+    Returns:
+        bool: True if the job was enriched, False if the fetch failed
+    """
+    source = get_source(job.get('source') or AdzunaSource.name)
+    full_desc, site_name = source.parse_detail(job['url']) or (None, None)
+    if full_desc == DETAIL_PLACEHOLDER_DESCRIPTION:
+        # The page could not be fetched; try again later
+        record_detail_failure(job['id'], max_attempts=DETAIL_MAX_ATTEMPTS)
+        return False
+    description = full_desc or job.get('description') or DETAIL_PLACEHOLDER_DESCRIPTION
+    skills, required, nice_to_have = extract_job_skills(description) if full_desc else ([], [], [])
+    return save_job_details(job['id'], description, skills, required, nice_to_have)
+
+def enrich_pending_jobs(limit=DETAIL_BATCH_AFTER_SCRAPE, user_id=None, user_skills=None):
+    """
+    Fetch detail pages for listings saved with a placeholder description.
+    
+    Jobs a user has already viewed go first, then the best matches for the
+    user's skills (or for any linked user's profile skills if no user is given).
+    
+    Args:
+        limit (int): Maximum number of detail pages to fetch
+        user_id (int): Only enrich jobs linked to this user
+        user_skills (list): Skills to rank this user's jobs by
         
-        # Preference phrases
-        'familiarity with', 'exposure to', 'nice to know', 'beneficial to have',
-        'preferably', 'ideally', 'would be a plus', 'added advantage',
-        'good to know', 'helpful to have', 'preferred experience',
-        'additionally', 'bonus points', 'would be beneficial',
-        'would be helpful', 'a plus if', 'bonus if', 'great if'
-    }
+    Returns:
+        int: Number of jobs enriched
+    """
+    # Rank a wider window of candidates than we fetch so match score matters
+    candidates = get_pending_detail_jobs(limit * 10, user_id=user_id, max_attempts=DETAIL_MAX_ATTEMPTS)
+    if not candidates:
+        return 0
+    candidates.sort(key=lambda job: (
+        job['detail_requested_at'] is None,
+        job['detail_requested_at'] or '',
+        -_detail_priority(job, user_skills)
+    ))
+    enriched = 0
+    for job in candidates[:limit]:
+        try:
+            if enrich_job_details(job):
+                enriched += 1
+        except Exception as e:
+            logger.error(f"Error enriching job {job['id']}: {e}")
+            logger.error(traceback.format_exc())
+            record_detail_failure(job['id'], max_attempts=DETAIL_MAX_ATTEMPTS)
+    logger.info(f"Enriched {enriched} of {min(limit, len(candidates))} pending job details")
+    return enriched
+
+# Context markers for required skills
+REQUIRED_SKILL_MARKERS = frozenset({
+    # Section headers
+    'required skills', 'requirements', 'must have', 'essential skills',
+    'key skills', 'necessary skills', 'required:', 'required competencies',
+    'you must have', 'mandatory skills', 'core competencies',
+    'minimum requirements', 'basic requirements', 'key requirements',
+    'technical requirements', 'job requirements',
+    
+    # Requirement phrases
+    'must possess', 'required to have', 'should have', 'needs to have',
+    'must be proficient', 'required experience', 'working knowledge',
+    'strong background', 'solid understanding', 'expertise in',
+    'proven experience', 'demonstrated ability', 'proven track record',
+    'must demonstrate', 'required knowledge', 'must understand',
+    'required proficiency', 'required skills include'
+})
+
+# Context markers for nice-to-have skills
+NICE_TO_HAVE_SKILL_MARKERS = frozenset({
+    # Section headers
+    'nice to have', 'preferred skills', 'desirable skills', 'plus points',
+    'additional skills', 'beneficial skills', 'bonus skills', 'advantageous',
+    'preferred qualifications', 'desirable:', 'would be nice', 'good to have',
+    'optional skills', 'preferences', 'desired qualifications',
+    
+    # Preference phrases
+    'familiarity with', 'exposure to', 'nice to know', 'beneficial to have',
+    'preferably', 'ideally', 'would be a plus', 'added advantage',
+    'good to know', 'helpful to have', 'preferred experience',
+    'additionally', 'bonus points', 'would be beneficial',
+    'would be helpful', 'a plus if', 'bonus if', 'great if'
+})
+
+# Fallback wording used when no marker is near a skill
+STRONG_REQUIREMENT_WORDS = ('must', 'need', 'require', 'essential', 'necessary')
+PREFERENCE_WORDS = ('prefer', 'ideal', 'nice', 'plus', 'bonus', 'good')
+
+# Characters of a section's start treated as its header
+SECTION_HEADER_CHARS = 50
+# Characters either side of a skill checked for markers
+SKILL_CONTEXT_CHARS = 50
+
+def _trie_regex(patterns):
+    """
+    Build a regex matching the longest of patterns at a position.
+    
+    Patterns are merged into a prefix trie so the regex engine follows one
+    branch per character instead of trying every alternative in turn.
+    """
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def _node_regex(node):
+        branches = [re.escape(char) + _node_regex(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            # Greedy optional: prefer extending to a longer pattern
+            return (body if len(branches) > 1 else '(?:' + body + ')') + '?'
+        return body
+    
+    return _node_regex(trie)
+
+def _build_marker_scanner():
+    """
+    Build the one-pass scanner for the context markers.
+    
+    The regex matches the longest marker starting at a position; every other
+    marker starting there is a prefix of it, so the returned table maps each
+    marker to the length of the shortest required and nice-to-have marker
+    that starts with it (or None).
+    
+    Returns:
+        tuple: (compiled regex, {marker: (required_len, nice_len)})
+    """
+    markers = REQUIRED_SKILL_MARKERS | NICE_TO_HAVE_SKILL_MARKERS
+    table = {}
+    for marker in markers:
+        prefixes = [marker[:i] for i in range(1, len(marker) + 1) if marker[:i] in markers]
+        table[marker] = (
+            min((len(p) for p in prefixes if p in REQUIRED_SKILL_MARKERS), default=None),
+            min((len(p) for p in prefixes if p in NICE_TO_HAVE_SKILL_MARKERS), default=None)
+        )
+    return re.compile(_trie_regex(markers)), table
+
+_MARKER_REGEX, _MARKER_TABLE = _build_marker_scanner()
+
+def _find_all(text, sub):
+    """Start offsets of every (possibly overlapping) occurrence of sub in text."""
+    positions = []
+    pos = text.find(sub)
+    while pos != -1:
+        positions.append(pos)
+        pos = text.find(sub, pos + 1)
+    return positions
+
+class _TextSegments:
+    """
+    The parts of text.split(separator), located by offset.
+    
+    Only separator offsets are computed up front; a part's stripped bounds
+    and marker flag are worked out the first time an offset inside it is
+    looked up.
+    """
+    
+    def __init__(self, text, separator, limit=None):
+        self._text = text
+        self._limit = limit
+        self.ends = [match.start() for match in re.finditer(re.escape(separator), text)]
+        self.starts = [0] + [end + len(separator) for end in self.ends]
+        self.ends.append(len(text))
+        self._spans = {}
+        self.flags = {}
     
+    def index(self, pos):
+        """Index of the part containing offset pos."""
+        return bisect.bisect_right(self.starts, pos) - 1
+    
+    def stripped(self, idx):
+        """(start, end) offsets of part idx after .strip()."""
+        span = self._spans.get(idx)
+        if span is None:
+            start, end = self.starts[idx], self.ends[idx]
+            part = self._text[start:end]
+            stripped_start = start + len(part) - len(part.lstrip())
+            span = (stripped_start, max(stripped_start, start + len(part.rstrip())))
+            self._spans[idx] = span
+        return span
+    
+    def flag_markers(self, required_occ, nice_occ):
+        """
+        Flag parts with a marker wholly inside them (or inside their first
+        `limit` characters) as 'required' or 'nice'; required wins.
+        """
+        for flag, occurrences in (('nice', nice_occ), ('required', required_occ)):
+            for marker_start, marker_end in occurrences:
+                idx = self.index(marker_start)
+                span_start, span_end = self.stripped(idx)
+                if self._limit is not None:
+                    span_end = min(span_end, span_start + self._limit)
+                if marker_start >= span_start and marker_end <= span_end:
+                    self.flags[idx] = flag
+    
+    def first_flag(self, positions, length):
+        """Flag of the first part that contains the skill and has a marker."""
+        if length == 0:
+            # The empty string is in every part
+            return self.flags[min(self.flags)] if self.flags else None
+        for pos in positions:
+            idx = self.index(pos)
+            if idx in self.flags:
+                span_start, span_end = self.stripped(idx)
+                if pos >= span_start and pos + length <= span_end:
+                    return self.flags[idx]
+        return None
+
+def _has_marker_within(occurrences, occurrence_starts, lo, hi):
+    """Whether a marker occurrence lies wholly inside text[lo:hi]."""
+    idx = bisect.bisect_left(occurrence_starts, lo)
+    while idx < len(occurrences) and occurrences[idx][0] < hi:
+        if occurrences[idx][1] <= hi:
+            return True
+        idx += 1
+    return False
+
+def classify_skills(desc_text, skills):
+    """
+    Classify skills as required or nice-to-have based on context.
+    
+    One precompiled regex scan finds every marker occurrence and each skill's
+    occurrences are located once; skills are then placed by offset
+    arithmetic, checking in order:
+    1. the header of the first section (split on blank lines) containing it
+       that has a marker,
+    2. the first sentence containing it that has a marker,
+    3. the text within 50 characters of its first occurrence, falling back
+       to strong/preference wording and finally to required.
+    """
     # Convert text to lowercase for matching
     desc_text = desc_text.lower()
     
-    # Split into sections and sentences
-    sections = desc_text.split('\n\n')  # Split by double newline to find major sections
-    sentences = [s.strip() for s in desc_text.split('.')]  # Split into sentences
+    # Single pass over the text for every marker occurrence. Resuming one
+    # character after each match start also finds overlapping markers.
+    required_occ, nice_occ = [], []
+    match = _MARKER_REGEX.search(desc_text)
+    while match:
+        pos = match.start()
+        required_len, nice_len = _MARKER_TABLE[match.group()]
+        if required_len:
+            required_occ.append((pos, pos + required_len))
+        if nice_len:
+            nice_occ.append((pos, pos + nice_len))
+        match = _MARKER_REGEX.search(desc_text, pos + 1)
+    required_starts = [start for start, _ in required_occ]
+    nice_starts = [start for start, _ in nice_occ]
+    
+    # Split into sections (by double newline) and sentences as offset spans
+    sections = _TextSegments(desc_text, '\n\n', limit=SECTION_HEADER_CHARS)
+    sentences = _TextSegments(desc_text, '.')
+    sections.flag_markers(required_occ, nice_occ)
+    sentences.flag_markers(required_occ, nice_occ)
     
+    required_skills = []
+    nice_to_have_skills = []
     for skill in skills:
         skill_lower = skill.lower()
-        is_required = False
-        is_nice_to_have = False
+        length = len(skill_lower)
+        positions = _find_all(desc_text, skill_lower) if length else [0]
         
-        # First check in structured sections
-        for section in sections:
-            section = section.strip()
-            if skill_lower in section:
-                # Check section headers
-                if any(marker in section[:50].lower() for marker in required_markers):
-                    is_required = True
-                    break
-                elif any(marker in section[:50].lower() for marker in nice_to_have_markers):
-                    is_nice_to_have = True
-                    break
-        
-        # If not found in sections, check individual sentences
-        if not (is_required or is_nice_to_have):
-            for sentence in sentences:
-                if skill_lower in sentence:
-                    # Look for requirement phrases
-                    if any(marker in sentence for marker in required_markers):
-                        is_required = True
-                        break
-                    # Look for nice-to-have phrases
-                    elif any(marker in sentence for marker in nice_to_have_markers):
-                        is_nice_to_have = True
-                        break
+        # Structured sections first, then individual sentences
+        flag = sections.first_flag(positions, length) or sentences.first_flag(positions, length)
         
         # If still not classified, look for nearby context (±50 characters)
-        if not (is_required or is_nice_to_have):
-            skill_pos = desc_text.find(skill_lower)
-            if skill_pos != -1:
-                context = desc_text[max(0, skill_pos - 50):min(len(desc_text), skill_pos + len(skill_lower) + 50)]
-                
-                # Check context for requirement indicators
-                if any(marker in context for marker in required_markers):
-                    is_required = True
-                elif any(marker in context for marker in nice_to_have_markers):
-                    is_nice_to_have = True
-                else:
-                    # Default classification based on language strength
-                    strong_requirement_words = {'must', 'need', 'require', 'essential', 'necessary'}
-                    preference_words = {'prefer', 'ideal', 'nice', 'plus', 'bonus', 'good'}
-                    
-                    if any(word in context for word in strong_requirement_words):
-                        is_required = True
-                    elif any(word in context for word in preference_words):
-                        is_nice_to_have = True
-                    else:
-                        # Default to required if no clear indication
-                        is_required = True
+        if flag is None and positions:
+            lo = max(0, positions[0] - SKILL_CONTEXT_CHARS)
+            hi = min(len(desc_text), positions[0] + length + SKILL_CONTEXT_CHARS)
+            if _has_marker_within(required_occ, required_starts, lo, hi):
+                flag = 'required'
+            elif _has_marker_within(nice_occ, nice_starts, lo, hi):
+                flag = 'nice'
+            else:
+                # Default classification based on language strength
+                context = desc_text[lo:hi]
+                if any(word in context for word in STRONG_REQUIREMENT_WORDS):
+                    flag = 'required'
+                elif any(word in context for word in PREFERENCE_WORDS):
+                    flag = 'nice'
         
-        # Add the skill to the appropriate list
-        if is_required:
-            required_skills.append(skill)
-        elif is_nice_to_have:
+        # Add the skill to the appropriate list, defaulting to required if unclear
+        if flag == 'nice':
             nice_to_have_skills.append(skill)
         else:
-            required_skills.append(skill)  # Default to required if unclear
+            required_skills.append(skill)
     
     # Remove duplicates while preserving order
     required_skills = list(dict.fromkeys(required_skills))
@@ -323,119 +601,307 @@ def classify_skills(desc_text, skills):
     
     return required_skills, nice_to_have_skills
 
+# Comprehensive list of technical skills, frameworks, and tools
+COMMON_SKILLS = frozenset({
+    # Programming Languages
+    'python', 'java', 'javascript', 'typescript', 'c++', 'c#', 'ruby', 'php', 'scala', 'kotlin', 'swift',
+    'r programming', 'go', 'rust', 'perl', 'matlab', 'julia', 'haskell', 'dart',
+    
+    # Web Development
+    'html', 'css', 'sass', 'less', 'jquery', 'bootstrap', 'tailwind', 'material-ui', 'webpack', 'babel',
+    'react', 'angular', 'vue.js', 'svelte', 'next.js', 'gatsby', 'nuxt.js', 'redux', 'graphql',
+    'rest api', 'soap', 'oauth', 'jwt', 'webrtc', 'websocket',
+    
+    # Backend Development
+    'node.js', 'express.js', 'django', 'flask', 'fastapi', 'spring', 'spring boot', 'laravel',
+    'asp.net', '.net core', 'rails', 'hibernate', 'servlet', 'tomcat', 'websphere',
+    
+    # Database Technologies
+    'sql', 'mysql', 'postgresql', 'mongodb', 'redis', 'elasticsearch', 'cassandra', 'oracle',
+    'sqlite', 'mariadb', 'dynamodb', 'couchbase', 'neo4j', 'hbase', 
+    
+    # Cloud & DevOps
+    'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'jenkins', 'gitlab ci', 'travis ci',
+    'terraform', 'ansible', 'puppet', 'chef', 'vagrant', 'prometheus', 'grafana',
+    'nginx', 'apache', 'linux', 'unix', 'bash', 'shell scripting',
+    
+    # Data Science & AI
+    'machine learning', 'deep learning', 'artificial intelligence', 'ai', 'natural language processing',
+    'nlp', 'computer vision', 'neural networks', 'tensorflow', 'pytorch', 'keras', 'scikit-learn',
+    'pandas', 'numpy', 'scipy', 'matplotlib', 'seaborn', 'opencv',
+    
+    # Testing & QA
+    'testing', 'selenium', 'cypress', 'jest', 'mocha', 'junit', 'pytest', 'testng',
+    'cucumber', 'postman', 'soapui', 'jmeter', 'loadrunner', 'gatling',
+    
+    # Version Control & Project Management
+    'git', 'svn', 'mercurial', 'jira', 'confluence', 'trello', 'asana',
+    'scrum', 'agile', 'kanban', 'waterfall', 'prince2', 'pmp',
+    
+    # Mobile Development
+    'android', 'ios', 'react native', 'flutter', 'xamarin', 'ionic', 'cordova',
+    'swift', 'objective-c', 'kotlin', 'android studio', 'xcode',
+    
+    # Big Data
+    'hadoop', 'spark', 'hive', 'pig', 'kafka', 'storm', 'flink', 'airflow',
+    'big data', 'etl', 'data warehouse', 'data lake', 'nosql',
+    
+    # Security
+    'cybersecurity', 'encryption', 'oauth', 'jwt', 'kerberos', 'ldap',
+    'penetration testing', 'security', 'firewall', 'ssl/tls',
+    
+    # Methodologies & Patterns
+    'object oriented programming', 'oop', 'functional programming', 'design patterns',
+    'mvc', 'mvvm', 'microservices', 'soa', 'rest', 'solid principles',
+    
+    # Soft Skills
+    'problem solving', 'communication', 'team leadership', 'project management',
+    'analytical skills', 'critical thinking', 'time management', 'teamwork'
+})
+
+# Phrases that introduce skills in a sentence
+SKILL_CONTEXT_PHRASES = (
+    'experience with', 'knowledge of', 'proficiency in', 'expertise in',
+    'familiar with', 'background in', 'skills in', 'understanding of',
+    'working with', 'development in', 'programming in', 'using'
+)
+
+def _is_word_char(char):
+    return re.match(r'\w', char) is not None
+
+def _build_skill_scanner():
+    """
+    Build the scanner that finds every whole-word COMMON_SKILLS occurrence.
+    
+    The regex matches the longest skill with word boundaries at a position.
+    Shorter skills matching at the same position are prefixes of it that end
+    on a word boundary, which is fixed by the skill's own characters, so the
+    returned table maps each skill to all skills matched along with it.
+    
+    Returns:
+        tuple: (compiled regex, {skill: (skills, ...)})
+    """
+    table = {}
+    for skill in COMMON_SKILLS:
+        table[skill] = tuple(
+            skill[:i] for i in range(1, len(skill) + 1)
+            if skill[:i] in COMMON_SKILLS
+            and (i == len(skill) or _is_word_char(skill[i - 1]) != _is_word_char(skill[i]))
+        )
+    return re.compile(r'\b(?:' + _trie_regex(COMMON_SKILLS) + r')\b'), table
+
+_SKILL_REGEX, _SKILL_TABLE = _build_skill_scanner()
+
+# Rough sentence boundaries, used to pick the text worth parsing with spaCy
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\n+')
+
+def _format_skill(skill):
+    """Capitalize each word of a skill for display."""
+    return ' '.join(word.capitalize() for word in skill.split())
+
 def extract_skills_from_text(text, nlp_model):
-    """Extract skills from text using NLP and pattern matching."""
-    skills = set()
+    """
+    Extract skills from text using NLP and pattern matching.
     
-    # Comprehensive list of technical skills, frameworks, and tools
-    common_skills = {
-        # Programming Languages
-        'python', 'java', 'javascript', 'typescript', 'c++', 'c#', 'ruby', 'php', 'scala', 'kotlin', 'swift',
-        'r programming', 'go', 'rust', 'perl', 'matlab', 'julia', 'haskell', 'dart',
-        
-        # Web Development
-        'html', 'css', 'sass', 'less', 'jquery', 'bootstrap', 'tailwind', 'material-ui', 'webpack', 'babel',
-        'react', 'angular', 'vue.js', 'svelte', 'next.js', 'gatsby', 'nuxt.js', 'redux', 'graphql',
-        'rest api', 'soap', 'oauth', 'jwt', 'webrtc', 'websocket',
-        
-        # Backend Development
-        'node.js', 'express.js', 'django', 'flask', 'fastapi', 'spring', 'spring boot', 'laravel',
-        'asp.net', '.net core', 'rails', 'hibernate', 'servlet', 'tomcat', 'websphere',
-        
-        # Database Technologies
-        'sql', 'mysql', 'postgresql', 'mongodb', 'redis', 'elasticsearch', 'cassandra', 'oracle',
-        'sqlite', 'mariadb', 'dynamodb', 'couchbase', 'neo4j', 'hbase', 
-        
-        # Cloud & DevOps
-        'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'jenkins', 'gitlab ci', 'travis ci',
-        'terraform', 'ansible', 'puppet', 'chef', 'vagrant', 'prometheus', 'grafana',
-        'nginx', 'apache', 'linux', 'unix', 'bash', 'shell scripting',
-        
-        # Data Science & AI
-        'machine learning', 'deep learning', 'artificial intelligence', 'ai', 'natural language processing',
-        'nlp', 'computer vision', 'neural networks', 'tensorflow', 'pytorch', 'keras', 'scikit-learn',
-        'pandas', 'numpy', 'scipy', 'matplotlib', 'seaborn', 'opencv',
-        
-        # Testing & QA
-        'testing', 'selenium', 'cypress', 'jest', 'mocha', 'junit', 'pytest', 'testng',
-        'cucumber', 'postman', 'soapui', 'jmeter', 'loadrunner', 'gatling',
-        
-        # Version Control & Project Management
-        'git', 'svn', 'mercurial', 'jira', 'confluence', 'trello', 'asana',
-        'scrum', 'agile', 'kanban', 'waterfall', 'prince2', 'pmp',
-        
-        # Mobile Development
-        'android', 'ios', 'react native', 'flutter', 'xamarin', 'ionic', 'cordova',
-        'swift', 'objective-c', 'kotlin', 'android studio', 'xcode',
-        
-        # Big Data
-        'hadoop', 'spark', 'hive', 'pig', 'kafka', 'storm', 'flink', 'airflow',
-        'big data', 'etl', 'data warehouse', 'data lake', 'nosql',
-        
-        # Security
-        'cybersecurity', 'encryption', 'oauth', 'jwt', 'kerberos', 'ldap',
-        'penetration testing', 'security', 'firewall', 'ssl/tls',
-        
-        # Methodologies & Patterns
-        'object oriented programming', 'oop', 'functional programming', 'design patterns',
-        'mvc', 'mvvm', 'microservices', 'soa', 'rest', 'solid principles',
-        
-        # Soft Skills
-        'problem solving', 'communication', 'team leadership', 'project management',
-        'analytical skills', 'critical thinking', 'time management', 'teamwork'
-    }
+    One precompiled longest-first scan finds every whole-word COMMON_SKILLS
+    occurrence. spaCy then only parses the sentences that contain a
+    skill-context phrase, picking up skills the word-boundary match misses
+    (e.g. "C++" followed by a space, where \\b cannot match).
+    """
+    skills = set()
     
     # Normalize text
     text = text.lower()
     
-    # Extract skills using pattern matching
-    for skill in common_skills:
-        if skill in text.lower():
-            # Verify it's a standalone word/phrase
-            pattern = r'\b' + re.escape(skill) + r'\b'
-            if re.search(pattern, text.lower(), re.IGNORECASE):
-                # Add skill with proper capitalization
-                skills.add(' '.join(word.capitalize() for word in skill.split()))
+    # Extract skills using pattern matching; resuming one character after
+    # each match start also finds skills inside a longer match
+    match = _SKILL_REGEX.search(text)
+    while match:
+        for skill in _SKILL_TABLE[match.group()]:
+            # Add skill with proper capitalization
+            skills.add(_format_skill(skill))
+        match = _SKILL_REGEX.search(text, match.start() + 1)
     
-    # Use NLP model to extract technical terms and noun phrases
+    # Use NLP model to extract technical terms and noun phrases, but only on
+    # sentences in the context of skill-related phrases
     if nlp_model:
-        doc = nlp_model(text)
-        
-        # Look for terms in the context of skill-related phrases
-        skill_contexts = [
-            'experience with', 'knowledge of', 'proficiency in', 'expertise in',
-            'familiar with', 'background in', 'skills in', 'understanding of',
-            'working with', 'development in', 'programming in', 'using'
+        context_sentences = [
+            sentence for sentence in _SENTENCE_BREAK.split(text)
+            if any(context in sentence for context in SKILL_CONTEXT_PHRASES)
         ]
-        
-        # Process each sentence
-        for sent in doc.sents:
-            sent_text = sent.text.lower()
-            
-            # Check if sentence contains skill context
-            if any(context in sent_text for context in skill_contexts):
+        for doc in nlp_model.pipe(context_sentences):
+            for sent in doc.sents:
+                sent_text = sent.text.lower()
+                
+                # Check if sentence contains skill context
+                if not any(context in sent_text for context in SKILL_CONTEXT_PHRASES):
+                    continue
+                
                 # Extract potential skills from this sentence
                 for token in sent:
                     if (token.pos_ in ['NOUN', 'PROPN'] and 
                         len(token.text) > 2 and  # Avoid short words
                         not token.is_stop):
                         skill_text = token.text.lower()
-                        if skill_text in common_skills:
+                        if skill_text in COMMON_SKILLS:
                             # Add skill with proper capitalization
-                            skills.add(' '.join(word.capitalize() for word in skill_text.split()))
+                            skills.add(_format_skill(skill_text))
                             
                 # Also check for compound noun phrases
                 for chunk in sent.noun_chunks:
                     chunk_text = chunk.text.lower()
-                    if chunk_text in common_skills:
+                    if chunk_text in COMMON_SKILLS:
                         # Add skill with proper capitalization
-                        skills.add(' '.join(word.capitalize() for word in chunk_text.split()))
+                        skills.add(_format_skill(chunk_text))
     
     # Convert set to sorted list with properly formatted strings
     return sorted(list(skills))
 
-def scrape_adzuna_jobs(query="All", location="All", user_skills=None, pages=1, user_id=None):
-    """Scrape jobs from Adzuna."""
+def plan_skill_queries(search_query, skills, batch_size=SKILL_BATCH_SIZE, max_chars=SKILL_QUERY_MAX_CHARS):
+    """
+    Group skills into combined OR queries.
+    
+    A batch's alternatives are grouped, "<query> (<skill> OR <skill>)", so the
+    base query applies to every skill. A batch of one skill produces the same
+    "<query> <skill>" search as an unbatched skill search.
+    
+    Args:
+        search_query (str): Base query each search is prefixed with
+        skills (list): The user's skills
+        batch_size (int): Maximum skills per query
+        max_chars (int): Maximum query length; a longer single skill still gets its own query
+        
+    Returns:
+        list: (query, skills) tuples, one per search
+    """
+    def _query(batch):
+        terms = [f'"{skill}"' if ' ' in skill else skill for skill in batch]
+        if len(terms) > 1:
+            return f"{search_query} ({' OR '.join(terms)})".strip()
+        return f"{search_query} {terms[0]}".strip()
+    
+    # One search per skill, however the user capitalized duplicates
+    unique_skills = {}
+    for skill in skills:
+        if skill and skill.strip():
+            unique_skills.setdefault(skill.strip().lower(), skill.strip())
+    
+    plan = []
+    batch = []
+    for skill in unique_skills.values():
+        candidate = batch + [skill]
+        if batch and (len(candidate) > batch_size or len(_query(candidate)) > max_chars):
+            plan.append((_query(batch), batch))
+            candidate = [skill]
+        batch = candidate
+    if batch:
+        plan.append((_query(batch), batch))
+    return plan
+
+def match_searched_skills(job_ids, skills):
+    """
+    Work out which of a skill search's skills each returned job is for.
+    
+    A single-skill search matches its skill to every result. For a combined
+    search each job gets the searched skills its title, description or
+    extracted skills mention; a job that mentions none of them (the search
+    engine matched it on text the listing does not show) gets none.
+    
+    Returns:
+        dict: Job ID to the list of matched skills
+    """
+    if len(skills) == 1:
+        return {job_id: list(skills) for job_id in job_ids}
+    texts = get_jobs_skill_text(job_ids)
+    patterns = [(skill, re.compile(r'(?<!\w)' + re.escape(skill.lower()) + r'(?!\w)')) for skill in skills]
+    matches = {}
+    for job_id in job_ids:
+        text = texts.get(job_id, '')
+        matches[job_id] = [skill for skill, pattern in patterns if pattern.search(text)]
+    return matches
+
+def _attribute_skills(job_ids, skills):
+    """Attribute the searched skills to the jobs a skill search returned, keeping other skills."""
+    for job_id, matched in match_searched_skills(job_ids, skills).items():
+        add_job_skills(job_id, matched, replace=False)
+
+def _new_pipeline(user_id):
+    """
+    Create the pipeline that saves listings for user_id.
+    
+    While a scrape profile is recorded, NLP runs in this process so the
+    profile sees its stages.
+    """
+    options = {'nlp_processes': 0} if scrape_profiler.get_active() else {}
+    return ScrapePipeline(
+        prepare=defer_listing_detail,
+        extract=extract_job_skills,
+        apply=apply_job_skills,
+        persist=lambda job_data, crawl_stats: persist_listing(job_data, user_id, crawl_stats=crawl_stats),
+        **options
+    )
+
+def scrape_shared_search(search_query, location, skills, interested_users, pages=1):
+    """
+    Run one skill search once on behalf of every user interested in its skills.
+    
+    Listings are saved and linked under the user who has the most of the
+    search's skills; every other interested user is linked to the jobs
+    matched to one of their skills.
+    
+    Args:
+        search_query (str): The search query (usually from plan_skill_queries)
+        location (str): The location to search in
+        skills (list): The skills the query was planned for
+        interested_users (dict): Skill to the IDs of the users who have it
+        pages (int): Starting search depth
+        
+    Returns:
+        dict: User ID to the job IDs linked to that user
+    """
+    user_ids = sorted({user_id for skill in skills for user_id in interested_users.get(skill, ())})
+    if not user_ids:
+        return {}
+    leader = max(user_ids, key=lambda user_id: sum(user_id in interested_users.get(skill, ()) for skill in skills))
+    
+    with _ledger_run('shared', leader, search_query, location, pages):
+        pipeline = _new_pipeline(leader)
+        try:
+            job_ids = _do_search(search_query, location, pages, set(), skills=skills, user_id=leader,
+                                 pipeline=pipeline)
+        finally:
+            pipeline.close()
+    
+    linked = {user_id: [] for user_id in user_ids}
+    linked[leader] = list(job_ids)
+    for job_id, matched in match_searched_skills(job_ids, skills).items():
+        for user_id in sorted({user_id for skill in matched for user_id in interested_users.get(skill, ())}):
+            if user_id != leader:
+                link_user_job(user_id, job_id)
+                linked[user_id].append(job_id)
+    return linked
+
+def scrape_adzuna_jobs(query="All", location="All", user_skills=None, pages=1, user_id=None, progress_callback=None,
+                       checkpoint=None, deadline=None):
+    """
+    Scrape jobs from Adzuna and any other sources enabled in JOB_SOURCES.
+    
+    If progress_callback is given it is called as
+    progress_callback(searches_done, searches_total, jobs_found) after each search.
+    If checkpoint (a scrape_queue.CrawlCheckpoint) is given, finished searches
+    are skipped and unfinished ones continue from their next page.
+    
+    With a deadline (seconds, or a scrape_coordination.Deadline), no search,
+    page or retry is started once it passed, outstanding fetches are given
+    up and the IDs of the jobs saved so far are returned; listings still in
+    the pipeline are saved in the background and show up on the next load.
+    The Deadline's cut_short flag tells whether the results are partial.
+    """
+    with deadline_scope(deadline):
+        return _scrape_adzuna_searches(query, location, user_skills, pages, user_id, progress_callback, checkpoint)
+
+def _scrape_adzuna_searches(query, location, user_skills, pages, user_id, progress_callback=None, checkpoint=None):
+    """Run scrape_adzuna_jobs' searches under the deadline in scope."""
     if not user_id:
         logger.error("No user_id provided to scrape_adzuna_jobs")
         return []
@@ -450,8 +916,19 @@ def scrape_adzuna_jobs(query="All", location="All", user_skills=None, pages=1, u
     else:
         location = "India" # Default location
     
-    all_found_jobs_ids = []  # Stores job IDs from _do_search
+    all_found_jobs_ids = checkpoint.job_ids if checkpoint else []  # Stores job IDs from _do_search
     searched_urls = set()
+    searches_done = 0
+    
+    # NLP and DB writes for new listings run concurrently
+    pipeline = _new_pipeline(user_id)
+    
+    def _report_progress():
+        if progress_callback:
+            try:
+                progress_callback(searches_done, searches_total, len(all_found_jobs_ids))
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {e}")
     
     try:
         # Handle case where user_skills is string instead of list
@@ -459,25 +936,42 @@ def scrape_adzuna_jobs(query="All", location="All", user_skills=None, pages=1, u
             user_skills = [skill.strip() for skill in user_skills.split(',') if skill.strip()]
             logger.info(f"Converted user_skills string to list: {user_skills}")
         
-        if user_skills:
-            logger.info(f"Performing skill-based search for user {user_id} with skills: {user_skills}")
-            for skill in user_skills:
-                skill_specific_query = f"{search_query} {skill}".strip()
-                logger.info(f"Searching for skill: {skill} with query: '{skill_specific_query}' for user {user_id}")
+        skill_queries = plan_skill_queries(search_query, user_skills) if user_skills else []
+        searches_total = (len(skill_queries) + (1 if search_query else 0)) if skill_queries else 1
+        _report_progress()
+        
+        if skill_queries:
+            logger.info(f"Performing skill-based search for user {user_id} with skills: {user_skills} "
+                        f"in {len(skill_queries)} quer{'y' if len(skill_queries) == 1 else 'ies'}")
+            for skill_specific_query, batch_skills in skill_queries:
+                if deadline_passed():
+                    logger.warning(f"Scrape deadline passed; skipping {searches_total - searches_done} remaining "
+                                   f"search(es) for user {user_id}")
+                    break
+                if checkpoint and checkpoint.is_search_done(skill_specific_query, location):
+                    # Finished before this run was interrupted
+                    searches_done += 1
+                    _report_progress()
+                    continue
+                logger.info(f"Searching for skills: {batch_skills} with query: '{skill_specific_query}' for user {user_id}")
                 skill_jobs_ids = _do_search(
                     skill_specific_query, 
                     location, 
-                    pages=1, # Typically 1 page per skill to broaden reach without excessive scraping
+                    pages=1, # Start at 1 page per skill query; productive queries go deeper
                     searched_urls=searched_urls,
-                    skill=skill,
+                    skills=batch_skills,
                     user_id=user_id,
-                    user_skills=user_skills # Pass all user skills for context if _do_search uses them
+                    user_skills=user_skills, # Pass all user skills for context if _do_search uses them
+                    pipeline=pipeline,
+                    checkpoint=checkpoint
                 )
                 if skill_jobs_ids:
                     all_found_jobs_ids.extend(job_id for job_id in skill_jobs_ids if job_id not in all_found_jobs_ids)
+                searches_done += 1
+                _report_progress()
             
             # Optionally, also do a general search if a base query was provided
-            if search_query:
+            if search_query and not deadline_passed():
                 logger.info(f"Performing base search with query: '{search_query}' for user {user_id}")
                 base_jobs_ids = _do_search(
                     search_query,
@@ -485,21 +979,30 @@ def scrape_adzuna_jobs(query="All", location="All", user_skills=None, pages=1, u
                     pages, # Use specified pages for base query
                     searched_urls,
                     user_id=user_id,
-                    user_skills=user_skills
+                    user_skills=user_skills,
+                    pipeline=pipeline,
+                    checkpoint=checkpoint
                 )
                 if base_jobs_ids:
                     all_found_jobs_ids.extend(job_id for job_id in base_jobs_ids if job_id not in all_found_jobs_ids)
+                searches_done += 1
+                _report_progress()
         else:
             # No user_skills provided, do a single general search
             logger.info(f"Performing general search (no specific skills) with query: '{search_query}' for user {user_id}")
-            all_found_jobs_ids = _do_search(
+            general_jobs_ids = _do_search(
                 search_query,
                 location,
                 pages,
                 searched_urls,
                 user_id=user_id,
-                user_skills=None # Pass None if no skills were provided
+                user_skills=None, # Pass None if no skills were provided
+                pipeline=pipeline,
+                checkpoint=checkpoint
             )
+            all_found_jobs_ids.extend(job_id for job_id in general_jobs_ids if job_id not in all_found_jobs_ids)
+            searches_done += 1
+            _report_progress()
 
         num_jobs_ids_found = len(all_found_jobs_ids)
         logger.info(f"Completed Adzuna scraping phase for user {user_id}, found {num_jobs_ids_found} unique job IDs to process.")
@@ -511,88 +1014,267 @@ def scrape_adzuna_jobs(query="All", location="All", user_skills=None, pages=1, u
         return all_found_jobs_ids # Return the list of unique job IDs found in this scrape
         
     except Exception as e:
+        scrape_profiler.record('errors')
         logger.error(f"Error in scrape_adzuna_jobs: {str(e)}")
         logger.error(traceback.format_exc())
         return []
+    finally:
+        if deadline_passed():
+            # Don't hold the caller past the deadline while the pipeline drains
+            threading.Thread(target=pipeline.close, name='scrape-pipeline-drain', daemon=True).start()
+        else:
+            pipeline.close()
+
+def _scrape_search_page(search_query, location, page_num, user_id, user_skills=None, pipeline=None):
+    """
+    Fetch one page of search results from every enabled job source and save the listings on it.
+    
+    Listings are parsed here; new ones are handed to pipeline (if given) for
+    the detail fetch, skill extraction and save, otherwise processed inline.
+    
+    Returns:
+        dict: 'job_ids' saved from this page, the listings' 'source_urls',
+            'known' and 'unseen' (counts of listings that were and were not
+            stored before) and 'new' (unseen listings saved), or None if the
+            page could not be fetched
+    """
+    listings = search_sources(search_query, location, page_num)
+    if listings is None:
+        return None
+    
+    crawl_stats = {'job_ids': [], 'source_urls': [], 'known': 0, 'unseen': 0, 'new': 0}
+    if not listings:
+        return crawl_stats
+        
+    page_job_ids = crawl_stats['job_ids']
+    pending = []  # Job ID (or pipeline future) per listing, in page order
+    for fields in listings:
+        try:
+            parsed = prepare_listing(fields, user_id, crawl_stats=crawl_stats)
+            if not isinstance(parsed, dict):
+                # An already stored job that was linked to the user
+                job_id = parsed
+            elif pipeline is None:
+                job_id = process_listing(parsed, user_id, crawl_stats=crawl_stats)
+            else:
+                job_id = pipeline.submit(parsed, crawl_stats)
+            pending.append(job_id)
+        except Exception as e:
+            scrape_profiler.record('errors')
+            logger.error(f"Error processing job listing: {str(e)}")
+            logger.error(traceback.format_exc())
+            continue
+    
+    for job_id in pending:
+        if isinstance(job_id, Future):
+            try:
+                job_id = job_id.result(timeout=time_left())
+            except FutureTimeoutError:
+                # Saved once the pipeline gets to it, just not in this result
+                deadline_passed()
+                logger.warning("Scrape deadline passed while a listing was still being processed")
+                continue
+        if job_id:
+            page_job_ids.append(job_id)
+            logger.info(f"Successfully processed job with ID: {job_id}")
+        else:
+            logger.warning("Job processing did not return a valid job_id")
+    return crawl_stats
 
-def _do_search(search_query, location, pages, searched_urls, skill=None, user_id=None, user_skills=None):
-    """Helper function to perform a single search with given parameters."""
-    base_url = "https://www.adzuna.in/search"
+def _do_search(search_query, location, pages, searched_urls, skills=None, user_id=None, user_skills=None,
+               pipeline=None, checkpoint=None):
+    """
+    Helper function to perform a single search with given parameters.
+    
+    skills are the skills the search query was planned for; they are
+    attributed to the results with _attribute_skills.
+    
+    Pagination stops early once a page yields only listings that are already
+    stored; the listings this search returned on earlier runs are then linked
+    from the search_seen_urls history instead of fetching the remaining pages.
+    
+    With a checkpoint, pagination starts at the search's next unprocessed
+    page and every processed page is recorded.
+    
+    pages is only the starting depth: _plan_search_depth skips saturated
+    searches and goes deeper on productive ones, and a page that is still
+    mostly new listings extends the search by one more page, up to
+    MAX_SEARCH_PAGES.
+    
+    Under a scrape deadline no page is started once it passed; the search
+    is then left unfinished in the checkpoint.
+    """
     jobs_found = []
+    query_key, location_key, _ = normalize_search_key(search_query, location, 1)
+    
+    if checkpoint and checkpoint.is_search_done(search_query, location):
+        return jobs_found
+    first_page = checkpoint.next_page(search_query, location) if checkpoint else 1
+    depth = _plan_search_depth(query_key, location_key, pages)
+    pages_fetched = 0
+    new_listings = 0
     
     try:
-        for page_num in range(1, pages + 1):
-            params = {}
-            if search_query:
-                params['q'] = search_query
-            params['w'] = location
-            params['p'] = page_num
+        if depth == 0:
+            # Saturated: recent runs found (almost) nothing new, so reuse what they found
+            known_ids = get_search_job_ids(query_key, location_key)
+            logger.info(f"Skipping saturated search '{search_query}' in '{location}'; "
+                        f"reusing {len(known_ids)} previously seen jobs")
+            for job_id in known_ids:
+                link_user_job(user_id, job_id)
+                jobs_found.append(job_id)
+            scrape_profiler.record('cache_hits')
+            scrape_profiler.record('jobs_unchanged', len(known_ids))
+            if skills:
+                _attribute_skills(known_ids, skills)
+            if checkpoint:
+                checkpoint.record_jobs(known_ids)
+                checkpoint.finish_search(search_query, location)
+            return jobs_found
+        
+        page_num = first_page
+        cut_short = False
+        while page_num <= depth:
+            if deadline_passed():
+                logger.warning(f"Scrape deadline passed; stopping '{search_query}' before page {page_num}")
+                cut_short = True
+                break
+            logger.info(f"Scraping page {page_num} for query: {search_query}...")
             
-            logger.info(f"Scraping Adzuna page {page_num} for query: {search_query}...")
+            # Concurrent requests for the same (query, location, page) share one fetch
+            search_key = normalize_search_key(search_query, location, page_num)
             try:
-                html_content = fetch_page(base_url, params=params)
-                if not html_content:
-                    logger.warning(f"Failed to fetch Adzuna search results page {page_num}. Skipping.")
-                    continue
+                page_result, shared = search_flight.do(
+                    search_key, _scrape_search_page, search_query, location, page_num, user_id, user_skills, pipeline
+                )
+            except TimeoutError as e:
+                logger.warning(f"{e}; stopping '{search_query}'")
+                cut_short = True
+                break
             except Exception as e:
-                logger.error(f"Error fetching search page {page_num}: {e}")
+                scrape_profiler.record('errors')
+                logger.error(f"Error scraping search page {page_num}: {e}")
+                page_num += 1
                 continue
-                
-            # Process the HTML content for this page
-            soup = BeautifulSoup(html_content, 'html.parser')            # Use the specific Adzuna article selector
-            articles = soup.select('article.a')
-            if not articles:
-                logger.warning(f"No job listings found on page {page_num}. Trying alternative selectors...")
-                # Try alternative selectors if the main one fails
-                articles = soup.select('[data-aid]') or soup.select('.job-listing') or soup.select('.result')
-            
-            if not articles:
-                logger.warning(f"No job listings found on page {page_num} with any selector")
+            # Only the leader's pages count towards the search's yield; a
+            # sharer would record the same fetch again
+            if not shared:
+                pages_fetched += 1
+            if page_result is None:
+                scrape_profiler.record('errors')
+                page_num += 1
                 continue
-                
-            logger.info(f"Found {len(articles)} job listings on page {page_num}")
-            for article in articles:
-                try:
-                    # First parse and save basic job details
-                    job_id = None
-                    if isinstance(article, dict):
-                        # If article is already a dictionary, save directly
-                        article['user_id'] = user_id
-                        job_id = save_job_to_db(article, user_id)
-                        logger.info(f"Saved dictionary job listing directly with user_id={user_id}")
-                    else:
-                        # Otherwise parse as BeautifulSoup element
-                        job_id = parse_job_listing(article, user_id, user_skills=user_skills)
-                    
-                    if job_id:
-                        # Add the current skill if provided
-                        if skill:
-                            add_job_skills(job_id, [skill])
-                        jobs_found.append(job_id)
-                        logger.info(f"Successfully processed job with ID: {job_id}")
-                    else:
-                        logger.warning("Job processing did not return a valid job_id")
-                except Exception as e:
-                    logger.error(f"Error processing job listing: {str(e)}")
-                    logger.error(traceback.format_exc())
-                    continue
+            if shared:
+                scrape_profiler.record('cache_hits')
+            page_job_ids = page_result['job_ids']
+            
+            # Only the leader records the page; sharers saw the same listings
+            if not shared:
+                new_listings += page_result['new']
+                record_search_urls(query_key, location_key, page_result['source_urls'])
+            
+            # A page listing nothing but stored listings means the rest of the
+            # results were seen on an earlier run. Judged by what the page
+            # listed: a save that failed was still new.
+            reached_known = page_result['known'] > 0 and page_result['unseen'] == 0
+            if reached_known and page_num < depth:
+                known_ids = [job_id for job_id in get_search_job_ids(query_key, location_key)
+                             if job_id not in page_job_ids]
+                logger.info(f"Page {page_num} for '{search_query}' had only known listings; "
+                            f"stopping early and reusing {len(known_ids)} previously seen jobs")
+                for job_id in known_ids:
+                    link_user_job(user_id, job_id)
+                scrape_profiler.record('cache_hits')
+                scrape_profiler.record('jobs_unchanged', len(known_ids))
+                page_job_ids = page_job_ids + known_ids
+            
+            for job_id in page_job_ids:
+                # Jobs saved by another caller's fetch still need linking to this user
+                if shared:
+                    link_user_job(user_id, job_id)
+                jobs_found.append(job_id)
+            # Attribute the searched skills, keeping skills other searches
+            # attributed to these shared listings
+            if skills:
+                _attribute_skills(page_job_ids, skills)
+            
+            if checkpoint:
+                checkpoint.record_page(search_query, location, page_num, page_job_ids)
+            
+            if reached_known:
+                break
+            
+            # Still mostly new listings: the next page is likely worth its request
+            if page_num == depth and depth < MAX_SEARCH_PAGES and page_result['new'] >= DEEPEN_YIELD:
+                depth += 1
+                logger.info(f"Page {page_num} for '{search_query}' had {page_result['new']} new listings; "
+                            f"extending search to {depth} pages")
                     
-            # Random delay between pages
-            if page_num < pages:
+            # Random delay between pages (replayed pages need no politeness)
+            if page_num < depth and not http_archive.is_replaying():
                 delay = random.uniform(2, 5)
+                left = time_left()
+                if left is not None and left <= delay:
+                    deadline_passed()
+                    logger.warning(f"Not enough time before the scrape deadline for page {page_num + 1} "
+                                   f"of '{search_query}'")
+                    cut_short = True
+                    break
                 logger.info(f"Waiting {delay:.2f} seconds before next page...")
                 time.sleep(delay)
+            page_num += 1
         
+        if checkpoint and not cut_short:
+            checkpoint.finish_search(search_query, location)
         return jobs_found
     except Exception as e:
+        scrape_profiler.record('errors')
         logger.error(f"Error in _do_search: {str(e)}")
         logger.error(traceback.format_exc())
         return jobs_found
+    finally:
+        record_search_yield(query_key, location_key, pages_fetched, new_listings)
+
+def _plan_search_depth(query_key, location_key, pages):
+    """
+    Decide how many results pages a search should fetch from its yield history.
+    
+    Args:
+        query_key (str): Normalized search query
+        location_key (str): Normalized search location
+        pages (int): Depth requested by the caller
+        
+    Returns:
+        int: Pages to fetch; 0 means the search is saturated and should be skipped
+    """
+    pages = max(1, min(pages, MAX_SEARCH_PAGES))
+    history = get_search_yield(query_key, location_key)
+    if not history or not history['runs']:
+        return pages
+    
+    avg_yield = history['avg_new_per_page'] or 0
+    if avg_yield < SATURATED_YIELD and history['last_run']:
+        try:
+            last_run = datetime.strptime(history['last_run'], '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return pages
+        if datetime.utcnow() - last_run < SATURATED_RECHECK:
+            return 0
+        # Recheck a saturated search with a single page
+        return 1
+    if avg_yield >= DEEPEN_YIELD:
+        # Productive last time: start one page deeper than the last run ended
+        return min(MAX_SEARCH_PAGES, max(pages, (history['last_depth'] or 0) + 1))
+    return pages
 
-def scrape_jobs(query="All", location="All", user_skills=None, pages=1, force_clear=False, user_id=None):
+def scrape_jobs(query="All", location="All", user_skills=None, pages=1, force_clear=False, user_id=None,
+                progress_callback=None, checkpoint=None, profile=None, profile_output=None, deadline=None):
     """
     Scrape jobs from various sources.
 
+    Only one scrape runs per user at a time; an overlapping call for the same
+    user returns an empty list without scraping.
+
     Args:
         query (str): The search query for jobs
         location (str): The location to search in
@@ -600,6 +1282,14 @@ def scrape_jobs(query="All", location="All", user_skills=None, pages=1, force_cl
         pages (int): Number of pages to scrape
         force_clear (bool): Whether to clear existing jobs before scraping
         user_id (int): The ID of the user scraping jobs
+        progress_callback (callable): Optional progress_callback(searches_done, searches_total, jobs_found)
+        checkpoint (CrawlCheckpoint): Optional crawl frontier to resume from and record progress in
+        profile (ScrapeProfile): Record per-stage timings of this run into it
+            (True for a new one whose summary is only logged)
+        profile_output (str): Also write a cProfile (*.prof) or collapsed-stack
+            file of the run, see scrape_profiler.profiling
+        deadline (float): Return within this many seconds (or by this
+            scrape_coordination.Deadline) with the jobs saved so far
 
     Returns:
         list: List of scraped job dictionaries for the user, or empty list if none found/error.
@@ -608,44 +1298,105 @@ def scrape_jobs(query="All", location="All", user_skills=None, pages=1, force_cl
         logger.error("Cannot scrape jobs without user_id")
         return []
 
-    logger.info(f"Starting job scrape for user {user_id} with query: '{query}', location: '{location}', skills: {user_skills}")
+    with user_scrape_locks.hold(user_id) as acquired:
+        if not acquired:
+            logger.warning(f"A scrape is already running for user {user_id}; skipping overlapping refresh")
+            return []
+        with _ledger_run('user', user_id, query, location, pages):
+            if not (profile or profile_output):
+                return _scrape_jobs_for_user(query, location, user_skills, pages, force_clear, user_id,
+                                             progress_callback, checkpoint, deadline)
+            with scrape_profiler.profiling(profile if isinstance(profile, scrape_profiler.ScrapeProfile) else None,
+                                           profile_output) as run_profile:
+                jobs = _scrape_jobs_for_user(query, location, user_skills, pages, force_clear, user_id,
+                                             progress_callback, checkpoint, deadline)
+            logger.info(f"Scrape profile for user {user_id}:\n{run_profile.format_summary()}")
+            return jobs
+
+@contextmanager
+def _ledger_run(kind, user_id, query, location, pages):
+    """
+    Record a scrape run in the scrape_runs ledger when it ends.
     
-    conn = None # Initialize conn
+    Args:
+        kind (str): 'user' for a user's own refresh, 'shared' for a batch or pre-scrape search
+        user_id (int): The user the run scraped for (the leader of a shared search)
+        query (str): Search query
+        location (str): Search location
+        pages (int): Requested depth
+    """
+    started_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    run_profile = scrape_profiler.ScrapeProfile()
     try:
-        conn = get_db_connection()
-        # Ensure row_factory is set for dictionary-like results
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with scrape_profiler.recording(run_profile):
+            yield run_profile
+    except Exception:
+        run_profile.count('errors')
+        raise
+    finally:
+        counters = run_profile.counters
+        fetch = next((row for row in run_profile.summary_rows() if row[0] == 'fetch'), None)
+        record_scrape_run({
+            'user_id': user_id,
+            'kind': kind,
+            'query': query,
+            'location': location,
+            'pages': pages,
+            'started_at': started_at,
+            'duration_seconds': round(run_profile.wall_time, 3),
+            'http_requests': counters['requests'],
+            'http_retries': counters['retries'],
+            'bytes_downloaded': counters['bytes'],
+            'cache_hits': counters.get('cache_hits', 0),
+            'jobs_new': counters.get('jobs_new', 0),
+            'jobs_updated': counters.get('jobs_updated', 0),
+            'jobs_unchanged': counters.get('jobs_unchanged', 0),
+            'errors': counters.get('errors', 0),
+            'fetch_ms_mean': round(fetch[3], 1) if fetch else None,
+            'fetch_ms_p95': round(fetch[4], 1) if fetch else None,
+            'stage_seconds': {stage: round(seconds, 3) for stage, seconds in run_profile.stage_totals().items()}
+        })
 
-        if force_clear:
+def _scrape_jobs_for_user(query, location, user_skills, pages, force_clear, user_id, progress_callback=None,
+                          checkpoint=None, deadline=None):
+    """Run scrape_jobs for a user whose scrape lock is held."""
+    logger.info(f"Starting job scrape for user {user_id} with query: '{query}', location: '{location}', skills: {user_skills}")
+    
+    try:
+        # A resumed run already cleared them; clearing again would unlink the jobs it found
+        if force_clear and not (checkpoint and checkpoint.cleared):
             logger.info(f"Clearing existing jobs for user {user_id}")
-            cursor.execute("DELETE FROM jobs WHERE user_id = ?", (user_id,))
-            conn.commit()
+            unlink_user_jobs(user_id)
             logger.info(f"Successfully cleared jobs for user {user_id}.")
+            if checkpoint:
+                checkpoint.mark_cleared()
 
         # adzuna_job_ids will be a list of job IDs scraped and saved by scrape_adzuna_jobs (via _do_search)
-        adzuna_job_ids = scrape_adzuna_jobs(query, location, user_skills, pages, user_id)
+        adzuna_job_ids = scrape_adzuna_jobs(query, location, user_skills, pages, user_id, progress_callback,
+                                            checkpoint, deadline)
         
         if not adzuna_job_ids:
             logger.warning(f"No job IDs returned from scrape_adzuna_jobs for user {user_id}.")
-            if conn: conn.close()
             return [] # No jobs found by the scraping sources
         
         logger.info(f"scrape_adzuna_jobs returned {len(adzuna_job_ids)} job IDs for user {user_id}.")
 
         # Fetch the full job details for these IDs from the database.
-        # The jobs should have been saved with the correct user_id by _do_search -> save_job_to_db.
+        # The jobs should have been linked to this user by _do_search -> save_job_to_db.
         try:
             # Ensure adzuna_job_ids are distinct
             unique_job_ids = list(set(adzuna_job_ids))
             placeholders = ','.join(['?' for _ in unique_job_ids])
-            sql_query = f"SELECT * FROM jobs WHERE id IN ({placeholders}) AND user_id = ?"
+            sql_query = f"""
+                SELECT j.*, uj.user_id AS user_id FROM jobs j
+                JOIN user_jobs uj ON uj.job_id = j.id
+                WHERE j.id IN ({placeholders}) AND uj.user_id = ?
+            """
             params = [*unique_job_ids, user_id] 
             
             logger.info(f"Fetching jobs from DB with query: {sql_query}, params length: {len(params)}")
-            cursor.execute(sql_query, params)
-            
-            jobs_from_db = cursor.fetchall() # Returns list of sqlite3.Row objects
+            with db_connection() as conn:
+                jobs_from_db = conn.execute(sql_query, params).fetchall() # Returns list of sqlite3.Row objects
             logger.info(f"Fetched {len(jobs_from_db)} job details from DB for user {user_id} matching scraped IDs.")
             
             # Convert Row objects to dictionaries with better error handling
@@ -657,25 +1408,21 @@ def scrape_jobs(query="All", location="All", user_skills=None, pages=1, force_cl
                 except Exception as e:
                     logger.error(f"Failed to convert job to dict: {e}")
             
-            if conn: conn.close()
             logger.info(f"Returning {len(job_dicts)} job dictionaries")
             return job_dicts
             
         except Exception as e:
             logger.error(f"Error fetching jobs from database: {e}")
             logger.error(traceback.format_exc())
-            if conn: conn.close()
             return []
 
     except sqlite3.Error as db_err:
         logger.error(f"Database error during job scraping for user {user_id}: {db_err}")
         logger.error(traceback.format_exc())
-        if conn: conn.close()
         return []
     except Exception as e:
         logger.error(f"Unexpected error during job scraping for user {user_id}: {str(e)}")
         logger.error(traceback.format_exc())
-        if conn: conn.close() # Ensure connection is closed on other exceptions too
         return []
 
 def main_adzuna(query="All", location="All", pages=1, user_id=None):
@@ -692,17 +1439,17 @@ def main_adzuna(query="All", location="All", pages=1, user_id=None):
             return False
             
         # Verify user exists, but continue even if not found
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        # First check if user table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user'")
-        if not cursor.fetchone():
-            logger.warning("User table not found in database, continuing with provided user_id")
-        else:
-            cursor.execute('SELECT id FROM user WHERE id = ?', (user_id,))
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            # First check if user table exists
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user'")
             if not cursor.fetchone():
-                logger.warning(f"User with ID {user_id} does not exist in database but continuing anyway")
-                # We'll continue without failing - the user_id will be used for job attribution
+                logger.warning("User table not found in database, continuing with provided user_id")
+            else:
+                cursor.execute('SELECT id FROM user WHERE id = ?', (user_id,))
+                if not cursor.fetchone():
+                    logger.warning(f"User with ID {user_id} does not exist in database but continuing anyway")
+                    # We'll continue without failing - the user_id will be used for job attribution
             
         logger.info("Starting job scraping...")
         jobs = scrape_adzuna_jobs(query=query, location=location, pages=pages, user_id=user_id)
@@ -718,9 +1465,6 @@ def main_adzuna(query="All", location="All", pages=1, user_id=None):
         logger.error(f"Error in main_adzuna: {str(e)}")
         logger.error(traceback.format_exc())
         return False
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 if __name__ == "__main__":
     try:
@@ -730,13 +1474,28 @@ if __name__ == "__main__":
         parser.add_argument('--location', type=str, default="All", help='Job location')
         parser.add_argument('--pages', type=int, default=1, help='Number of pages to scrape')
         parser.add_argument('--user_id', type=int, default=None, help='User ID for job scraping')
+        parser.add_argument('--http-mode', choices=http_archive.MODES, default=None,
+                            help='Fetch live, record responses into the archive, or replay them from it')
+        parser.add_argument('--http-archive', type=str, default=None, help='HTTP archive file to record into or replay from')
+        parser.add_argument('--origin', type=str, default=None,
+                            help='Send requests to this origin instead, e.g. http://127.0.0.1:8765 for the stub server')
+        parser.add_argument('--profile', nargs='?', const='scrape_profile.collapsed', default=None,
+                            help='Print per-stage timings and write a profile: collapsed stacks, or cProfile '
+                                 'data if the path ends in .prof (default scrape_profile.collapsed)')
         
         args = parser.parse_args()
+        if args.http_mode or args.http_archive or args.origin:
+            http_archive.configure(mode=args.http_mode, archive_path=args.http_archive, origin_override=args.origin)
         
         logger.info(f"Preparing to scrape Adzuna for query='{args.query}', location='{args.location}', pages={args.pages}, user_id={args.user_id}")
         
         try:
-            main_adzuna(query=args.query, location=args.location, pages=args.pages, user_id=args.user_id)
+            if args.profile:
+                with scrape_profiler.profiling(output_path=args.profile) as run_profile:
+                    main_adzuna(query=args.query, location=args.location, pages=args.pages, user_id=args.user_id)
+                print(run_profile.format_summary())
+            else:
+                main_adzuna(query=args.query, location=args.location, pages=args.pages, user_id=args.user_id)
             logger.info("All scraping finished successfully.")
         except Exception as e:
             logger.error(f"Error in main_adzuna: {str(e)}", exc_info=True)
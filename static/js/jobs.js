@@ -47,12 +47,26 @@ document.addEventListener('DOMContentLoaded', function() {
             .then(response => response.json())
             .then(data => {
                 if (data.loading) {
+                    // Show how far the background scrape has got
+                    const task = data.task;
+                    if (task && task.status === 'running' && task.searches_total) {
+                        showLoading(`Searching jobs (${task.searches_done}/${task.searches_total}), ${task.jobs_found} found so far...`);
+                    } else if (task && task.status === 'queued') {
+                        showLoading('Waiting for the job search to start...');
+                    }
                     // Still loading, poll again in 2 seconds
                     setTimeout(pollRefreshStatus, 2000);
                 } else {
-                    // Loading complete, reload the page
+                    // Loading complete, reload without the flags that would queue another scrape
                     hideLoading();
-                    window.location.reload();
+                    if (data.task && data.task.status === 'failed') {
+                        showError('The job search failed. Please try refreshing again.');
+                        return;
+                    }
+                    const url = new URL(window.location.href);
+                    url.searchParams.delete('run_scraper');
+                    url.searchParams.delete('force_refresh');
+                    window.location.replace(url.toString());
                 }
             })
             .catch(error => {
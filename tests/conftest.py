@@ -0,0 +1,27 @@
+"""Shared fixtures: every test runs against its own scratch SQLite database."""
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database_manager
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Point database_manager at a fresh, initialized database file."""
+    monkeypatch.setattr(database_manager, 'DB_PATH', str(tmp_path / 'test.db'))
+    assert database_manager.initialize_database()
+    return database_manager
+
+
+def add_user(username):
+    """Create a user and return its ID."""
+    with database_manager.db_connection() as conn:
+        cursor = conn.execute(
+            "INSERT INTO user (username, email, password) VALUES (?, ?, ?)",
+            (username, f"{username}@example.com", 'secret')
+        )
+        conn.commit()
+        return cursor.lastrowid
@@ -0,0 +1,24 @@
+"""Regression tests pinning classify_skills to the per-skill substring scan it replaced."""
+import json
+import os
+import pytest
+
+pytest.importorskip('spacy')
+pytest.importorskip('nltk')
+
+from scraper import classify_skills
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'classify_skills_corpus.json')
+
+
+def _load_corpus():
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize('case', _load_corpus())
+def test_matches_previous_classifier(case):
+    # Expected lists were recorded from the implementation before the marker scan
+    required, nice_to_have = classify_skills(case['description'], case['skills'])
+    assert required == case['required']
+    assert nice_to_have == case['nice_to_have']
@@ -0,0 +1,149 @@
+"""Tests of listing deduplication and job search in database_manager."""
+import pytest
+from database_manager import _fts_query
+from conftest import add_user
+
+
+def _job(**fields):
+    job = {'title': 'Data Engineer', 'company': 'Acme', 'location': 'Bangalore', 'description': 'Build pipelines'}
+    job.update(fields)
+    return job
+
+
+def _job_count(db):
+    with db.db_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+
+class TestUpsertJob:
+    def test_same_listing_url_updates_the_stored_job(self, db):
+        first = db.save_job_to_db(_job(source_url='https://Example.com/jobs/1/?utm_source=x'), 1)
+        again = db.save_job_to_db(_job(source_url='https://example.com/jobs/1#apply', location='Pune'), 1)
+        assert again == first
+        assert db.get_job_by_id(first)['location'] == 'Pune'
+        assert _job_count(db) == 1
+
+    def test_same_title_and_company_with_different_urls_are_different_jobs(self, db):
+        mumbai = db.save_job_to_db(_job(location='Mumbai', source_url='https://example.com/p/1'), 1)
+        delhi = db.save_job_to_db(_job(location='Delhi', source_url='https://example.com/p/2'), 1)
+        assert mumbai != delhi
+        assert db.get_job_id_by_source_url('https://example.com/p/2') == delhi
+
+    def test_listing_without_url_never_matches_one_with_url(self, db):
+        with_url = db.save_job_to_db(_job(source_url='https://example.com/p/1'), 1)
+        without_url = db.save_job_to_db(_job(), 1)
+        assert without_url != with_url
+        # ...but matches the stored listing that has no URL either
+        assert db.save_job_to_db(_job(location='Pune'), 1) == without_url
+
+    def test_jobs_are_shared_between_users(self, db):
+        other_user = add_user('other')
+        first = db.save_job_to_db(_job(source_url='https://example.com/p/1'), 1)
+        assert db.save_job_to_db(_job(source_url='https://example.com/p/1'), other_user) == first
+        assert _job_count(db) == 1
+
+    def test_listing_without_url_is_keyed_by_job_id(self, db):
+        first, same, other = db.save_jobs_batch(
+            [_job(job_id=77), _job(job_id='77', location='Delhi'), _job(job_id=78)], match_title=False
+        )
+        assert first == same
+        assert other != first
+
+    def test_without_title_matching_urlless_listings_are_always_new(self, db):
+        first, second = db.save_jobs_batch([_job(), _job()], match_title=False)
+        assert first != second
+        assert _job_count(db) == 2
+
+
+class TestFtsQuery:
+    def test_every_term_is_a_quoted_prefix(self):
+        assert _fts_query('python developer') == '"python"* "developer"*'
+
+    def test_quotes_are_escaped(self):
+        assert _fts_query('say "hi') == '"say"* """hi"*'
+
+    def test_terms_without_letters_or_digits_are_dropped(self):
+        assert _fts_query('c++ - / ++') == '"c++"*'
+        assert _fts_query(' - ') == ''
+
+    def test_operators_are_searched_as_words(self):
+        assert _fts_query('python OR NOT java') == '"python"* "OR"* "NOT"* "java"*'
+
+
+@pytest.fixture
+def search_jobs(db):
+    """Three of the test user's jobs with known skill matches for the skills python, sql and docker."""
+    ids = {}
+    ids['required_only'] = db.save_job_to_db(_job(
+        title='Python Developer', source_url='https://example.com/p/1',
+        required_skills=['python'], skills=['python']
+    ), 1)
+    ids['weighted'] = db.save_job_to_db(_job(
+        title='Analytics Engineer', source_url='https://example.com/p/2', location='Remote',
+        description='Kafka streams and python services',
+        required_skills=['python', 'sql', 'aws'], nice_to_have_skills=['docker', 'kubernetes'],
+        skills=['python', 'sql', 'aws', 'docker', 'kubernetes']
+    ), 1)
+    ids['skills_only'] = db.save_job_to_db(_job(
+        title='Backend Engineer', source_url='https://example.com/p/3', skills=['java', 'go']
+    ), 1)
+    return ids
+
+
+SKILLS = ['Python', 'SQL ', 'docker']
+
+
+class TestJobSearch:
+    def test_required_and_nice_to_have_skills_are_weighted_70_30(self, db, search_jobs):
+        jobs = {job['id']: job for job in db.search_jobs_db(resume_skills=SKILLS, user_id=1)}
+        # 70 * 2/3 required + 30 * 1/2 nice to have
+        assert jobs[search_jobs['weighted']]['match_percentage'] == 61
+        assert jobs[search_jobs['required_only']]['match_percentage'] == 70
+        # No required or nice-to-have skills: share of the job's skills the user has
+        assert jobs[search_jobs['skills_only']]['match_percentage'] == 0
+
+    def test_results_are_ordered_by_match_and_paged(self, db, search_jobs):
+        order = [search_jobs['required_only'], search_jobs['weighted'], search_jobs['skills_only']]
+        assert [job['id'] for job in db.search_jobs_db(resume_skills=SKILLS, user_id=1)] == order
+        assert [job['id'] for job in db.search_jobs_db(resume_skills=SKILLS, user_id=1, limit=2)] == order[:2]
+        assert [job['id'] for job in db.search_jobs_db(resume_skills=SKILLS, user_id=1, limit=2, offset=2)] == order[2:]
+
+    def test_matching_and_missing_skills(self, db, search_jobs):
+        job = db.search_jobs_db(query='analytics', resume_skills=SKILLS, user_id=1)[0]
+        assert job['matching_skills'] == ['docker', 'python', 'sql']
+        assert job['missing_skills'] == ['aws', 'kubernetes']
+        assert job['required_skills'] == ['python', 'sql', 'aws']
+
+    def test_query_matches_text_and_ranks_title_first(self, db, search_jobs):
+        assert [job['id'] for job in db.search_jobs_db(query='kafka', user_id=1)] == [search_jobs['weighted']]
+        ranked = [job['id'] for job in db.search_jobs_db(query='pyth', resume_skills=SKILLS, user_id=1)]
+        assert ranked[0] == search_jobs['required_only']
+        assert set(ranked) == {search_jobs['required_only'], search_jobs['weighted']}
+
+    def test_job_skills_are_searched(self, db, search_jobs):
+        db.add_job_skills(search_jobs['skills_only'], ['terraform'])
+        found = db.search_jobs_db(query='terraform', resume_skills=SKILLS, user_id=1)
+        assert [job['id'] for job in found] == [search_jobs['skills_only']]
+        db.add_job_skills(search_jobs['skills_only'], ['ansible'])
+        assert db.search_jobs_db(query='terraform', resume_skills=SKILLS, user_id=1) == []
+
+    def test_only_the_users_jobs_are_searched(self, db, search_jobs):
+        other_user = add_user('other')
+        assert db.search_jobs_db(user_id=other_user) == []
+        db.link_user_job(other_user, search_jobs['skills_only'])
+        assert [job['id'] for job in db.search_jobs_db(user_id=other_user)] == [search_jobs['skills_only']]
+
+    def test_summary_counts_the_search(self, db, search_jobs):
+        summary = db.get_job_search_summary(resume_skills=SKILLS, user_id=1)
+        assert summary == {
+            'total_jobs': 3,
+            'matching_jobs': 2,  # Above 40%
+            'remote_jobs': 1,
+            'onsite_jobs': 2,
+            'missing_skills': ['aws']
+        }
+
+    def test_summary_job_type_filter_keeps_skill_gaps(self, db, search_jobs):
+        summary = db.get_job_search_summary(resume_skills=SKILLS, user_id=1, job_type='Onsite')
+        assert (summary['total_jobs'], summary['remote_jobs'], summary['onsite_jobs']) == (2, 0, 2)
+        assert summary['missing_skills'] == ['aws']
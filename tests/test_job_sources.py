@@ -0,0 +1,51 @@
+"""Tests of parsing Adzuna search results replayed from a recorded HTTP archive."""
+import os
+import pytest
+import http_archive
+from job_sources import AdzunaSource
+
+ARCHIVE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'adzuna_search.jsonl.gz')
+
+
+@pytest.fixture
+def replay(monkeypatch):
+    """Answer fetches from the recorded search page instead of the network."""
+    monkeypatch.setattr(http_archive, '_mode', http_archive._mode)
+    monkeypatch.setattr(http_archive, '_archive', http_archive._archive)
+    http_archive.configure(mode=http_archive.MODE_REPLAY, archive_path=ARCHIVE_PATH)
+
+
+def test_search_replays_recorded_page(replay):
+    articles = AdzunaSource().search('python', 'India', 1)
+    assert [article['data-aid'] for article in articles] == ['4711223344', '4711225566', '4711227788']
+
+
+def test_parse_listing_reads_recorded_markup(replay):
+    source = AdzunaSource()
+    first, second, untitled = source.search('python', 'India', 1)
+
+    assert source.parse_listing(first) == {
+        'job_id': '4711223344',
+        'title': 'Senior Python Developer',
+        'url': 'https://www.adzuna.in/details/4711223344?se=abc&v=1',
+        'source_url': 'https://www.adzuna.in/details/4711223344?se=abc&v=1',
+        'company': 'Acme Analytics Pvt Ltd',
+        'location': 'Bengaluru, Karnataka',
+        'description': 'Build data pipelines in Python and SQL on AWS. Experience with Airflow is a plus.',
+    }
+    fields = source.parse_listing(second)
+    assert fields['title'] == 'Backend Engineer - Django'
+    assert fields['url'] == 'https://www.adzuna.in/land/ad/4711225566?se=def&v=2'
+    assert fields['company'] == 'Northwind Software'
+    assert fields['description'] == 'Own REST APIs written in Django and PostgreSQL.'
+    assert source.parse_listing(untitled) is None
+
+
+def test_search_listings_tags_source(replay):
+    listings = AdzunaSource().search_listings('python', 'India', 1)
+    assert [listing['title'] for listing in listings] == ['Senior Python Developer', 'Backend Engineer - Django']
+    assert {listing['source'] for listing in listings} == {'adzuna'}
+
+
+def test_unrecorded_page_is_not_fetched(replay):
+    assert AdzunaSource().search('python', 'India', 2) is None
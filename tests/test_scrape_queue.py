@@ -0,0 +1,101 @@
+"""Tests of the order in which scrape workers claim queued tasks."""
+from datetime import datetime, timedelta
+import pytest
+import scrape_queue
+from scrape_queue import (
+    claim_next_task, enqueue_scrape, PRIORITY_INTERACTIVE, PRIORITY_PROFILE, PRIORITY_PREFETCH
+)
+from conftest import add_user
+
+
+def _minutes_ago(minutes):
+    return (datetime.utcnow() - timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _set_task(db, task_id, **columns):
+    with db.db_connection() as conn:
+        conn.execute(
+            f"UPDATE scrape_tasks SET {', '.join(f'{name} = ?' for name in columns)} WHERE id = ?",
+            (*columns.values(), task_id)
+        )
+        conn.commit()
+
+
+def _claim_order(count):
+    return [claim_next_task('test-worker')['id'] for _ in range(count)]
+
+
+@pytest.fixture
+def users(db):
+    return [add_user(f"user{i}") for i in range(3)]
+
+
+def test_empty_queue(db):
+    assert claim_next_task('test-worker') is None
+
+
+def test_most_urgent_priority_class_first(db, users):
+    prefetch = enqueue_scrape(users[0], priority=PRIORITY_PREFETCH)
+    profile = enqueue_scrape(users[1], priority=PRIORITY_PROFILE)
+    interactive = enqueue_scrape(users[2], priority=PRIORITY_INTERACTIVE)
+    assert _claim_order(3) == [interactive, profile, prefetch]
+    assert claim_next_task('test-worker') is None
+
+
+def test_oldest_first_within_a_class(db, users):
+    tasks = [enqueue_scrape(user_id) for user_id in users]
+    assert _claim_order(3) == tasks
+
+
+def test_users_with_fewer_recent_requests_first(db, users):
+    busy = enqueue_scrape(users[0])
+    idle = enqueue_scrape(users[1])
+    db.record_scrape_run({'user_id': users[0], 'kind': 'user', 'started_at': _minutes_ago(5), 'http_requests': 40})
+    # Requests outside the fair share window do not count
+    db.record_scrape_run({'user_id': users[1], 'kind': 'user',
+                          'started_at': _minutes_ago(scrape_queue.FAIR_SHARE_MINUTES + 5), 'http_requests': 400})
+    assert _claim_order(2) == [idle, busy]
+
+
+def test_long_waiting_task_goes_first_regardless_of_usage(db, users):
+    busy = enqueue_scrape(users[0])
+    idle = enqueue_scrape(users[1])
+    db.record_scrape_run({'user_id': users[0], 'kind': 'user', 'started_at': _minutes_ago(5), 'http_requests': 40})
+    _set_task(db, busy, created_at=_minutes_ago(scrape_queue.MAX_WAIT_MINUTES + 1))
+    assert _claim_order(2) == [busy, idle]
+
+
+def test_urgency_beats_waiting_time(db, users):
+    waiting = enqueue_scrape(users[0], priority=PRIORITY_PREFETCH)
+    _set_task(db, waiting, created_at=_minutes_ago(scrape_queue.MAX_WAIT_MINUTES * 3))
+    interactive = enqueue_scrape(users[1])
+    assert _claim_order(2) == [interactive, waiting]
+
+
+def test_one_active_task_per_user(db, users):
+    task_id = enqueue_scrape(users[0], query='python')
+    assert enqueue_scrape(users[0], query='java') == task_id
+
+
+def test_claimed_task_is_marked_running(db, users):
+    task_id = enqueue_scrape(users[0], query='python')
+    task = claim_next_task('test-worker')
+    assert (task['id'], task['status'], task['worker_id'], task['attempts']) == (
+        task_id, scrape_queue.STATUS_RUNNING, 'test-worker', 1
+    )
+    assert task['heartbeat_at'] is not None
+
+
+def test_stale_running_task_is_requeued(db, users):
+    task_id = enqueue_scrape(users[0])
+    claim_next_task('dead-worker')
+    _set_task(db, task_id, heartbeat_at=_minutes_ago(scrape_queue.STALE_AFTER_MINUTES + 1))
+    task = claim_next_task('test-worker')
+    assert (task['id'], task['worker_id'], task['attempts']) == (task_id, 'test-worker', 2)
+
+
+def test_live_running_task_is_not_requeued(db, users):
+    task_id = enqueue_scrape(users[0])
+    claim_next_task('busy-worker')
+    scrape_queue.refresh_heartbeat(task_id)
+    assert claim_next_task('test-worker') is None
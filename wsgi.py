@@ -39,6 +39,7 @@ def init_application():
     """Initialize the application for production."""
     try:
         from app import db, init_db, cleanup_static_graphs
+        from database_manager import needs_initialization
         from security import set_secure_headers
         
         # Set recommended number of worker processes based on CPU cores
@@ -77,12 +78,22 @@ def init_application():
             if not inspector.has_table("user"):
                 logger.info("User table not found. Initializing database.")
                 init_db()  # Initialize database tables
+            elif needs_initialization():
+                logger.info("Database schema is outdated. Updating tables.")
+                init_db()  # Creates missing tables and migrates the jobs table
             
             # Clean up old graph files on startup
             graphs_dir = os.path.join('static', 'graphs')
             if os.path.exists(graphs_dir):
                 logger.info(f"Cleaning up old graph files in {graphs_dir}")
                 cleanup_static_graphs(graphs_dir, older_than_days=3)
+        
+        # Process queued scrapes in this process unless a separate
+        # `flask scrape-worker` process is deployed
+        if app.config.get('EMBEDDED_SCRAPE_WORKER'):
+            from scrape_queue import start_embedded_worker
+            if start_embedded_worker():
+                logger.info("Started embedded scrape worker")
                 
         logger.info("Application initialization complete")
         return True